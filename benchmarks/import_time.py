@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+"""
+    benchmarks.import_time
+    ~~~~~~~~~~~~~~~~~~~~~~
+
+    Measure the time needed to import lantz_core and declare a small driver.
+
+    Each measurement runs in a fresh interpreter. Usage :
+
+        python benchmarks/import_time.py [repeat]
+
+    :copyright: 2015 by Lantz Authors, see AUTHORS for more details.
+    :license: BSD, see LICENSE for more details.
+
+"""
+from __future__ import (division, unicode_literals, print_function,
+                        absolute_import)
+import os
+import sys
+import subprocess
+import tempfile
+
+SCRIPT = """
+import sys
+from time import time
+t0 = time()
+from lantz_core.has_features import HasFeatures
+from lantz_core.features.bool import Bool
+from lantz_core.features.scalars import Float
+t1 = time()
+
+class Driver(HasFeatures):
+    output = Bool(True, True, mapping={True: 'ON', False: 'OFF'})
+    voltage = Float(True, True, limits=(0, 10), unit='V')
+
+t2 = time()
+print(t1 - t0, t2 - t1, 'pint' in sys.modules)
+"""
+
+
+def measure(root):
+    """Run the script in a fresh interpreter and return its measurements.
+
+    """
+    fd, path = tempfile.mkstemp(suffix='.py')
+    with os.fdopen(fd, 'w') as f:
+        f.write(SCRIPT)
+    try:
+        env = dict(os.environ, PYTHONPATH=root)
+        out = subprocess.check_output([sys.executable, path], env=env)
+    finally:
+        os.remove(path)
+    import_time, declare_time, pint = out.decode('ascii').split()
+    return float(import_time), float(declare_time), pint == 'True'
+
+
+def main(repeat=5):
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    results = [measure(root) for _ in range(repeat)]
+    print('import  : {:.1f} ms (best of {})'.format(
+        min(r[0] for r in results)*1e3, repeat))
+    print('declare : {:.1f} ms (best of {})'.format(
+        min(r[1] for r in results)*1e3, repeat))
+    print('pint imported : {}'.format(results[0][2]))
+
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:]])
@@ -102,8 +102,17 @@ class Action(object):
         """Wrap a func using Pint to automatically convert Quantity.
 
         """
-        ureg = get_unit_registry()
-        return ureg.wraps(*units, strict=False)(func)
+        # The registry is created only when the action is first called.
+        wrapped = []
+
+        def unit_wrapper(*args, **kwargs):
+            if not wrapped:
+                ureg = get_unit_registry()
+                wrapped.append(ureg.wraps(*units, strict=False)(func))
+            return wrapped[0](*args, **kwargs)
+
+        update_wrapper(unit_wrapper, func)
+        return unit_wrapper
 
     def add_checks(self, func, checks):
         """Build a checker function and use it to decorate func.
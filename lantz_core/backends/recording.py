@@ -0,0 +1,268 @@
+# -*- coding: utf-8 -*-
+"""
+    lantz_core.backends.recording
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Record the communications with an instrument and replay them offline.
+
+    A RecordingResource wraps the resource used by a driver and logs every
+    method call (write, query, read_raw, ...) with its answer and duration. A
+    ReplayResource later answers the same calls from the log, optionally
+    emulating the original durations, which allows to profile the Python side
+    of a driver without the instrument. Drivers relying on BaseVisaDriver can
+    use them by setting their transport_factory attribute to the value
+    returned by recording_transport or replay_transport.
+
+    The log is a sequence of pickled records.
+
+    :copyright: 2015 by Lantz Authors, see AUTHORS for more details.
+    :license: BSD, see LICENSE for more details.
+
+"""
+from __future__ import (division, unicode_literals, print_function,
+                        absolute_import)
+import logging
+from collections import namedtuple
+from traceback import format_exc
+from threading import Lock
+from time import time, sleep
+
+from future.moves import pickle
+from future.utils import raise_from
+
+from ..errors import LantzError
+
+#: Record of a call performed on a resource. key is the representation of the
+#: arguments, success indicates whether result is the returned value or the
+#: raised exception, timestamp is the time at which the call started,
+#: duration the time it took in seconds and traceback the formatted traceback
+#: of the exception (None for successful calls).
+Record = namedtuple('Record', 'method key success result timestamp duration '
+                    'traceback')
+Record.__new__.__defaults__ = (None,)
+
+
+class RecordedTraceback(Exception):
+    """Traceback of an error raised while recording, attached as the cause of
+    the error raised when replaying.
+
+    """
+    def __init__(self, tb):
+        super(RecordedTraceback, self).__init__(tb)
+        self.tb = tb
+
+    def __str__(self):
+        return self.tb
+
+
+def read_log(path):
+    """Iterate over the records of a log.
+
+    """
+    with open(path, 'rb') as f:
+        while True:
+            try:
+                yield Record(*pickle.load(f))
+            except EOFError:
+                return
+
+
+class RecordingResource(object):
+    """Resource wrapper logging all the calls performed on a resource.
+
+    Reading and setting attributes are forwarded to the resource without
+    being recorded.
+
+    Parameters
+    ----------
+    resource :
+        Resource whose calls should be recorded.
+    path : unicode
+        Path of the log. Records are appended if the file exists.
+
+    """
+    def __init__(self, resource, path):
+        object.__setattr__(self, '_resource', resource)
+        object.__setattr__(self, '_log', open(path, 'ab'))
+        object.__setattr__(self, '_lock', Lock())
+
+    def close(self):
+        """Close the resource and the log.
+
+        """
+        try:
+            self._call('close', (), {})
+        finally:
+            with self._lock:
+                self._log.close()
+
+    def __getattr__(self, name):
+        attr = getattr(self._resource, name)
+        if not callable(attr):
+            return attr
+
+        def recorded(*args, **kwargs):
+            return self._call(name, args, kwargs)
+        return recorded
+
+    def __setattr__(self, name, value):
+        setattr(self._resource, name, value)
+
+    def __delattr__(self, name):
+        delattr(self._resource, name)
+
+    def _call(self, method, args, kwargs):
+        """Call a method of the resource and record it.
+
+        """
+        start = time()
+        try:
+            result = getattr(self._resource, method)(*args, **kwargs)
+        except Exception as e:
+            self._record(method, args, kwargs, False, e, start, format_exc())
+            raise
+        self._record(method, args, kwargs, True, result, start)
+        return result
+
+    def _record(self, method, args, kwargs, success, result, start,
+                tb=None):
+        """Write a record in the log.
+
+        """
+        duration = time() - start
+        record = (method, _make_key(args, kwargs), success, result, start,
+                  duration, tb)
+        try:
+            data = pickle.dumps(record, pickle.HIGHEST_PROTOCOL)
+        except Exception:
+            logger = logging.getLogger(__name__)
+            logger.warning('Recording the representation of the result of '
+                           '%s which cannot be pickled', method)
+            # Errors must remain exceptions to be raised again when replaying.
+            stored = repr(result) if success else RuntimeError(repr(result))
+            data = pickle.dumps(record[:3] + (stored,) + record[4:],
+                                pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            if not self._log.closed:
+                self._log.write(data)
+                self._log.flush()
+
+
+class ReplayResource(object):
+    """Resource answering the calls from a log.
+
+    Parameters
+    ----------
+    path : unicode
+        Path of the log to replay.
+    speed : float or None, optional
+        Factor by which to accelerate the replay. Each call is made to last
+        its recorded duration divided by speed. None means that the answers
+        are returned immediately.
+    strict : bool, optional
+        Whether to check that the arguments of the calls match the recorded
+        ones. The called method must always match.
+    attributes : dict, optional
+        Initial values of the attributes of the resource (timeout, ...).
+
+    Notes
+    -----
+    Only the methods appearing in the log can be called, accessing any other
+    attribute which was not set raises an AttributeError.
+
+    """
+    def __init__(self, path, speed=None, strict=True, attributes=None):
+        records = list(read_log(path))
+        object.__setattr__(self, '_records', records)
+        object.__setattr__(self, '_methods',
+                           frozenset(r.method for r in records))
+        object.__setattr__(self, '_index', 0)
+        object.__setattr__(self, '_speed', speed)
+        object.__setattr__(self, '_strict', strict)
+        object.__setattr__(self, '_attributes', dict(attributes or {}))
+        object.__setattr__(self, '_lock', Lock())
+
+    @property
+    def remaining(self):
+        """Number of records which have not been replayed yet.
+
+        """
+        return len(self._records) - self._index
+
+    def rewind(self):
+        """Restart replaying from the first record.
+
+        """
+        object.__setattr__(self, '_index', 0)
+
+    def __getattr__(self, name):
+        if name in self._attributes:
+            return self._attributes[name]
+        if name.startswith('_') or name not in self._methods:
+            raise AttributeError(name)
+
+        def replayed(*args, **kwargs):
+            return self._replay(name, args, kwargs)
+        return replayed
+
+    def __setattr__(self, name, value):
+        self._attributes[name] = value
+
+    def __delattr__(self, name):
+        self._attributes.pop(name, None)
+
+    def _replay(self, method, args, kwargs):
+        """Answer a call using the next record.
+
+        """
+        with self._lock:
+            if self._index >= len(self._records):
+                msg = 'No more recorded calls, cannot replay {}'
+                raise LantzError(msg.format(method))
+            record = self._records[self._index]
+            key = _make_key(args, kwargs)
+            if (record.method != method or
+                    (self._strict and record.key != key)):
+                msg = 'Call {}{} does not match the recorded call {}{}'
+                raise LantzError(msg.format(method, key, record.method,
+                                            record.key))
+            object.__setattr__(self, '_index', self._index + 1)
+
+        if self._speed:
+            sleep(record.duration/self._speed)
+        if not record.success:
+            if record.traceback:
+                raise_from(record.result, RecordedTraceback(record.traceback))
+            raise record.result
+        return record.result
+
+
+def recording_transport(path):
+    """Build a transport factory recording the communications of a driver.
+
+    """
+    def factory(driver):
+        return RecordingResource(driver.open_visa_resource(), path)
+    return factory
+
+
+def replay_transport(path, speed=None, strict=True, attributes=None):
+    """Build a transport factory replaying the communications from a log.
+
+    The same ReplayResource is used when the connection is re-opened.
+
+    """
+    resource = []
+
+    def factory(driver):
+        if not resource:
+            resource.append(ReplayResource(path, speed, strict, attributes))
+        return resource[0]
+    return factory
+
+
+def _make_key(args, kwargs):
+    """Build the representation of the arguments of a call.
+
+    """
+    return repr((args, sorted(kwargs.items())))
@@ -14,10 +14,12 @@ from __future__ import (division, unicode_literals, print_function,
 
 import os
 import logging
+from functools import partial
 from inspect import cleandoc
-from time import sleep
+from time import sleep, time
 from future.builtins import str
 from future.utils import raise_with_traceback
+from past.builtins import basestring
 
 try:
     from pyvisa.highlevel import ResourceManager
@@ -29,8 +31,15 @@ except ImportError:
     msg = 'The PyVISA library is necessary to use the visa backend.'
     raise_with_traceback(ImportError(msg))
 
+try:
+    import numpy as np
+    NUMPY_SUPPORT = True
+except ImportError:
+    NUMPY_SUPPORT = False
+
 from ..base_driver import BaseDriver
-from ..util import byte_to_dict
+from ..background import BackgroundProducer
+from ..util import byte_to_dict, parse_ascii_values
 from ..action import Action
 from ..errors import InterfaceNotSupported, TimeoutError
 
@@ -301,10 +310,25 @@ class BaseVisaDriver(BaseDriver):
         else:
             return user_kwargs
 
+    #: Callable taking the driver as argument and returning the resource to
+    #: use to communicate with the instrument, or None to simply open the
+    #: VISA resource. This allows to wrap the resource, to record the
+    #: communications for example (see lantz_core.backends.recording).
+    transport_factory = None
+
     def initialize(self):
+        factory = self.transport_factory
+        if factory is not None:
+            self._resource = factory(self)
+        else:
+            self._resource = self.open_visa_resource()
+
+    def open_visa_resource(self):
+        """Open the VISA resource corresponding to this driver.
+
+        """
         rm = self._resource_manager
-        self._resource = rm.open_resource(self.resource_name,
-                                          **self.resource_kwargs)
+        return rm.open_resource(self.resource_name, **self.resource_kwargs)
 
     def finalize(self):
         self._resource.close()
@@ -351,7 +375,8 @@ class BaseVisaDriver(BaseDriver):
         """Clears this resource.
 
         """
-        self._resource.clear()
+        with self.io_lock:
+            self._resource.clear()
 
     def install_handler(self, event_type, handler, user_handle=None):
         """See Pyvisa docs.
@@ -395,9 +420,19 @@ class VisaMessageDriver(BaseVisaDriver):
                    'Request',
                    7)
 
+    #: Separator used to join the commands sent when committing a transaction
+    #: in a single message (ex: ';' for SCPI instruments). None means that
+    #: each command is sent in its own message.
+    COMMAND_SEPARATOR = None
+
+    # List of the commands buffered while a command group is open. Uploads of
+    # tables of values are buffered as callables.
+    _command_group = None
+
     @Action()
     def read_status_byte(self):
-        return byte_to_dict(self._resource.read_stb(), self.STATUS_BYTE)
+        with self.io_lock:
+            return byte_to_dict(self._resource.read_stb(), self.STATUS_BYTE)
 
     def default_get_feature(self, feat, cmd, *args, **kwargs):
         """Query the value using the provided command.
@@ -406,16 +441,88 @@ class VisaMessageDriver(BaseVisaDriver):
         being passed on to the instrument.
 
         """
-        return self._resource.query(cmd.format(*args, **kwargs))
+        with self.io_lock:
+            return self._resource.query(cmd.format(*args, **kwargs))
 
     def default_set_feature(self, feat, cmd, *args, **kwargs):
         """Set the iproperty value of the instrument.
 
         The command is formatted using the provided args and kwargs before
-        being passed on to the instrument.
+        being passed on to the instrument. Inside a command group the command
+        is buffered and None is returned.
+
+        """
+        with self.io_lock:
+            cmd = cmd.format(*args, **kwargs)
+            if self._command_group is not None:
+                self._command_group.append(cmd)
+                return None
+            return self._resource.write(cmd)
+
+    def default_set_values(self, feat, cmd, values, *args, **kwargs):
+        """Upload a table of values following the formatted command.
+
+        The values are sent as a binary block using the datatype and
+        endianness of the feature, or as ASCII values if its datatype is None.
+        Inside a command group the upload is buffered, to be performed in
+        order with the other commands, and None is returned.
+
+        """
+        with self.io_lock:
+            message = cmd.format(*args, **kwargs)
+            if self._command_group is not None:
+                self._command_group.append(partial(self._write_values, feat,
+                                                   message, values))
+                return None
+            return self._write_values(feat, message, values)
+
+    def begin_command_group(self):
+        """Buffer the commands if the driver declares a COMMAND_SEPARATOR.
+
+        """
+        if self.COMMAND_SEPARATOR is not None:
+            self._command_group = []
+
+    def end_command_group(self, send=True):
+        """Send the buffered commands in a single message.
+
+        Uploads of tables of values are sent in their own messages, in the
+        order in which they were performed.
 
         """
-        return self._resource.write(cmd.format(*args, **kwargs))
+        with self.io_lock:
+            commands, self._command_group = self._command_group, None
+            if not send or not commands:
+                return
+
+            # Uploads cannot be joined to the other commands so the commands
+            # buffered before them are sent first.
+            separator = self.COMMAND_SEPARATOR
+            pending = []
+            for cmd in commands:
+                if callable(cmd):
+                    if pending:
+                        self._resource.write(separator.join(pending))
+                        pending = []
+                    cmd()
+                else:
+                    pending.append(cmd)
+            if pending:
+                self._resource.write(separator.join(pending))
+
+    def _write_values(self, feat, message, values):
+        """Write a table of values using the format of the feature.
+
+        """
+        with self.io_lock:
+            if feat.datatype is None:
+                separator = feat.separator or ' '
+                return self._resource.write_ascii_values(message, values,
+                                                         feat.converter,
+                                                         separator)
+            return self._resource.write_binary_values(message, values,
+                                                      feat.datatype,
+                                                      feat.is_big_endian)
 
     @classmethod
     def _via_usb(cls, resource_type='INSTR', serial_number=None,
@@ -708,22 +815,25 @@ class VisaMessageDriver(BaseVisaDriver):
         """See Pyvisa docs.
 
         """
-        return self._resource.write_raw(message)
+        with self.io_lock:
+            return self._resource.write_raw(message)
 
     def write(self, message, termination=None, encoding=None):
         """See Pyvisa docs.
 
         """
-        return self._resource.write(message, termination, encoding)
+        with self.io_lock:
+            return self._resource.write(message, termination, encoding)
 
     def write_ascii_values(self, message, values, converter='f', separator=',',
                            termination=None, encoding=None):
         """See Pyvisa docs.
 
         """
-        return self._resource.write_ascii_values(message, values, converter,
-                                                 separator, termination,
-                                                 encoding)
+        with self.io_lock:
+            return self._resource.write_ascii_values(message, values,
+                                                     converter, separator,
+                                                     termination, encoding)
 
     def write_binary_values(self, message, values, datatype='f',
                             is_big_endian=False, termination=None,
@@ -731,51 +841,89 @@ class VisaMessageDriver(BaseVisaDriver):
         """See Pyvisa docs.
 
         """
-        return self._resource.write_binary_values(message, values, datatype,
-                                                  is_big_endian, termination,
-                                                  encoding)
+        with self.io_lock:
+            return self._resource.write_binary_values(message, values,
+                                                      datatype, is_big_endian,
+                                                      termination, encoding)
 
     def read_raw(self, size=None):
         """See Pyvisa docs.
 
         """
-        return self._resource.read_raw(size)
+        with self.io_lock:
+            return self._resource.read_raw(size)
 
     def read(self, termination=None, encoding=None):
         """See Pyvisa docs.
 
         """
-        return self._resource.read(termination, encoding)
+        with self.io_lock:
+            return self._resource.read(termination, encoding)
 
     def read_values(self, fmt=None, container=list):
         """See Pyvisa docs.
 
         """
-        return self._resource.read_values(fmt, container)
+        with self.io_lock:
+            return self._resource.read_values(fmt, container)
 
     def query(self, message, delay=None):
         """See Pyvisa docs.
 
         """
-        with self.lock:
+        with self.io_lock:
             return self._resource.query(message, delay)
 
     def query_ascii_values(self, message, converter='f', separator=',',
                            container=list, delay=None):
         """See Pyvisa docs.
 
+        When numpy arrays of floats are requested the answer is parsed using
+        parse_ascii_values.
+
         """
-        with self.lock:
+        if (NUMPY_SUPPORT and container in (np.array, np.asarray) and
+                converter in ('f', 'e', 'g', float) and
+                isinstance(separator, basestring)):
+            return self.query_ascii_array(message, separator, delay=delay)
+        with self.io_lock:
             return self._resource.query_ascii_values(message, converter,
                                                      separator, container,
                                                      delay)
 
+    def query_ascii_array(self, message, separator=',', dtype=float,
+                          out=None, delay=None):
+        """Query numeric ASCII values and parse them straight into an array.
+
+        Parameters
+        ----------
+        message : unicode
+            Query to send to the instrument.
+        separator : unicode or None, optional
+            Separator between the values, None meaning any whitespace.
+        dtype : numpy dtype, optional
+            Type of the values.
+        out : numpy.ndarray, optional
+            Preallocated array in which to store the values.
+        delay : float, optional
+            Delay between the write and the read operations.
+
+        Returns
+        -------
+        values : numpy.ndarray
+            Parsed values (a view on out if it was provided).
+
+        """
+        with self.io_lock:
+            answer = self._resource.query(message, delay)
+        return parse_ascii_values(answer, separator, dtype, out)
+
     def query_binary_values(self, message, datatype='f', is_big_endian=False,
                             container=list, delay=None, header_fmt='ieee'):
         """See Pyvisa docs.
 
         """
-        with self.lock:
+        with self.io_lock:
             return self._resource.query_binary_values(message, datatype,
                                                       is_big_endian, container,
                                                       delay, header_fmt)
@@ -785,7 +933,106 @@ class VisaMessageDriver(BaseVisaDriver):
         """Sends a software trigger to the device.
 
         """
-        self._resource.assert_trigger()
+        with self.io_lock:
+            self._resource.assert_trigger()
+
+    def stream(self, fetch, trigger=None, wait=None, n=None, datatype='f',
+               is_big_endian=False, container=None, poll_interval=1e-3,
+               wait_timeout=None, prefetch=1):
+        """Continuously acquire blocks of data from the instrument.
+
+        Each block is acquired by triggering the instrument, waiting for the
+        data to be available and fetching them, the communication lock of the
+        driver (see io_lock) being held during the whole sequence. The
+        acquisition takes place in a background thread so that the next block
+        is acquired while the current one is processed.
+
+        Parameters
+        ----------
+        fetch : unicode or callable
+            Command used to query the block as binary values or callable
+            taking the driver as single argument and returning the block.
+        trigger : unicode, bool or callable, optional
+            Command to write to trigger the instrument, True to send a
+            software trigger or callable taking the driver as single argument.
+            The instrument is not triggered by default.
+        wait : int or callable, optional
+            Mask of the status byte bits signaling that data are available
+            (the status byte is polled till one of them is set) or callable
+            taking the driver as single argument and returning when the data
+            are available. By default the data are fetched right away.
+        n : int, optional
+            Number of blocks to acquire. By default the acquisition goes on
+            until the stream is stopped.
+        datatype : unicode, optional
+            Format of the binary values (see query_binary_values).
+        is_big_endian : bool, optional
+            Endianness of the binary values.
+        container : callable, optional
+            Container type for the values. Numpy arrays are used if available,
+            lists otherwise.
+        poll_interval : float, optional
+            Time in seconds between two reads of the status byte.
+        wait_timeout : float, optional
+            Time in seconds after which to give up waiting for the data.
+        prefetch : int, optional
+            Number of blocks which can be acquired ahead of the consumer.
+
+        Returns
+        -------
+        stream : BackgroundProducer
+            Iterator yielding the acquired blocks. It should be stopped (or
+            used as a context manager) when it is not exhausted.
+
+        """
+        if container is None:
+            container = np.array if NUMPY_SUPPORT else list
+
+        if isinstance(fetch, basestring):
+            fetch_cmd = fetch
+
+            def fetch(driver):
+                return driver.query_binary_values(fetch_cmd, datatype,
+                                                  is_big_endian, container)
+
+        if trigger is True:
+            def trigger(driver):
+                driver._resource.assert_trigger()
+        elif isinstance(trigger, basestring):
+            trigger_cmd = trigger
+
+            def trigger(driver):
+                driver._resource.write(trigger_cmd)
+
+        if wait is not None and not callable(wait):
+            mask = wait
+
+            def wait(driver):
+                start = time()
+                while not driver._resource.read_stb() & mask:
+                    if (wait_timeout is not None and
+                            time() - start > wait_timeout):
+                        msg = 'No data available after {} s'
+                        raise TimeoutError(msg.format(wait_timeout))
+                    sleep(poll_interval)
+
+        # Mutable counter usable from the closure.
+        acquired = [0]
+
+        def acquire():
+            if n is not None and acquired[0] >= n:
+                raise StopIteration()
+            if trigger:
+                trigger(self)
+            if wait:
+                wait(self)
+            block = fetch(self)
+            acquired[0] += 1
+            return block
+
+        return BackgroundProducer(acquire, prefetch,
+                                  'Stream ' + self.resource_name,
+                                  self.io_lock)
 
 
 class VisaRegisterDriver(BaseVisaDriver):
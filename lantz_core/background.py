@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+"""
+    lantz_core.background
+    ~~~~~~~~~~~~~~~~~~~~~
+
+    Tools to perform instrument communications in a background thread.
+
+    :copyright: 2015 by Lantz Authors, see AUTHORS for more details.
+    :license: BSD, see LICENSE for more details.
+
+"""
+from __future__ import (division, unicode_literals, print_function,
+                        absolute_import)
+import sys
+from threading import Thread, Event
+
+from future.moves.queue import Queue, Full, Empty
+from future.utils import raise_
+
+# Sentinel put in the queue once the production ended.
+_END = object()
+
+
+class BackgroundProducer(object):
+    """Iterator whose items are produced in a background thread.
+
+    The producer function is called repeatedly in a dedicated thread and its
+    results are queued, so that the next items are produced while the
+    consumer processes the current one. Errors occurring in the producer are
+    raised in the consumer thread when the item which failed to be produced is
+    requested.
+
+    Parameters
+    ----------
+    produce : callable
+        Callable taking no argument and returning the next item. It should
+        raise StopIteration once no more items can be produced.
+    maxsize : int, optional
+        Number of produced items which can wait to be consumed. The producer
+        is blocked when this number is reached, hence at most maxsize + 1 items
+        are produced ahead of the consumer.
+    name : unicode, optional
+        Name of the background thread.
+    lock : optional
+        Lock held while producing each item (such as the communication lock
+        of a driver).
+
+    """
+    def __init__(self, produce, maxsize=1, name=None, lock=None):
+        self._produce = produce
+        self._lock = lock
+        self._queue = Queue(maxsize)
+        self._stop = Event()
+        self._done = False
+        self._thread = Thread(target=self._run,
+                              name=name or 'BackgroundProducer')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self, timeout=None):
+        """Stop producing new items and discard the queued ones.
+
+        Parameters
+        ----------
+        timeout : float, optional
+            Time to wait for the background thread to exit. The item being
+            produced when this method is called is always completed.
+
+        """
+        self._stop.set()
+        self._done = True
+        self._discard_queued()
+        if self._thread.is_alive():
+            self._thread.join(timeout)
+        self._discard_queued()
+        # Wake up a consumer waiting for an item in another thread.
+        try:
+            self._queue.put_nowait((True, _END))
+        except Full:
+            pass
+
+    @property
+    def running(self):
+        """Whether or not the background thread is still producing items.
+
+        """
+        return self._thread.is_alive()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self._done:
+            raise StopIteration()
+
+        success, item = self._queue.get()
+        if item is _END:
+            self._done = True
+            raise StopIteration()
+        if not success:
+            self._done = True
+            raise_(*item)
+        return item
+
+    # Python 2 compatibility.
+    next = __next__
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def _run(self):
+        """Produce items till the production ends or the producer is stopped.
+
+        """
+        try:
+            while not self._stop.is_set():
+                if self._lock is not None:
+                    with self._lock:
+                        item = self._produce()
+                else:
+                    item = self._produce()
+                self._put((True, item))
+        except StopIteration:
+            self._put((True, _END))
+        except Exception:
+            self._put((False, sys.exc_info()))
+
+    def _put(self, item):
+        """Queue an item, giving up if the producer is stopped.
+
+        """
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=0.05)
+                return
+            except Full:
+                continue
+
+    def _discard_queued(self):
+        """Remove all queued items.
+
+        """
+        while True:
+            try:
+                self._queue.get_nowait()
+            except Empty:
+                break
@@ -12,9 +12,17 @@
 
 from __future__ import (division, unicode_literals, print_function,
                         absolute_import)
+from bisect import bisect_left
+from threading import RLock
+from time import time
+from collections import OrderedDict
+from past.builtins import basestring
 
 from .has_features import AbstractChannel
 from .base_subsystem import SubSystem
+from .errors import LantzError
+from .features.feature import Feature
+from .features.util import PostSetComposer
 
 
 class Channel(SubSystem):
@@ -44,35 +52,103 @@ class Channel(SubSystem):
         Id of the channel used by the instrument to correctly route the calls.
 
     """
+    #: Whether or not the channel uses its own lock instead of the one of its
+    #: parent. This allows to access different channels concurrently. The
+    #: communication lock of the parent (see HasFeatures.io_lock) is still
+    #: acquired when a call is piped to the parent so that the communications
+    #: with the instrument remain serialized.
+    #: Channels reachable through an independent connection (a separate
+    #: socket for example) should override default_get_feature,
+    #: default_set_feature and default_check_operation to use it.
+    independent_lock = False
+
+    #: Time in seconds during which the list of available channels is cached
+    #: by the container. None means the list is kept until explicitly
+    #: discarded and 0 that it is queried each time it is needed.
+    available_ttl = None
+
+    #: Separator used to join the ids of several channels when a single
+    #: command addresses them, ex: ',' for SCPI channel lists such as
+    #: (@1,2,3). Feature commands should then use the {id} placeholder to
+    #: indicate where the channel id goes. The instrument answer is split using
+    #: the same separator. None means that bulk operations on channels are
+    #: performed one channel at a time.
+    channel_list_separator = None
+
     def __init__(self, parent, id, **kwargs):
         super(Channel, self).__init__(parent, **kwargs)
         self.id = id
+        self._lock = RLock() if self.independent_lock else None
 
     @property
     def lock(self):
-        """Access parent lock."""
+        """Access the channel lock, which is the parent lock unless the
+        channel uses an independent lock.
+
+        """
+        if self._lock is not None:
+            return self._lock
         return self.parent.lock
 
+    def reopen_connection(self):
+        """Channels simply pipes the call to their parent.
+
+        """
+        with self.io_lock:
+            self.parent.reopen_connection()
+
     def default_get_feature(self, feat, cmd, *args, **kwargs):
         """Channels simply pipes the call to their parent.
 
         """
         kwargs['id'] = self.id
-        return self.parent.default_get_feature(feat, cmd, *args, **kwargs)
+        with self.io_lock:
+            return self.parent.default_get_feature(feat, cmd, *args, **kwargs)
 
     def default_set_feature(self, feat, cmd, *args, **kwargs):
         """Channels simply pipes the call to their parent.
 
         """
         kwargs['id'] = self.id
-        return self.parent.default_set_feature(feat, cmd, *args, **kwargs)
+        with self.io_lock:
+            return self.parent.default_set_feature(feat, cmd, *args, **kwargs)
+
+    def default_set_values(self, feat, cmd, values, *args, **kwargs):
+        """Channels simply pipes the call to their parent.
+
+        """
+        kwargs['id'] = self.id
+        with self.io_lock:
+            return self.parent.default_set_values(feat, cmd, values, *args,
+                                                  **kwargs)
 
     def default_check_operation(self, feat, value, i_value, response):
         """Channels simply pipes the call to their parent.
 
         """
-        return self.parent.default_check_operation(feat, value, i_value,
-                                                   response)
+        with self.io_lock:
+            return self.parent.default_check_operation(feat, value, i_value,
+                                                       response)
+
+    @classmethod
+    def format_channel_list(cls, ids):
+        """Format a list of channel ids so that a single command can address
+        all of them.
+
+        """
+        return cls.channel_list_separator.join('{}'.format(i) for i in ids)
+
+    @classmethod
+    def split_channel_list_answer(cls, answer, ids):
+        """Split the answer to a command addressing multiple channels into the
+        answers for each channel.
+
+        """
+        answers = answer.strip().split(cls.channel_list_separator)
+        if len(answers) != len(ids):
+            msg = 'Expected {} answers for channels {}, got {}'
+            raise LantzError(msg.format(len(ids), ids, answer))
+        return answers
 
 AbstractChannel.register(Channel)
 
@@ -97,6 +173,12 @@ class ChannelContainer(object):
     aliases : dict
         Dict mapping aliases names to the real channel id to use.
 
+    Notes
+    -----
+    The list of available channels is cached according to the available_ttl
+    attribute of the channel class. Use discard_available to force a new
+    query.
+
     """
 
     def __init__(self, cls, parent, name, list_available, aliases):
@@ -106,13 +188,42 @@ class ChannelContainer(object):
         self._parent = parent
         self._aliases = aliases
         self._list = list_available
+        self._available = None
+        self._listed_at = 0.0
 
     @property
     def available(self):
         """List the available channels.
 
         """
-        return self._list(self._parent)
+        available = self._available
+        ttl = self._cls.available_ttl
+        if available is None or (ttl is not None and
+                                 time() - self._listed_at >= ttl):
+            available = self._list(self._parent)
+            if not isinstance(available, (list, tuple)):
+                available = tuple(available)
+            self._available = available
+            self._listed_at = time()
+
+        return available
+
+    def discard_available(self):
+        """Discard the cached list of available channels.
+
+        The next access to available will query the parent.
+
+        """
+        self._available = None
+
+    @property
+    def created_channels(self):
+        """List the channels instances created so far.
+
+        Accessing this never requires to query the available channels.
+
+        """
+        return list(self._channels.values())
 
     @property
     def aliases(self):
@@ -121,7 +232,51 @@ class ChannelContainer(object):
         """
         return self._aliases.copy()
 
+    def group(self, ids):
+        """Build a group of channels on which to perform bulk operations.
+
+        Parameters
+        ----------
+        ids : iterable
+            Ids (or aliases) of the channels to include in the group.
+
+        """
+        return ChannelGroup(self, ids)
+
+    def get_all(self, name):
+        """Read the value of a feature on all the available channels.
+
+        See ChannelGroup.get for details.
+
+        """
+        return self.group(self.available).get(name)
+
+    def set_all(self, name, value):
+        """Set the value of a feature on all the available channels.
+
+        See ChannelGroup.set for details.
+
+        """
+        return self.group(self.available).set(name, value)
+
     def __getitem__(self, ch_id):
+        # Slices are used to select a group of channels by id:
+        # ch['A':'D'] selects the available channels from 'A' (included) to
+        # 'D' (excluded) in the sorted list of ids, the step being counted in
+        # positions in that list.
+        if isinstance(ch_id, slice):
+            aliases = self._aliases
+            ids = [i for i in self.available if i not in aliases]
+            try:
+                ids = sorted(ids)
+                ordered = True
+            except TypeError:
+                # Ids which cannot be compared are kept in listing order.
+                ordered = False
+            start = self._slice_position(ids, ch_id.start, ordered)
+            stop = self._slice_position(ids, ch_id.stop, ordered)
+            return self.group(ids[start:stop:ch_id.step])
+
         if ch_id in self._aliases:
             ch_id = self._aliases[ch_id]
 
@@ -138,3 +293,237 @@ class ChannelContainer(object):
     def __iter__(self):
         for id in self.available:
             yield self[id]
+
+    def _slice_position(self, ids, bound, ordered):
+        """Position in the list of ids of a bound of a slice.
+
+        Bounds which are not available channels can only be located by
+        comparison when the ids are sorted.
+
+        """
+        if bound is None:
+            return None
+        bound = self._aliases.get(bound, bound)
+        if bound in ids:
+            return ids.index(bound)
+        if ordered:
+            try:
+                return bisect_left(ids, bound)
+            except TypeError:
+                pass
+        raise KeyError('{} is not an available channel.'.format(bound))
+
+
+class ChannelGroup(object):
+    """Group of channels on which features can be accessed in bulk.
+
+    When the channel class declares a channel_list_separator, features using
+    the default get and set mechanisms are accessed using a single command for
+    all the channels of the group. Otherwise the channels are accessed one at
+    a time.
+
+    Parameters
+    ----------
+    container : ChannelContainer
+        Container from which the channels are retrieved.
+
+    ids : iterable
+        Ids (or aliases) of the channels to include in the group.
+
+    """
+    def __init__(self, container, ids):
+        self._container = container
+        self._channels = [container[i] for i in ids]
+
+    @property
+    def ids(self):
+        """Ids of the channels in the group.
+
+        """
+        return [ch.id for ch in self._channels]
+
+    def get(self, name):
+        """Read the value of a feature on all the channels of the group.
+
+        Cached values are used when available, the others are queried.
+
+        Parameters
+        ----------
+        name : unicode
+            Name of the feature to read.
+
+        Returns
+        -------
+        values : OrderedDict
+            Values of the feature for each channel id.
+
+        """
+        channels = self._channels
+        to_query = [ch for ch in channels if name not in ch._cache]
+        values = {}
+        if len(to_query) > 1:
+            feat = to_query[0].get_feat(name)
+            if _can_broadcast(type(to_query[0]), feat, 'get'):
+                values = self._broadcast_get(feat, to_query)
+
+        for ch in channels:
+            if ch.id not in values:
+                values[ch.id] = getattr(ch, name)
+
+        return OrderedDict((ch.id, values[ch.id]) for ch in channels)
+
+    def set(self, name, value):
+        """Set the value of a feature on all the channels of the group.
+
+        Unlike a set on a single channel, the value is always sent to the
+        instrument even if it matches the cached value. Inside a transaction,
+        the value is staged for each channel as for a set on a single channel,
+        so that it can be rolled back.
+
+        Parameters
+        ----------
+        name : unicode
+            Name of the feature to set.
+
+        value :
+            Value to set on all the channels.
+
+        """
+        channels = self._channels
+        if len(channels) > 1 and not channels[0].in_transaction:
+            feat = channels[0].get_feat(name)
+            if _can_broadcast(type(channels[0]), feat, 'set'):
+                if self._broadcast_set(feat, channels, value):
+                    return
+
+        for ch in channels:
+            setattr(ch, name, value)
+
+    def __iter__(self):
+        return iter(self._channels)
+
+    def __len__(self):
+        return len(self._channels)
+
+    # =========================================================================
+    # --- Private API ---------------------------------------------------------
+    # =========================================================================
+
+    def _broadcast_get(self, feat, channels):
+        """Query the value of feature for multiple channels at once.
+
+        """
+        parent = self._container._parent
+        ch_cls = type(channels[0])
+        ids = [ch.id for ch in channels]
+        values = {}
+        with parent.lock:
+            for ch in channels:
+                feat.pre_get(ch)
+
+            ch_list = ch_cls.format_channel_list(ids)
+            i = -1
+            with parent.io_lock:
+                while i < feat._retries:
+                    try:
+                        i += 1
+                        answer = parent.default_get_feature(feat, feat._getter,
+                                                            id=ch_list)
+                        break
+                    except parent.retries_exceptions:
+                        if i != feat._retries:
+                            parent.reopen_connection()
+                            continue
+                        else:
+                            raise
+
+            answers = ch_cls.split_channel_list_answer(answer, ids)
+            for ch, ans in zip(channels, answers):
+                val = feat.post_get(ch, ans)
+                if ch.use_cache:
+                    ch._cache[feat.name] = feat._to_cache(val)
+                values[ch.id] = val
+
+        return values
+
+    def _broadcast_set(self, feat, channels, value):
+        """Set the value of feature for multiple channels at once.
+
+        Returns
+        -------
+        done : bool
+            False if the value to send to the instrument differs between
+            channels, in which case nothing was sent.
+
+        """
+        parent = self._container._parent
+        ch_cls = type(channels[0])
+        with parent.lock:
+            i_values = [feat.pre_set(ch, value) for ch in channels]
+            i_val = i_values[0]
+            if any(v != i_val for v in i_values[1:]):
+                return False
+
+            ch_list = ch_cls.format_channel_list([ch.id for ch in channels])
+            i = -1
+            with parent.io_lock:
+                while i < feat._retries:
+                    try:
+                        i += 1
+                        resp = parent.default_set_feature(feat, feat._setter,
+                                                          i_val, id=ch_list)
+                        break
+                    except parent.retries_exceptions:
+                        if i != feat._retries:
+                            parent.reopen_connection()
+                            continue
+                        else:
+                            raise
+
+            # Cache discards are specific to each channel, while the
+            # operation is checked once for all channels.
+            post_set = feat.post_set
+            if isinstance(post_set, PostSetComposer):
+                # Only discards can be composed (see _can_broadcast).
+                for ch in channels:
+                    feat.discard_cache(ch, value, i_val, resp)
+            else:
+                post_set(channels[0], value, i_val, resp)
+
+            for ch in channels:
+                if ch.use_cache:
+                    ch._cache[feat.name] = feat._to_cache(value)
+                ch.discard_dependents(feat.name)
+
+        return True
+
+
+def _can_broadcast(ch_cls, feat, operation):
+    """Check whether a feature can be accessed on multiple channels at once.
+
+    This requires the channel class to declare a channel list separator and
+    the feature to rely on the default mechanisms of the driver.
+
+    """
+    if not ch_cls.channel_list_separator:
+        return False
+
+    if operation == 'get':
+        return (isinstance(feat._getter, basestring) and
+                _is_default(feat.get, 'get'))
+
+    else:
+        post_set = feat.post_set
+        if isinstance(post_set, PostSetComposer):
+            default_post_set = set(post_set._names) <= set(['discard'])
+        else:
+            default_post_set = _is_default(post_set, 'post_set')
+        return (isinstance(feat._setter, basestring) and
+                _is_default(feat.set, 'set') and default_post_set)
+
+
+def _is_default(method, name):
+    """Check whether a feature method is the default one of Feature.
+
+    """
+    return getattr(method, '__func__', None) is Feature.__dict__[name]
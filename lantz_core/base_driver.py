@@ -10,41 +10,202 @@
 """
 from __future__ import (division, unicode_literals, print_function,
                         absolute_import)
+import logging
 from future.utils import with_metaclass
-from threading import RLock
+from threading import Lock, RLock, Thread, current_thread
+from time import time
 from weakref import WeakValueDictionary
+from collections import deque, OrderedDict
 from textwrap import fill
 from inspect import cleandoc
 
-from .errors import TimeoutError
+from .errors import TimeoutError, LantzError
 from .has_features import HasFeaturesMeta, HasFeatures
+from .features.feature import send_chain
 
 
 class InstrumentSigleton(HasFeaturesMeta):
     """Metaclass ensuring that a single driver is created per instrument.
 
+    The registry of existing drivers is protected by a lock so that two threads
+    requesting the same instrument always get the same driver. This lock is
+    only held while accessing the registry, the drivers being created under a
+    lock specific to the instrument so that different instruments can be
+    opened concurrently. A driver whose initialization creates another driver
+    for the same instrument would deadlock on this lock, a RuntimeError is
+    raised instead.
+
     """
 
     _instances_cache = {}
 
-    def __call__(self, *args, **kwargs):
-        # This is done on first call rather than init to avoid useless memory
-        # allocation.
-        if self not in self._instances_cache:
-            self._instances_cache[self] = WeakValueDictionary()
+    #: Lock protecting the access to the instances cache and to the creation
+    #: locks.
+    _instances_lock = Lock()
 
-        cache = self._instances_cache[self]
-        driver_id = self.compute_id(args, kwargs)
-        if driver_id not in cache:
-            dr = super(InstrumentSigleton, self).__call__(*args, **kwargs)
+    #: Locks used while creating a driver, along with the number of threads
+    #: using them and the thread creating the driver, per class and id.
+    _creation_locks = {}
 
-            cache[driver_id] = dr
-        else:
-            dr = cache[driver_id]
-            dr.newly_created = False
+    def __call__(self, *args, **kwargs):
+        driver_id = self.compute_id(args, kwargs)
+        key = (self, driver_id)
+        with self._instances_lock:
+            # This is done on first call rather than init to avoid useless
+            # memory allocation.
+            if self not in self._instances_cache:
+                self._instances_cache[self] = WeakValueDictionary()
+
+            cache = self._instances_cache[self]
+            dr = cache.get(driver_id)
+            if dr is not None:
+                dr.newly_created = False
+                return dr
+
+            entry = self._creation_locks.setdefault(key, [Lock(), 0, None])
+            if entry[2] is current_thread():
+                msg = ('Driver {} for {} is already being created by this '
+                       'thread.')
+                raise RuntimeError(msg.format(self.__name__, driver_id))
+            entry[1] += 1
+
+        try:
+            with entry[0]:
+                # Another thread may have created the driver while we were
+                # waiting.
+                with self._instances_lock:
+                    dr = cache.get(driver_id)
+                if dr is None:
+                    entry[2] = current_thread()
+                    try:
+                        dr = super(InstrumentSigleton, self).__call__(*args,
+                                                                      **kwargs)
+                    finally:
+                        entry[2] = None
+                    with self._instances_lock:
+                        cache[driver_id] = dr
+                else:
+                    dr.newly_created = False
+        finally:
+            with self._instances_lock:
+                entry[1] -= 1
+                if not entry[1]:
+                    del self._creation_locks[key]
 
         return dr
 
+    def live_instances(self):
+        """List the drivers of this class (not subclasses) currently alive.
+
+        """
+        with self._instances_lock:
+            cache = self._instances_cache.get(self)
+            return list(cache.values()) if cache else []
+
+
+def list_drivers(cls=None):
+    """List all the drivers currently alive.
+
+    Parameters
+    ----------
+    cls : type, optional
+        If specified only the drivers which are instances of this class are
+        returned.
+
+    Returns
+    -------
+    drivers : list
+        List of the live drivers.
+
+    """
+    with InstrumentSigleton._instances_lock:
+        drivers = [d for cache in InstrumentSigleton._instances_cache.values()
+                   for d in cache.values()]
+
+    if cls is not None:
+        drivers = [d for d in drivers if isinstance(d, cls)]
+
+    return drivers
+
+
+def _call_in_parallel(drivers, method_name, max_workers):
+    """Call the same method on all the drivers using a pool of threads.
+
+    Returns
+    -------
+    failures : dict
+        Dictionary mapping the drivers whose call failed to the exception
+        raised.
+
+    """
+    if drivers is None:
+        drivers = list_drivers()
+    pending = deque(drivers)
+    failures = {}
+
+    def worker():
+        while True:
+            try:
+                driver = pending.popleft()
+            except IndexError:
+                return
+            try:
+                getattr(driver, method_name)()
+            except Exception as e:
+                failures[driver] = e
+
+    n = len(pending)
+    if max_workers:
+        n = min(n, max_workers)
+    threads = [Thread(target=worker) for _ in range(n)]
+    for t in threads:
+        t.daemon = True
+        t.start()
+    for t in threads:
+        t.join()
+
+    return failures
+
+
+def initialize_all(drivers=None, max_workers=None):
+    """Initialize several drivers in parallel.
+
+    Parameters
+    ----------
+    drivers : iterable, optional
+        Drivers to initialize. If omitted all the live drivers are initialized.
+    max_workers : int, optional
+        Maximal number of threads to use. By default one thread is used per
+        driver.
+
+    Returns
+    -------
+    failures : dict
+        Dictionary mapping the drivers which could not be initialized to the
+        exception raised.
+
+    """
+    return _call_in_parallel(drivers, 'initialize', max_workers)
+
+
+def finalize_all(drivers=None, max_workers=None):
+    """Finalize several drivers in parallel.
+
+    See initialize_all for the meaning of the arguments and return value.
+
+    """
+    return _call_in_parallel(drivers, 'finalize', max_workers)
+
+
+def reopen_all(drivers=None, max_workers=None):
+    """Reopen the connection of several drivers in parallel.
+
+    This is mainly useful to recover from a network outage. See initialize_all
+    for the meaning of the arguments and return value.
+
+    """
+    return _call_in_parallel(drivers, 'reopen_connection', max_workers)
+
 
 class BaseDriver(with_metaclass(InstrumentSigleton, HasFeatures)):
     """ Base class of all instrument drivers in Lantz.
@@ -79,6 +240,14 @@ class BaseDriver(with_metaclass(InstrumentSigleton, HasFeatures)):
         self.owner = ''
         self.newly_created = True
         self.lock = RLock()
+        self._io_lock = RLock()
+        self.checks_deferred = False
+        self._pending_checks = []
+        self._first_pending_at = None
+        self._max_pending_checks = None
+        self._max_checks_delay = None
+        self._transaction_thread = None
+        self._staged_sets = OrderedDict()
 
     @classmethod
     def compute_id(cls, args, kwargs):
@@ -149,6 +318,315 @@ class BaseDriver(with_metaclass(InstrumentSigleton, HasFeatures)):
             80)
         raise NotImplementedError(message)
 
+    @property
+    def io_lock(self):
+        """Lock serializing the communications with the instrument.
+
+        This is distinct from the driver lock so that channels using an
+        independent lock can communicate without acquiring the driver lock.
+
+        """
+        return self._io_lock
+
+    @property
+    def in_transaction(self):
+        """Whether or not the features set by the current thread are staged.
+
+        Only the thread which opened the transaction stages its sets, so that
+        channels using an independent lock are not enrolled in it.
+
+        """
+        return self._transaction_thread is current_thread()
+
+    def defer_checks(self, max_pending=None, max_delay=None):
+        """Defer the checks of the operations performed when setting features.
+
+        Instead of checking the instrument state after each set, the checks
+        are queued and performed in a single batch (see
+        default_check_operations) when flush_checks is called, when
+        max_pending checks are queued or when the first queued check is older
+        than max_delay. The delay is evaluated when a new check is queued.
+
+        The returned object can be used as a context manager which resumes the
+        checks (and flushes the pending ones) on exit.
+
+        Parameters
+        ----------
+        max_pending : int, optional
+            Number of pending checks triggering a flush.
+        max_delay : float, optional
+            Time in seconds after which the pending checks are flushed.
+
+        """
+        with self.lock:
+            self.checks_deferred = True
+            self._max_pending_checks = max_pending
+            self._max_checks_delay = max_delay
+
+        return _DeferredChecks(self)
+
+    def resume_checks(self):
+        """Stop deferring the checks and flush the pending ones.
+
+        Raises
+        ------
+        LantzError :
+            Raised if any of the pending checks fails.
+
+        """
+        with self.lock:
+            self.checks_deferred = False
+            self.flush_checks()
+
+    def queue_check(self, feat, value, i_value, response, origin=None):
+        """Queue the check of an operation when checks are deferred.
+
+        The pending checks are flushed if the maximum number of pending checks
+        or the maximum delay is reached.
+
+        Parameters
+        ----------
+        feat : Feature
+            Reference to the Feature issuing this call.
+        value :
+            Value assigned by the user.
+        i_value :
+            Value computed by the pre_set method of the Feature.
+        response :
+            Return value of the set method.
+        origin : HasFeatures, optional
+            Object on which the feature was set, the driver if omitted.
+
+        """
+        # The communication lock is used as channels using an independent
+        # lock queue their checks without holding the driver lock.
+        with self.io_lock:
+            origin = origin if origin is not None else self
+            pending = self._pending_checks
+            pending.append((origin, feat, value, i_value, response))
+            if self._first_pending_at is None:
+                self._first_pending_at = time()
+
+            max_pending = self._max_pending_checks
+            max_delay = self._max_checks_delay
+            if ((max_pending and len(pending) >= max_pending) or
+                    (max_delay is not None and
+                     time() - self._first_pending_at >= max_delay)):
+                self.flush_checks()
+
+    def flush_checks(self):
+        """Check all the pending operations.
+
+        The cached values of the features whose check failed are discarded
+        along with the ones depending on them.
+
+        Raises
+        ------
+        LantzError :
+            Raised if any of the pending checks fails. The message lists all
+            the failed operations.
+
+        """
+        with self.io_lock:
+            pending = self._pending_checks
+            if not pending:
+                return
+            self._pending_checks = []
+            self._first_pending_at = None
+
+            results = self.default_check_operations(pending)
+
+        failures = []
+        for (origin, feat, value, i_value, _), (res, details) in zip(pending,
+                                                                      results):
+            if not res:
+                # The rejected value should not be considered as the state of
+                # the instrument.
+                name = feat.name
+                cache = origin._cache
+                if (name in cache and
+                        feat._match_cache(origin, cache[name], value)):
+                    del cache[name]
+                origin.discard_dependents(name)
+                mess = '{} to {} ({})'.format(name, value, i_value)
+                if details:
+                    mess += ': ' + str(details)
+                failures.append(mess)
+
+        if failures:
+            mess = 'The instrument did not succeed to set:\n'
+            raise LantzError(mess + '\n'.join(failures))
+
+    def default_check_operations(self, operations):
+        """Method used to check a batch of deferred operations.
+
+        By default each operation is checked using the default_check_operation
+        method of the object on which the feature was set. Drivers able to
+        check multiple operations at once (by reading an error queue for
+        example) should override this method.
+
+        Parameters
+        ----------
+        operations : list
+            List of tuple (origin, feat, value, i_value, response) describing
+            the operations to check in the order they were performed. origin
+            is the object on which the feature was set.
+
+        Returns
+        -------
+        results : list
+            List of tuple (result, precision) as returned by
+            default_check_operation, one for each operation.
+
+        """
+        return [origin.default_check_operation(feat, value, i_value, response)
+                for origin, feat, value, i_value, response in operations]
+
+    def transaction(self):
+        """Stage the features set in a block and send them all at once on exit.
+
+        Inside the with block, setting a feature only validates the value
+        (limits, values, checks performed by pre_set) and stages it. Setting
+        the same feature again replaces the staged value, and values matching
+        the cache are not staged. On exit the staged values are sent in the
+        order in which they were last set, inside a command group (see
+        begin_command_group) so that drivers able to do so send them as a
+        single message. The operations are checked once all of them have been
+        sent and the cache is then updated for all the features at once.
+
+        If an error occurs in the block, nothing is sent. If an error occurs
+        while sending or checking the values, the features already sent are
+        set back to their previously cached value (or their cache is
+        discarded if they had none) and the error is propagated.
+
+        The driver lock is held for the whole transaction, reading a feature
+        inside the block returns the value prior to the transaction. Features
+        overriding the _set method (waveforms, ...) are not staged. Nested
+        transactions are merged in the outer one.
+
+        """
+        return _Transaction(self)
+
+    def stage_set(self, feat, value, origin=None):
+        """Validate a value and stage it in the current transaction.
+
+        Parameters
+        ----------
+        feat : Feature
+            Reference to the Feature issuing this call.
+        value :
+            Value assigned by the user.
+        origin : HasFeatures, optional
+            Object on which the feature was set, the driver if omitted.
+
+        """
+        with self.lock:
+            origin = origin if origin is not None else self
+            name = feat.name
+            key = (id(origin), name)
+            staged = self._staged_sets
+            # A new value replaces the staged one and is sent last.
+            staged.pop(key, None)
+
+            cache = origin._cache
+            if (name in cache and
+                    feat._match_cache(origin, cache[name], value)):
+                return
+
+            i_value = feat.pre_set(origin, value)
+            staged[key] = (origin, feat, value, i_value)
+
+    def begin_command_group(self):
+        """Start grouping the commands sent when setting features.
+
+        Called when a transaction is committed. Drivers able to send
+        multiple commands in a single message should buffer the commands
+        until end_command_group is called. By default commands are sent
+        immediately.
+
+        """
+        pass
+
+    def end_command_group(self, send=True):
+        """Stop grouping the commands and send the buffered ones.
+
+        Parameters
+        ----------
+        send : bool, optional
+            Whether to send the buffered commands or to discard them (in case
+            of error).
+
+        """
+        pass
+
+    def _commit_transaction(self):
+        """Send the staged values, check them and update the cache.
+
+        """
+        staged = list(self._staged_sets.values())
+        self._staged_sets.clear()
+        if not staged:
+            return
+
+        sent = []
+        deferred = self.checks_deferred
+        self.checks_deferred = True
+        try:
+            # The communication lock is held for the whole group so that
+            # channels using an independent lock cannot add their commands to
+            # it.
+            with self.io_lock:
+                self.begin_command_group()
+                try:
+                    for op in staged:
+                        origin, feat, value, i_value = op
+                        sent.append(op)
+                        send_chain(feat, origin, value, i_value)
+                except Exception:
+                    self.end_command_group(False)
+                    raise
+                self.end_command_group()
+            if not deferred:
+                self.resume_checks()
+        except Exception:
+            self.checks_deferred = deferred
+            if not deferred:
+                self._pending_checks = []
+                self._first_pending_at = None
+            self._rollback_transaction(sent)
+            raise
+
+        updates = OrderedDict()
+        for origin, feat, value, _ in staged:
+            if origin.use_cache:
+                entries = updates.setdefault(id(origin), (origin, {}))[1]
+                entries[feat.name] = feat._to_cache(value)
+        # Each object cache is updated at once so that lock free readers
+        # never see a partially applied transaction.
+        for origin, entries in updates.values():
+            origin._cache.update(entries)
+        for origin, feat, _, _ in staged:
+            origin.discard_dependents(feat.name)
+
+    def _rollback_transaction(self, sent):
+        """Restore the cached values of the features set by a transaction.
+
+        """
+        logger = logging.getLogger(__name__)
+        for origin, feat, _, _ in reversed(sent):
+            name = feat.name
+            cache = origin._cache
+            try:
+                if name in cache:
+                    previous = feat._from_cache(cache.pop(name))
+                    feat._set(origin, previous)
+                else:
+                    origin.discard_dependents(name)
+            except Exception:
+                cache.pop(name, None)
+                origin.discard_dependents(name)
+                logger.exception('Failed to roll back %s', name)
+
     def __enter__(self):
         """Context manager handling the connection to the instrument.
 
@@ -161,3 +639,51 @@ class BaseDriver(with_metaclass(InstrumentSigleton, HasFeatures)):
 
         """
         self.finalize()
+
+
+class _Transaction(object):
+    """Context manager staging the features set and committing them on exit.
+
+    """
+    def __init__(self, driver):
+        self._driver = driver
+        self._nested = False
+
+    def __enter__(self):
+        driver = self._driver
+        driver.lock.acquire()
+        self._nested = driver.in_transaction
+        driver._transaction_thread = current_thread()
+        return driver
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        driver = self._driver
+        try:
+            if self._nested:
+                return
+            driver._transaction_thread = None
+            if exc_type is not None:
+                driver._staged_sets.clear()
+                return
+            driver._commit_transaction()
+        finally:
+            driver.lock.release()
+
+
+class _DeferredChecks(object):
+    """Context manager resuming the checks of a driver on exit.
+
+    """
+    def __init__(self, driver):
+        self._driver = driver
+
+    def __enter__(self):
+        return self._driver
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        # Do not hide the original error behind the failure of a check.
+        try:
+            self._driver.resume_checks()
+        except LantzError:
+            if exc_type is None:
+                raise
@@ -52,6 +52,26 @@ class SubSystem(with_metaclass(DeclarationMeta, HasFeatures)):
         """Access to parent lock."""
         return self.parent.lock
 
+    @property
+    def io_lock(self):
+        """Access to parent communication lock."""
+        return self.parent.io_lock
+
+    @property
+    def lock_free_cache_reads(self):
+        """Use the same locking strategy as the parent."""
+        return self.parent.lock_free_cache_reads
+
+    @property
+    def checks_deferred(self):
+        """Defer the checks when the parent does."""
+        return self.parent.checks_deferred
+
+    @property
+    def in_transaction(self):
+        """Stage the sets when the parent does."""
+        return self.parent.in_transaction
+
     def reopen_connection(self):
         """Subsystems simply pipes the call to their parent.
 
@@ -70,6 +90,13 @@ class SubSystem(with_metaclass(DeclarationMeta, HasFeatures)):
         """
         return self.parent.default_set_feature(feat, cmd, *args, **kwargs)
 
+    def default_set_values(self, feat, cmd, values, *args, **kwargs):
+        """Subsystems simply pipes the call to their parent.
+
+        """
+        return self.parent.default_set_values(feat, cmd, values, *args,
+                                              **kwargs)
+
     def default_check_operation(self, feat, value, i_value, response):
         """Subsystems simply pipes the call to their parent.
 
@@ -77,4 +104,18 @@ class SubSystem(with_metaclass(DeclarationMeta, HasFeatures)):
         return self.parent.default_check_operation(feat, value, i_value,
                                                    response)
 
+    def queue_check(self, feat, value, i_value, response, origin=None):
+        """Subsystems simply pipes the call to their parent.
+
+        """
+        origin = origin if origin is not None else self
+        self.parent.queue_check(feat, value, i_value, response, origin)
+
+    def stage_set(self, feat, value, origin=None):
+        """Subsystems simply pipes the call to their parent.
+
+        """
+        origin = origin if origin is not None else self
+        self.parent.stage_set(feat, value, origin)
+
 AbstractSubSystem.register(SubSystem)
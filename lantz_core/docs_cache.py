@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+"""
+    lantz_core.docs_cache
+    ~~~~~~~~~~~~~~~~~~~~~
+
+    Optional on-disk cache of the feature docs parsed from the source code.
+
+    Collecting the docstrings of the features requires to retrieve and parse
+    the source code of each driver class, which is the most expensive part of
+    the class creation. When a cache directory is set (using
+    set_docs_cache_dir or the LANTZ_DOCS_CACHE environment variable), the
+    docs parsed for the classes of a source file are stored in a file named
+    after the hash of the source file, and later imports of the same source
+    reuse them.
+
+    :copyright: 2015 by Lantz Authors, see AUTHORS for more details.
+    :license: BSD, see LICENSE for more details.
+
+"""
+from __future__ import (division, unicode_literals, print_function,
+                        absolute_import)
+import os
+import io
+import json
+import atexit
+import hashlib
+import logging
+from inspect import getsourcefile, getsourcelines
+from threading import Lock
+
+DOCS_CACHE_DIR = os.environ.get('LANTZ_DOCS_CACHE') or None
+
+# Docs of the classes of each source file, per file hash.
+_LOADED = {}
+
+# Hashes of the source files, per path.
+_HASHES = {}
+
+# Hashes of the files whose docs were updated and should be saved.
+_DIRTY = set()
+
+_LOCK = Lock()
+
+
+def set_docs_cache_dir(path):
+    """Set the directory in which the parsed docs are cached.
+
+    Parameters
+    ----------
+    path : unicode or None
+        Path of the directory, which is created if necessary. None disables
+        the cache.
+
+    """
+    global DOCS_CACHE_DIR
+    save_docs_cache()
+    with _LOCK:
+        DOCS_CACHE_DIR = path
+        _LOADED.clear()
+        _HASHES.clear()
+
+
+def parse_docs(cls):
+    """Collect the docstrings (#: comments) of the attributes of a class.
+
+    Returns
+    -------
+    docs : dict
+        Mapping between the attributes names and their docstrings.
+
+    """
+    docs = {}
+    lines, _ = getsourcelines(cls)
+    doc = ''
+    for line in lines:
+        l = line.strip()
+        if l.startswith('#:'):
+            doc += ' ' + l[2:].strip()
+        elif ' = ' in l:
+            attr_name = l.split(' = ', 1)[0]
+            docs[attr_name] = doc.strip()
+            doc = ''
+    return docs
+
+
+def get_class_docs(cls):
+    """Get the docs of the attributes of a class, using the cache if enabled.
+
+    The classes of a source file are identified by their qualified name, so
+    two classes with the same qualified name in a file share their docs.
+
+    """
+    cache_dir = DOCS_CACHE_DIR
+    if not cache_dir:
+        return parse_docs(cls)
+
+    try:
+        path = getsourcefile(cls)
+        file_hash = _hash_file(path)
+    except (TypeError, IOError, OSError):
+        return parse_docs(cls)
+
+    key = getattr(cls, '__qualname__', cls.__name__)
+    with _LOCK:
+        if file_hash not in _LOADED:
+            _LOADED[file_hash] = _load(cache_dir, file_hash)
+        file_docs = _LOADED[file_hash]
+        if key in file_docs:
+            return dict(file_docs[key])
+
+    docs = parse_docs(cls)
+    with _LOCK:
+        file_docs[key] = docs
+        _DIRTY.add(file_hash)
+    return dict(docs)
+
+
+@atexit.register
+def save_docs_cache():
+    """Write the docs parsed since the last save to the cache directory.
+
+    This is called automatically when the interpreter exits.
+
+    """
+    with _LOCK:
+        cache_dir = DOCS_CACHE_DIR
+        dirty = [(h, _LOADED[h]) for h in _DIRTY if h in _LOADED]
+        _DIRTY.clear()
+    if not cache_dir:
+        return
+
+    for file_hash, file_docs in dirty:
+        try:
+            if not os.path.isdir(cache_dir):
+                os.makedirs(cache_dir)
+            path = os.path.join(cache_dir, file_hash + '.json')
+            tmp = path + '.{}.tmp'.format(os.getpid())
+            with io.open(tmp, 'w', encoding='utf-8') as f:
+                f.write(json.dumps(file_docs, ensure_ascii=False))
+            # Renaming is atomic so concurrent processes never read a
+            # partially written file.
+            if hasattr(os, 'replace'):
+                os.replace(tmp, path)
+            else:
+                if os.path.exists(path):
+                    os.remove(path)
+                os.rename(tmp, path)
+        except (IOError, OSError):
+            logger = logging.getLogger(__name__)
+            logger.debug('Failed to save docs cache for %s', file_hash,
+                         exc_info=True)
+
+
+def _hash_file(path):
+    """Compute the hash of a source file, caching it for the process.
+
+    """
+    stat = os.stat(path)
+    stamp = (stat.st_mtime, stat.st_size)
+    cached = _HASHES.get(path)
+    if cached is None or cached[0] != stamp:
+        with open(path, 'rb') as f:
+            cached = (stamp, hashlib.sha1(f.read()).hexdigest())
+        _HASHES[path] = cached
+    return cached[1]
+
+
+def _load(cache_dir, file_hash):
+    """Load the cached docs of a source file.
+
+    """
+    path = os.path.join(cache_dir, file_hash + '.json')
+    try:
+        with io.open(path, encoding='utf-8') as f:
+            return json.loads(f.read())
+    except (IOError, OSError, ValueError):
+        return {}
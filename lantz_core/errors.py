@@ -30,3 +30,7 @@ class TimeoutError(LantzError):
 
 class InterfaceNotSupported(LantzError):
     pass
+
+
+class RequestCancelled(LantzError):
+    pass
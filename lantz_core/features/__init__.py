@@ -16,7 +16,9 @@ from .bool import Bool
 from .scalars import Unicode, Int, Float
 from .register import Register
 from .alias import Alias
+from .waveform import Waveform, AsciiArray
+from .lists import FloatList
 from .util import constant, conditional
 
-__all__ = ['Bool', 'Unicode', 'Int', 'Float', 'Register', 'Alias', 'constant',
-           'conditional']
+__all__ = ['Bool', 'Unicode', 'Int', 'Float', 'Register', 'Alias', 'Waveform',
+           'AsciiArray', 'FloatList', 'constant', 'conditional']
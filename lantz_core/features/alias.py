@@ -12,27 +12,11 @@
 from __future__ import (division, unicode_literals, print_function,
                         absolute_import)
 
-from types import MethodType
-
-from future.utils import exec_
+from operator import attrgetter
 
 from .feature import Feature, get_chain, set_chain
 
 
-GET_DEF =\
-"""def get(self, driver):
-    return {}
-
-"""
-
-
-SET_DEF =\
-"""def set(self, driver, value):
-    {} = value
-
-"""
-
-
 class Alias(Feature):
     """Feature whose value is mapped to another Feature.
 
@@ -42,19 +26,24 @@ class Alias(Feature):
 
         super(Alias, self).__init__(True, settable)
 
-        accessor = 'driver.' + '.'.join([p if p else 'parent'
-                                         for p in alias.split('.')])
+        path = [p if p else 'parent' for p in alias.split('.')]
+        self._alias_getter = attrgetter('.'.join(path))
+        self._alias_owner = (attrgetter('.'.join(path[:-1])) if path[1:]
+                             else None)
+        self._alias_name = path[-1]
 
-        defs = GET_DEF.format(accessor)
-        if settable:
-            defs += '\n' + SET_DEF.format(accessor)
+    def get(self, driver):
+        """Read the value of the aliased feature.
 
-        loc = {}
-        exec_(defs, globals(), loc)
+        """
+        return self._alias_getter(driver)
+
+    def set(self, driver, value):
+        """Set the value of the aliased feature.
 
-        self.get = MethodType(loc['get'], self)
-        if settable:
-            self.set = MethodType(loc['set'], self)
+        """
+        owner = self._alias_owner(driver) if self._alias_owner else driver
+        setattr(owner, self._alias_name, value)
 
     def post_set(self, driver, value, i_value, response):
         """Re-implemented here as an Alias does not need to do anaything
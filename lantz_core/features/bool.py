@@ -12,14 +12,15 @@
 from __future__ import (division, unicode_literals, print_function,
                         absolute_import)
 
-from .mapping import Mapping
+from .mapping import Mapping, intern_table
 
 
 class Bool(Mapping):
     """ Boolean property.
 
     True/False are mapped to the mapping values, aliases can also be declared
-    to accept non-boolean values.
+    to accept non-boolean values. The aliases are merged into the mapping
+    table so that mapping a value requires a single lookup.
 
     Parameters
     ----------
@@ -28,17 +29,15 @@ class Bool(Mapping):
 
     """
     def __init__(self, getter=None, setter=None, mapping=None, aliases=None,
-                 extract='', retries=0, checks=None, discard=None, ):
+                 extract='', retries=0, checks=None, discard=None,
+                 depends_on=None):
         Mapping.__init__(self, getter, setter, mapping, extract,
-                         retries, checks, discard)
+                         retries, checks, discard, depends_on)
 
-        self._aliases = {True: True, False: False}
         if aliases:
+            table = dict(self._map)
             for k in aliases:
                 for v in aliases[k]:
-                    self._aliases[v] = k
+                    table[v] = self._map[k]
+            self._map = intern_table(table)
         self.creation_kwargs['aliases'] = aliases
-
-    def map_value(self, instance, value):
-        self._aliases[value]
-        return self._map[self._aliases[value]]
@@ -26,9 +26,10 @@ class Enumerable(Feature):
 
     """
     def __init__(self, getter=None, setter=None, values=(), extract='',
-                 retries=0, checks=None, discard=None):
+                 retries=0, checks=None, discard=None,
+                 depends_on=None):
         super(Enumerable, self).__init__(getter, setter, extract, retries,
-                                         checks, discard)
+                                         checks, discard, depends_on)
         self.values = set(values)
         self.creation_kwargs['values'] = values
 
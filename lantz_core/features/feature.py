@@ -14,13 +14,17 @@ from __future__ import (division, unicode_literals, print_function,
 
 from types import MethodType
 from collections import OrderedDict
+from past.builtins import basestring
 from stringparser import Parser
 
 from .util import (wrap_custom_feat_method, MethodsComposer, COMPOSERS,
-                   AbstractGetSetFactory)
+                   AbstractGetSetFactory, SharedTable)
 from ..errors import LantzError
 from ..util import build_checker
 
+# Sentinel used to identify cache misses when reading the cache without lock.
+_NOT_CACHED = object()
+
 
 class Feature(property):
     """Descriptor representing the most basic instrument property.
@@ -72,6 +76,12 @@ class Feature(property):
         setting the Feature or dictionary specifying a list of feature whose
         cache should be discarded under the 'features' key and a list of limits
         to discard under the 'limits' key.
+    depends_on : unicode or tuple, optional
+        Name(s) of the features whose value determines the value of this
+        Feature. When any of them is set, the cached value of this Feature and
+        of its own dependents is discarded along with the limits used to
+        validate them. Names starting with a '.' refer to the features of the
+        parent of a subsystem or channel.
 
     Attributes
     ----------
@@ -81,10 +91,12 @@ class Feature(property):
     creation_kwargs : dict
         Dictionary in which all the creation args should be stored to allow
         subclass customisation. This should not be manipulated by user code.
+    depends_on : tuple
+        Names of the features this Feature depends on.
 
     """
     def __init__(self, getter=None, setter=None, extract='', retries=0,
-                 checks=None, discard=None):
+                 checks=None, discard=None, depends_on=None):
         self._getter = getter
         self._setter = setter
         self._retries = retries
@@ -93,6 +105,13 @@ class Feature(property):
         self.creation_kwargs = {'getter': getter, 'setter': setter,
                                 'retries': retries, 'checks': checks,
                                 'extract': extract, 'discard': discard}
+        # Only stored when used so that subclasses predating this argument
+        # can still be customized using set_feat.
+        if depends_on:
+            self.creation_kwargs['depends_on'] = depends_on
+            if isinstance(depends_on, basestring):
+                depends_on = (depends_on,)
+        self.depends_on = tuple(depends_on) if depends_on else ()
 
         super(Feature,
               self).__init__(self._get if getter is not None else None,
@@ -251,7 +270,9 @@ class Feature(property):
     def check_operation(self, driver, value, i_value, response):
         """Check the instrument operated correctly.
 
-        This uses the driver default_check_operation method.
+        This uses the driver default_check_operation method. If the driver
+        defers the checks, the operation is queued and will be checked when the
+        driver flushes its pending checks.
 
         Parameters
         ----------
@@ -269,8 +290,13 @@ class Feature(property):
         LantzError :
             Raised if the driver detects an issue.
         """
-        res, details = driver.default_check_operation(self, value, i_value,
-                                                      response)
+        if driver.checks_deferred:
+            driver.queue_check(self, value, i_value, response)
+            return
+
+        with driver.io_lock:
+            res, details = driver.default_check_operation(self, value,
+                                                          i_value, response)
         if not res:
             mess = 'The instrument did not succeed to set {} to {} ({})'
             if details:
@@ -307,7 +333,7 @@ class Feature(property):
                 setattr(p, k, MethodType(v.__func__, p))
             elif isinstance(v, MethodsComposer):
                 setattr(p, k, v.clone())
-            elif isinstance(v, dict):
+            elif isinstance(v, dict) and not isinstance(v, SharedTable):
                 setattr(p, k, v.copy())
             else:
                 setattr(p, k, v)
@@ -511,15 +537,27 @@ class Feature(property):
         """Getter defined when the user provides a value for the get arg.
 
         """
+        name = self.name
+        # Keep track of the features used to compute limits.
+        reads = driver._recorded_reads
+        if reads is not None:
+            reads.add(name)
+
+        if driver.lock_free_cache_reads:
+            # Dict lookups are atomic so a cached value can be returned without
+            # waiting for the I/O operations performed by other threads.
+            cached = driver._cache.get(name, _NOT_CACHED)
+            if cached is not _NOT_CACHED:
+                return self._from_cache(cached)
+
         with driver.lock:
             cache = driver._cache
-            name = self.name
             if name in cache:
-                return cache[name]
+                return self._from_cache(cache[name])
 
             val = get_chain(self, driver)
             if driver.use_cache:
-                cache[name] = val
+                cache[name] = self._to_cache(val)
 
             return val
 
@@ -528,14 +566,38 @@ class Feature(property):
 
         """
         with driver.lock:
+            if driver.in_transaction:
+                driver.stage_set(self, value)
+                return
+
             cache = driver._cache
             name = self.name
-            if name in cache and value == cache[name]:
+            if (name in cache and
+                    self._match_cache(driver, cache[name], value)):
                 return
 
             set_chain(self, driver, value)
             if driver.use_cache:
-                cache[name] = value
+                cache[name] = self._to_cache(value)
+            driver.discard_dependents(name)
+
+    def _from_cache(self, cached):
+        """Extract the value to return to the user from the cached object.
+
+        """
+        return cached
+
+    def _to_cache(self, value):
+        """Build the object to store in the cache from a value.
+
+        """
+        return value
+
+    def _match_cache(self, driver, cached, value):
+        """Check whether a value matches the cached object.
+
+        """
+        return value == cached
 
     def _del(self, driver):
         """Deleter clearing the cache of the instrument for this Feature.
@@ -551,17 +613,18 @@ def get_chain(feat, driver):
     i = -1
     feat.pre_get(driver)
 
-    while i < feat._retries:
-        try:
-            i += 1
-            val = feat.get(driver)
-            break
-        except driver.retries_exceptions:
-            if i != feat._retries:
-                driver.reopen_connection()
-                continue
-            else:
-                raise
+    with driver.io_lock:
+        while i < feat._retries:
+            try:
+                i += 1
+                val = feat.get(driver)
+                break
+            except driver.retries_exceptions:
+                if i != feat._retries:
+                    driver.reopen_connection()
+                    continue
+                else:
+                    raise
 
     alt_val = feat.post_get(driver, val)
 
@@ -572,17 +635,27 @@ def set_chain(feat, driver, value):
     """Generic set chain for Features.
 
     """
-    i_val = feat.pre_set(driver, value)
+    send_chain(feat, driver, value, feat.pre_set(driver, value))
+
+
+def send_chain(feat, driver, value, i_val):
+    """Part of the set chain following the validation of the value.
+
+    This is used by transactions which validate the values before sending
+    them.
+
+    """
     i = -1
-    while i < feat._retries:
-        try:
-            i += 1
-            resp = feat.set(driver, i_val)
-            break
-        except driver.retries_exceptions:
-            if i != feat._retries:
-                driver.reopen_connection()
-                continue
-            else:
-                raise
+    with driver.io_lock:
+        while i < feat._retries:
+            try:
+                i += 1
+                resp = feat.set(driver, i_val)
+                break
+            except driver.retries_exceptions:
+                if i != feat._retries:
+                    driver.reopen_connection()
+                    continue
+                else:
+                    raise
     feat.post_set(driver, value, i_val, resp)
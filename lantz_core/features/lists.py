@@ -0,0 +1,208 @@
+# -*- coding: utf-8 -*-
+"""
+    lantz_core.features.lists
+    ~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Feature for tables of values uploaded at once (list or sweep modes).
+
+    :copyright: 2015 by Lantz Authors, see AUTHORS for more details.
+    :license: BSD, see LICENSE for more details.
+
+"""
+from __future__ import (division, unicode_literals, print_function,
+                        absolute_import)
+from inspect import cleandoc
+
+from past.builtins import basestring
+
+from .feature import Feature
+from ..limits import AbstractLimitsValidator, FloatLimitsValidator
+from ..unit import get_unit_registry, is_quantity, UNIT_SUPPORT
+from ..util import parse_ascii_values
+
+
+class FloatList(Feature):
+    """Feature holding a table of floats, such as the setpoints of a list
+    mode.
+
+    The whole table is validated against the limits in a single vectorised
+    pass before being uploaded using the driver default_set_values method.
+    Values are handled as numpy arrays, the cached table being read-only.
+
+    Parameters
+    ----------
+    limits : tuple, LimitsValidator or str, optional
+        Limits each value of the table should respect. A string is used to
+        retrieve the limits from the driver at runtime.
+    unit : str, optional
+        Unit of the values.
+    datatype : str or None, optional
+        Format (as used by the struct module) in which the values are encoded
+        in a binary block. None means that the values are sent as ASCII
+        values.
+    is_big_endian : bool, optional
+        Byte order of the binary block.
+    chunk_size : int, optional
+        Maximal number of values to upload in a single message. The command
+        is formatted for each chunk with the index of its first value under
+        the name offset.
+    converter : str, optional
+        Format used to convert the values to ASCII.
+    separator : str or None, optional
+        Separator between ASCII values, used when uploading and when parsing
+        the answer of the instrument. None means any whitespace when parsing.
+
+    """
+    def __init__(self, getter=None, setter=None, limits=None, unit=None,
+                 extract='', retries=0, checks=None, discard=None,
+                 depends_on=None, datatype='f', is_big_endian=False,
+                 chunk_size=None, converter='.12g', separator=','):
+        super(FloatList, self).__init__(getter, setter, extract, retries,
+                                        checks, discard, depends_on)
+        if isinstance(limits, (tuple, list)):
+            limits = FloatLimitsValidator(*limits, unit=unit)
+        self.limits = None
+        self.limits_id = None
+        if limits:
+            if isinstance(limits, AbstractLimitsValidator):
+                self.limits = limits
+            elif isinstance(limits, basestring):
+                self.limits_id = limits
+            else:
+                mess = cleandoc('''The limits kwarg should either be a limits
+                    validator or a string used to retrieve the range through
+                    get_range''')
+                raise TypeError(mess)
+
+        self.datatype = datatype
+        self.is_big_endian = is_big_endian
+        self.chunk_size = chunk_size
+        self.converter = converter
+        self.separator = separator
+
+        # The unit is parsed only when first needed.
+        self._unit = None
+        self._unit_expr = unit if UNIT_SUPPORT else None
+
+        self.creation_kwargs.update({'limits': limits, 'unit': unit,
+                                     'datatype': datatype,
+                                     'is_big_endian': is_big_endian,
+                                     'chunk_size': chunk_size,
+                                     'converter': converter,
+                                     'separator': separator})
+
+        self.modify_behavior('pre_set', self.validate_table,
+                             ('validate', 'append'), True)
+        self.modify_behavior('post_get', self.cast_to_array,
+                             ('cast', 'append'), True)
+
+    @property
+    def unit(self):
+        """Unit of the values.
+
+        """
+        if self._unit is None and self._unit_expr:
+            ureg = get_unit_registry()
+            self._unit = ureg.parse_expression(self._unit_expr)
+        return self._unit
+
+    def validate_table(self, driver, value):
+        """Convert the table to an array and validate all its values.
+
+        This method is meant to be used as a pre-set.
+
+        """
+        values = self._to_array(value)
+        if values.ndim != 1:
+            mess = '{} expects a one dimensional table, got shape {}.'
+            raise ValueError(mess.format(self.name, values.shape))
+
+        limits = self.limits
+        if self.limits_id:
+            limits = driver.get_limits(self.limits_id)
+        if limits is not None:
+            valid = limits.validate_array(values, self.unit)
+            if not valid.all():
+                index = int(valid.argmin())
+                mess = ('The provided value {} (index {}) is out of bound '
+                        'for {}.')
+                mess = mess.format(values[index], index, self.name)
+                if limits.minimum is not None:
+                    mess += ' Minimum {}.'.format(limits.minimum)
+                if limits.maximum is not None:
+                    mess += ' Maximum {}.'.format(limits.maximum)
+                if limits.step:
+                    mess += ' Step {}.'.format(limits.step)
+                raise ValueError(mess)
+
+        return values
+
+    def set(self, driver, value):
+        """Upload the table, by chunks if a chunk_size was specified.
+
+        """
+        size = self.chunk_size or len(value) or 1
+        response = None
+        for offset in range(0, max(len(value), 1), size):
+            response = driver.default_set_values(self, self._setter,
+                                                 value[offset:offset+size],
+                                                 offset=offset)
+        return response
+
+    def cast_to_array(self, driver, value):
+        """Cast the answer of the instrument to an array.
+
+        Strings are parsed using parse_ascii_values.
+
+        """
+        import numpy as np
+        if isinstance(value, (bytes, basestring)):
+            values = parse_ascii_values(value, self.separator)
+        else:
+            values = np.asarray(value, dtype=float)
+        if self.unit:
+            return values*self.unit
+        return values
+
+    # =========================================================================
+    # --- Private API ---------------------------------------------------------
+    # =========================================================================
+
+    def _to_array(self, value):
+        """Convert a table to an array of magnitudes in the feature unit.
+
+        A copy is always made so that the caller can modify its table without
+        altering the cache.
+
+        """
+        import numpy as np
+        if is_quantity(value):
+            value = (value.to(self.unit).magnitude if self.unit
+                     else value.magnitude)
+        return np.array(value, dtype=float)
+
+    def _from_cache(self, cached):
+        """Add the unit to the cached table.
+
+        """
+        if self.unit:
+            return cached*self.unit
+        return cached
+
+    def _to_cache(self, value):
+        """Store a read-only array of magnitudes.
+
+        """
+        values = self._to_array(value)
+        values.flags.writeable = False
+        return values
+
+    def _match_cache(self, driver, cached, value):
+        """Compare the tables element-wise.
+
+        """
+        import numpy as np
+        try:
+            return np.array_equal(cached, self._to_array(value))
+        except (TypeError, ValueError):
+            return False
@@ -11,8 +11,64 @@
 """
 from __future__ import (division, unicode_literals, print_function,
                         absolute_import)
+from threading import Lock
+from weakref import WeakValueDictionary
+
+from past.builtins import basestring
 
 from .feature import Feature
+from .util import SharedTable
+
+
+#: Tables shared between the features using identical mappings. Tables are
+#: dropped once no feature uses them anymore.
+_TABLES = WeakValueDictionary()
+
+_TABLES_LOCK = Lock()
+
+
+def intern_table(table):
+    """Get a shared dict equal to the provided table.
+
+    Features using identical mappings share the same tables, which limits the
+    memory used by drivers declaring many similar features. As the returned
+    dict can be shared (including between the forward and reverse tables of
+    different features) it must never be modified. Tables with unhashable
+    values are simply copied.
+
+    """
+    try:
+        # Types are part of the key so that 1 and True are not confused.
+        key = frozenset((type(k), k, type(v), v) for k, v in table.items())
+        hash(key)
+    except TypeError:
+        return dict(table)
+
+    with _TABLES_LOCK:
+        shared = _TABLES.get(key)
+        if shared is None:
+            shared = _TABLES[key] = SharedTable(table)
+        return shared
+
+
+def normalize_table(table):
+    """Build the table used to match the stripped lowercase variants of the
+    string keys of a table.
+
+    Keys which become ambiguous once normalized are dropped.
+
+    """
+    normalized = {}
+    ambiguous = set()
+    for k, v in table.items():
+        if isinstance(k, basestring):
+            n_k = k.strip().lower()
+            if n_k in normalized and normalized[n_k] != v:
+                ambiguous.add(n_k)
+            normalized[n_k] = v
+    for k in ambiguous:
+        del normalized[k]
+    return intern_table(normalized)
 
 
 class Mapping(Feature):
@@ -27,19 +83,31 @@ class Mapping(Feature):
         values. This allows to handle asymetric case in which the instrument
         expect a command (ex: CMD ON) but when queried return 1.
 
+    Notes
+    -----
+    When the instrument answer is not found in the mapping, its stripped
+    lowercase variant is looked up among the stripped lowercase variants of
+    the mapping keys. Such answers are then remembered by the feature so that
+    they are directly matched the next time.
+
     """
     def __init__(self, getter=None, setter=None, mapping=None, extract='',
-                 retries=0, checks=None, discard=None):
+                 retries=0, checks=None, discard=None,
+                 depends_on=None):
         Feature.__init__(self, getter, setter, extract, retries,
-                         checks, discard)
+                         checks, discard, depends_on)
 
         mapping = mapping if mapping else {}
         if isinstance(mapping, (tuple, list)):
-            self._map = mapping[0]
-            self._imap = mapping[1]
+            self._map = intern_table(mapping[0])
+            self._imap = intern_table(mapping[1])
         else:
-            self._map = mapping
-            self._imap = {v: k for k, v in mapping.items()}
+            self._map = intern_table(mapping)
+            self._imap = intern_table({v: k for k, v in mapping.items()})
+        self._nimap = normalize_table(self._imap)
+        # Answers matched through their normalized variant. They are kept
+        # apart as the interned tables are shared.
+        self._learned = {}
         self.creation_kwargs['mapping'] = mapping
 
         self.modify_behavior('post_get', self.reverse_map_value,
@@ -49,7 +117,18 @@ class Mapping(Feature):
                              ('map', 'append'), True)
 
     def reverse_map_value(self, driver, value):
-        return self._imap[value]
+        try:
+            return self._imap[value]
+        except KeyError:
+            if isinstance(value, basestring):
+                if value in self._learned:
+                    return self._learned[value]
+                n_value = value.strip().lower()
+                if n_value in self._nimap:
+                    u_value = self._nimap[n_value]
+                    self._learned[value] = u_value
+                    return u_value
+            raise
 
     def map_value(self, driver, value):
         return self._map[value]
@@ -28,9 +28,10 @@ class Register(Feature):
 
     """
     def __init__(self, getter=None, setter=None, names=(), length=8,
-                 extract='', retries=0, checks=None, discard=None):
+                 extract='', retries=0, checks=None, discard=None,
+                 depends_on=None):
         Feature.__init__(self, getter, setter, extract, retries,
-                         checks, discard)
+                         checks, discard, depends_on)
 
         if isinstance(names, dict):
             aux = list(range(length))
@@ -17,13 +17,9 @@ from future.builtins import str as ustr
 from .enumerable import Enumerable
 from .limits_validated import LimitsValidated
 from .mapping import Mapping
-from ..unit import get_unit_registry, UNIT_SUPPORT
+from ..unit import get_unit_registry, is_quantity, UNIT_SUPPORT
 from ..util import raise_limits_error
 from ..limits import IntLimitsValidator, FloatLimitsValidator
-from lantz_core.features.feature import set_chain, get_chain
-
-if UNIT_SUPPORT:
-    from pint.quantity import _Quantity
 
 
 class Unicode(Mapping, Enumerable):
@@ -32,14 +28,15 @@ class Unicode(Mapping, Enumerable):
 
     """
     def __init__(self, getter=None, setter=None, values=(), mapping=None,
-                 extract='', retries=0, checks=None, discard=None):
+                 extract='', retries=0, checks=None, discard=None,
+                 depends_on=None):
 
         if mapping:
             Mapping.__init__(self, getter, setter, mapping, extract,
-                             retries, checks, discard)
+                             retries, checks, discard, depends_on)
         else:
             Enumerable.__init__(self, getter, setter, values, extract,
-                                retries, checks, discard)
+                                retries, checks, discard, depends_on)
 
         self.modify_behavior('post_get', self.cast_to_unicode,
                              ('cast_to_unicode', 'append'), True)
@@ -56,18 +53,18 @@ class Int(LimitsValidated, Mapping, Enumerable):
     """
     def __init__(self, getter=None, setter=None, values=(), mapping=None,
                  limits=None, extract='', retries=0, checks=None,
-                 discard=None):
+                 discard=None, depends_on=None):
         if mapping:
             Mapping.__init__(self, getter, setter, mapping, extract,
-                             retries, checks, discard)
+                             retries, checks, discard, depends_on)
         elif values and not limits:
             Enumerable.__init__(self, getter, setter, values, extract,
-                                retries, checks, discard)
+                                retries, checks, discard, depends_on)
         else:
             if isinstance(limits, (tuple, list)):
                 limits = IntLimitsValidator(*limits)
             LimitsValidated.__init__(self, getter, setter, limits, extract,
-                                     retries, checks, discard)
+                                     retries, checks, discard, depends_on)
 
         self.modify_behavior('post_get', self.cast_to_int,
                              ('cast', 'append'), True)
@@ -85,32 +82,46 @@ class Float(LimitsValidated, Mapping, Enumerable):
     Support range validation and unit conversion.
 
     This Feature handle the cache in a specific fashion as values can have a
-    unit but may be specified without one.
+    unit but may be specified without one. A value close enough to the cached
+    one (see atol and rtol) is not sent to the instrument. When the limits
+    have a step, values resolving to the same step are considered equal and
+    the tolerance never exceeds half a step.
+
+    Parameters
+    ----------
+    atol : float, optional
+        Absolute tolerance, expressed in the unit of the feature, under which
+        a value is considered equal to the cached one.
+    rtol : float, optional
+        Relative tolerance under which a value is considered equal to the
+        cached one.
 
     """
     def __init__(self, getter=None, setter=None, values=(), mapping=None,
                  limits=None, unit=None, extract='', retries=0, checks=None,
-                 discard=None):
+                 discard=None, depends_on=None, atol=0., rtol=0.):
         if mapping:
             Mapping.__init__(self, getter, setter, mapping, extract,
-                             retries, checks, discard)
+                             retries, checks, discard, depends_on)
         elif values and not limits:
             Enumerable.__init__(self, getter, setter, values, extract,
-                                retries, checks, discard)
+                                retries, checks, discard, depends_on)
         else:
             if isinstance(limits, (tuple, list)):
                 limits = FloatLimitsValidator(*limits, unit=unit)
             LimitsValidated.__init__(self, getter, setter, limits, extract,
-                                     retries, checks, discard)
+                                     retries, checks, discard, depends_on)
 
-        if UNIT_SUPPORT and unit:
-            ureg = get_unit_registry()
-            self.unit = ureg.parse_expression(unit)
-        else:
-            self.unit = None
+        # The unit is parsed only when first needed.
+        self._unit = None
+        self._unit_expr = unit if UNIT_SUPPORT else None
+
+        self.atol = atol
+        self.rtol = rtol
 
         self.creation_kwargs.update({'unit': unit, 'values': values,
-                                     'limits': limits})
+                                     'limits': limits, 'atol': atol,
+                                     'rtol': rtol})
 
         if UNIT_SUPPORT:
             spec = (('convert', 'add_before', 'validate') if (values or limits)
@@ -121,6 +132,20 @@ class Float(LimitsValidated, Mapping, Enumerable):
         self.modify_behavior('post_get', self.cast_to_float,
                              ('cast', 'append'), True)
 
+    @property
+    def unit(self):
+        """Unit of the feature values.
+
+        """
+        if self._unit is None and self._unit_expr:
+            ureg = get_unit_registry()
+            self._unit = ureg.parse_expression(self._unit_expr)
+        return self._unit
+
+    @unit.setter
+    def unit(self, value):
+        self._unit = value
+
     def cast_to_float(self, driver, value):
         """Cast the value returned by the instrument to float or Quantity.
 
@@ -136,7 +161,7 @@ class Float(LimitsValidated, Mapping, Enumerable):
         """Convert unit.
 
         """
-        if isinstance(value, _Quantity):
+        if is_quantity(value):
             if self.unit:
                 value = value.to(self.unit).magnitude
             else:
@@ -156,44 +181,69 @@ class Float(LimitsValidated, Mapping, Enumerable):
         else:
             return value
 
-    def _set(self, driver, value):
-        """Float setter, adapted to store both raw value and value with unit
-        in the cache.
+    def _from_cache(self, cached):
+        """The cache holds the raw value and if relevant the Quantity, the
+        last one is returned.
+
+        """
+        return cached[-1]
 
+    def _to_cache(self, value):
+        """Store both raw value and value with unit in the cache.
 
         """
-        with driver.lock:
-            cache = driver._cache
-            name = self.name
-            if name in cache and value in cache[name]:
-                return
-
-            set_chain(self, driver, value)
-
-            if driver.use_cache:
-                if UNIT_SUPPORT and self.unit:
-                    if isinstance(value, _Quantity):
-                        value = (value.magnitude, value)
-                    else:
-                        value = (value, value*self.unit)
-                else:
-                    value = (value,)
-                cache[name] = value
-
-    def _get(self, driver):
-        """Float getter adapted to the specific Float caching
+        if UNIT_SUPPORT and self.unit:
+            if is_quantity(value):
+                return (value.to(self.unit).magnitude, value)
+            else:
+                return (value, value*self.unit)
+        else:
+            return (value,)
+
+    def _match_cache(self, driver, cached, value):
+        """Values can be specified with or without unit and are compared
+        within the tolerance of the feature.
 
         """
-        with driver.lock:
-            cache = driver._cache
-            name = self.name
-            if name in cache:
-                return cache[name][-1]
-
-            val = get_chain(self, driver)
-            if driver.use_cache:
-                if UNIT_SUPPORT and self.unit:
-                    cache[name] = (val.magnitude, val)
-                else:
-                    cache[name] = (val,)
-            return val
+        if value in cached:
+            return True
+
+        # Limits referenced by id are resolved only once the step is known to
+        # matter as resolving them may query the instrument.
+        limits_id = getattr(self, 'limits_id', None)
+        limits = None if limits_id else getattr(self, 'limits', None)
+        if not (self.atol or self.rtol or limits_id or
+                getattr(limits, 'step', None)):
+            return False
+
+        ref = cached[0]
+        if is_quantity(value):
+            if not self.unit:
+                return False
+            try:
+                value = value.to(self.unit).magnitude
+            except Exception:
+                return False
+        try:
+            diff = abs(value - ref)
+        except TypeError:
+            return False
+
+        tol = self.atol
+        if self.rtol:
+            tol = max(tol, self.rtol*max(abs(value), abs(ref)))
+        # The step can only narrow an explicit tolerance.
+        if tol and diff > tol:
+            return False
+
+        if limits_id:
+            limits = driver.get_limits(limits_id)
+        step = getattr(limits, 'step', None)
+        if step:
+            lim_unit = getattr(limits, 'unit', None)
+            if lim_unit and self.unit and lim_unit != self.unit:
+                step *= (1*lim_unit).to(self.unit).magnitude
+            # Values within the rounding used when validating the step target
+            # the same step, distinct steps are never merged.
+            tol = min(tol, 0.5*step) if tol else 1e-9*step
+        return diff <= tol
@@ -15,7 +15,7 @@ from __future__ import (division, unicode_literals, print_function,
 from types import MethodType
 from functools import update_wrapper
 
-from future.utils import exec_
+from ..util import compile_expression, eval_expression
 
 
 def wrap_custom_feat_method(meth, feat):
@@ -62,6 +62,15 @@ def wrap_custom_feat_method(meth, feat):
     return MethodType(wrapper, feat)
 
 
+class SharedTable(dict):
+    """Read-only table shared between features (see mapping.intern_table).
+
+    Such tables are never copied when cloning a feature.
+
+    """
+    __slots__ = ('__weakref__',)
+
+
 # --- Methods composers -------------------------------------------------------
 
 class MethodsComposer(object):
@@ -395,20 +404,6 @@ class constant(AbstractGetSetFactory):
         return getter
 
 
-GET_DEF =\
-"""def get(self, driver):
-    val = {}
-    return {}
-
-"""
-
-SET_DEF =\
-"""def set(self, driver, value):
-    cmd = {}
-    return driver.default_set_feature(self, cmd, value)
-"""
-
-
 class conditional(AbstractGetSetFactory):
     """Make a Feature modify getting/setting based on the driver state.
 
@@ -435,17 +430,18 @@ class conditional(AbstractGetSetFactory):
         """Build the getter.
 
         """
+        code = compile_expression(self._cond)
+
         if not self._default:
-            get_def = GET_DEF.format(self._cond, 'val')
+            def get(self, driver):
+                return eval_expression(code, {'self': self, 'driver': driver})
 
         else:
-            get_def = GET_DEF.format(self._cond,
-                                     'driver.default_get_feature(self, val)')
-
-        loc = {}
-        exec_(get_def, globals(), loc)
+            def get(self, driver):
+                val = eval_expression(code, {'self': self, 'driver': driver})
+                return driver.default_get_feature(self, val)
 
-        return loc['get']
+        return get
 
     def build_setter(self):
         """Build the setter.
@@ -454,7 +450,11 @@ class conditional(AbstractGetSetFactory):
         if not self._default:
             raise ValueError('Can build a setter only if default is True')
 
-        loc = {}
-        exec_(SET_DEF.format(self._cond), globals(), loc)
+        code = compile_expression(self._cond)
+
+        def set(self, driver, value):
+            cmd = eval_expression(code, {'self': self, 'driver': driver,
+                                         'value': value})
+            return driver.default_set_feature(self, cmd, value)
 
-        return loc['set']
+        return set
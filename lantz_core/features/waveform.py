@@ -0,0 +1,289 @@
+# -*- coding: utf-8 -*-
+"""
+    lantz_core.features.waveform
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Feature for large values (traces, spectra) which should never be cached.
+
+    :copyright: 2015 by Lantz Authors, see AUTHORS for more details.
+    :license: BSD, see LICENSE for more details.
+
+"""
+from __future__ import (division, unicode_literals, print_function,
+                        absolute_import)
+import sys
+from threading import Thread, Condition
+from time import time
+from weakref import ref
+
+from past.builtins import basestring
+
+from .feature import Feature, get_chain, set_chain
+from ..util import parse_ascii_values
+
+
+class Waveform(Feature):
+    """Feature whose value is fetched from the instrument each time it is read.
+
+    Waveforms are never cached. They can be prefetched : once a value has
+    been returned the next one is fetched in a background thread so that the
+    next read returns as soon as possible. The prefetched value is discarded
+    when the cache of the Waveform is cleared (for example because a feature
+    it depends on is set). A single background thread per driver is used to
+    prefetch the values of a Waveform.
+
+    Parameters
+    ----------
+    prefetch : bool or float, optional
+        Whether or not to prefetch the next value. If a float is provided,
+        prefetched values older than this number of seconds are discarded and
+        fetched again.
+
+    """
+    def __init__(self, getter=None, setter=None, extract='', retries=0,
+                 checks=None, discard=None, depends_on=None, prefetch=False):
+        super(Waveform, self).__init__(getter, setter, extract, retries,
+                                       checks, discard, depends_on)
+        self.prefetch = prefetch
+        self.creation_kwargs['prefetch'] = prefetch
+
+    def stop_prefetch(self, driver):
+        """Stop prefetching values for a driver.
+
+        The value being fetched, if any, is discarded. The worker thread is
+        kept to be reused by the next read.
+
+        """
+        prefetcher = driver._prefetchers.get(self.name)
+        if prefetcher is not None:
+            prefetcher.discard()
+
+    # =========================================================================
+    # --- Private API ---------------------------------------------------------
+    # =========================================================================
+
+    def _get(self, driver):
+        """Re-implemented so that Waveform never use the cache.
+
+        """
+        if not self.prefetch:
+            with driver.lock:
+                return get_chain(self, driver)
+
+        prefetcher = driver._prefetchers.get(self.name)
+        if prefetcher is None:
+            prefetcher = driver._prefetchers.setdefault(
+                self.name, _Prefetcher(self, driver))
+
+        # Taking is atomic so a prefetched value is returned only once even
+        # if multiple threads read the Waveform.
+        result = prefetcher.take()
+
+        # Failures are not reported as the value is fetched again.
+        max_age = self.prefetch
+        if (result is None or not result[0] or
+                (max_age is not True and time() - result[2] > max_age)):
+            with driver.lock:
+                value = get_chain(self, driver)
+        else:
+            value = result[1]
+
+        prefetcher.request()
+        return value
+
+    def _set(self, driver, value):
+        """Re-implemented so that Waveform never uses the cache.
+
+        """
+        with driver.lock:
+            self.stop_prefetch(driver)
+            set_chain(self, driver, value)
+            driver.discard_dependents(self.name)
+
+    def _del(self, driver):
+        """Deleter discarding the prefetched value.
+
+        """
+        self.stop_prefetch(driver)
+
+
+class AsciiArray(Waveform):
+    """Waveform whose value is an array of numbers received as ASCII.
+
+    The answer of the instrument is parsed straight into a numpy array (see
+    parse_ascii_values).
+
+    Parameters
+    ----------
+    separator : unicode or None, optional
+        Separator between the values, None meaning any whitespace.
+    dtype : numpy dtype, optional
+        Type of the values.
+
+    """
+    def __init__(self, getter=None, setter=None, extract='', retries=0,
+                 checks=None, discard=None, depends_on=None, prefetch=False,
+                 separator=',', dtype=float):
+        super(AsciiArray, self).__init__(getter, setter, extract, retries,
+                                         checks, discard, depends_on,
+                                         prefetch)
+        self.separator = separator
+        self.dtype = dtype
+        self.creation_kwargs.update({'separator': separator, 'dtype': dtype})
+
+        self.modify_behavior('post_get', self.parse_values,
+                             ('parse', 'append'), True)
+
+    def parse_values(self, driver, value):
+        """Parse the answer of the instrument.
+
+        Strings are parsed using parse_ascii_values, other values (already
+        parsed by the getter) are simply converted to an array.
+
+        """
+        if isinstance(value, (bytes, basestring)):
+            return parse_ascii_values(value, self.separator, self.dtype)
+        import numpy as np
+        return np.asarray(value, dtype=self.dtype)
+
+
+class _Prefetcher(object):
+    """Fetch the values of a Waveform in a background thread.
+
+    A single worker thread is created per Waveform and driver and reused for
+    all the prefetches. It fills a slot while the consumer uses the previous
+    value so that at most two values are alive at any time.
+
+    Each fetch allocates a new value : the values are handed to the user who
+    may keep them around, so reusing preallocated buffers would overwrite
+    values still in use.
+
+    A requested fetch can be cancelled as long as the worker has not acquired
+    the driver lock. This allows a consumer holding the lock to fetch the
+    value itself rather than waiting for the worker.
+
+    """
+    def __init__(self, feat, driver):
+        self._feat = feat
+        self._driver = ref(driver, self._driver_collected)
+        self._cond = Condition()
+        self._thread = None
+        self._running = True
+        self._requested = False
+        self._busy = False
+        # Incremented each time the prefetched value is discarded so that a
+        # value being fetched at that time is dropped.
+        self._generation = 0
+        self._ready = None
+
+    def request(self):
+        """Ask the worker to fetch the next value.
+
+        """
+        with self._cond:
+            if not self._running:
+                return
+            self._ready = None
+            self._requested = True
+            if self._thread is None:
+                self._thread = Thread(target=self._run,
+                                      name='Prefetch ' + self._feat.name)
+                self._thread.daemon = True
+                self._thread.start()
+            self._cond.notify_all()
+
+    def take(self):
+        """Take the prefetched value.
+
+        The fetching is cancelled if the worker did not start it yet.
+
+        Returns
+        -------
+        result : tuple or None
+            None if no value was prefetched. Otherwise a tuple whose first
+            element indicates whether the fetching succeeded, the second the
+            value (or the exception info) and the third the time at which
+            the value was fetched.
+
+        """
+        with self._cond:
+            self._requested = False
+            while self._busy:
+                self._cond.wait()
+            result, self._ready = self._ready, None
+            return result
+
+    def discard(self):
+        """Discard the prefetched value and cancel any pending fetch.
+
+        """
+        with self._cond:
+            self._generation += 1
+            self._requested = False
+            self._ready = None
+
+    def wait(self, timeout=None):
+        """Wait for the requested fetch to complete.
+
+        Returns
+        -------
+        done : bool
+            Whether or not the worker is idle.
+
+        """
+        with self._cond:
+            end = time() + timeout if timeout is not None else None
+            while self._running and (self._requested or self._busy):
+                remaining = end - time() if end is not None else None
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+            return True
+
+    def _run(self):
+        """Fetch the values on request until the driver is collected.
+
+        """
+        feat = self._feat
+        while True:
+            with self._cond:
+                while self._running and not self._requested:
+                    self._cond.wait()
+                if not self._running:
+                    return
+
+            driver = self._driver()
+            if driver is None:
+                return
+            with driver.lock:
+                with self._cond:
+                    # The consumer may have cancelled the fetch while the
+                    # worker was waiting for the lock.
+                    claimed = self._requested
+                    self._requested = False
+                    self._busy = claimed
+                    generation = self._generation
+                if claimed:
+                    try:
+                        result = (True, get_chain(feat, driver), time())
+                    except Exception:
+                        result = (False, sys.exc_info(), time())
+            del driver
+            if not claimed:
+                continue
+
+            with self._cond:
+                self._busy = False
+                if generation == self._generation:
+                    self._ready = result
+                self._cond.notify_all()
+            del result
+
+    def _driver_collected(self, reference):
+        """Stop the worker once the driver has been garbage collected.
+
+        """
+        with self._cond:
+            self._running = False
+            self._ready = None
+            self._cond.notify_all()
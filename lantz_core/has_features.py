@@ -16,14 +16,17 @@ from __future__ import (division, unicode_literals, print_function,
                         absolute_import)
 
 from types import FunctionType
-from inspect import cleandoc, getsourcelines, currentframe
+from inspect import cleandoc, currentframe
 from itertools import chain
 from abc import ABCMeta
 from collections import defaultdict
+from threading import Thread, local
+from time import time
 
 from future.utils import with_metaclass
 
 from .features.feature import Feature
+from .docs_cache import get_class_docs
 
 # Prefixes for Features and Action specially named methods.
 PRE_GET_PREFIX = '_pre_get_'
@@ -102,6 +105,10 @@ class set_action(object):
 # Sentinel returned when decorating a method with a subpart.
 SUBPART_FUNC = object()
 
+# Sentinel used for the channel arguments which were not specified, as None
+# can be a meaningful value.
+_UNSET = object()
+
 
 class _subpart(object):
     """Sentinel used to collect declarations or modifications for a subpart.
@@ -203,11 +210,26 @@ class channel(_subpart):
         Dictionary providing aliases for channels ids. Aliases can be simple
         values, list or tuple.
 
+    independent_lock : bool, optional
+        Whether the channels should use their own lock rather than the lock of
+        their parent (see Channel.independent_lock). If absent the value of
+        the base class is used.
+
+    available_ttl : float or None, optional
+        Time during which the list of available channels is cached (see
+        Channel.available_ttl), None meaning forever. If absent the value of
+        the base class is used.
+
     """
-    def __init__(self, available=None, bases=(), aliases=None):
+    def __init__(self, available=None, bases=(), aliases=None,
+                 independent_lock=None, available_ttl=_UNSET):
         super(channel, self).__init__(bases)
         self._available_ = available
         self._ch_aliases_ = aliases if aliases else {}
+        if independent_lock is not None:
+            self.independent_lock = independent_lock
+        if available_ttl is not _UNSET:
+            self.available_ttl = available_ttl
 
 
 def make_list_function(available, aliases):
@@ -286,6 +308,78 @@ def make_cls_from_subpart(parent_name, part_name, part, base, docs):
     return new_class
 
 
+def build_dependents(cls, feats, subparts):
+    """Build the map between the features and their transitive dependents.
+
+    Parameters
+    ----------
+    cls : type
+        Class being created. Used only for error reporting.
+
+    feats : dict
+        Mapping between name and Feature for all the features of the class.
+
+    subparts : dict
+        Mapping between name and class of the subsystems and channels of the
+        class.
+
+    Returns
+    -------
+    dependents : dict
+        Mapping between a feature name and a tuple holding the names of the
+        features and the ids of the limits to discard when this feature is
+        set. Names starting with a '.' refer to the features of the parent
+        and are resolved when the parent class is created.
+
+    """
+    # Direct reverse edges between the features of the class.
+    edges = defaultdict(set)
+    for name, feat in feats.items():
+        for dep in feat.depends_on:
+            if not dep.startswith('.') and dep not in feats:
+                mess = '{} has no Feature {} on which {} can depend'
+                raise AttributeError(mess.format(cls, dep, name))
+            edges[dep].add(name)
+
+    # Features and limits of the subparts depending on our features.
+    sub_feats = defaultdict(set)
+    sub_limits = defaultdict(set)
+    for part_name, part_cls in subparts.items():
+        for dep, (p_feats, p_limits) in part_cls.__dependents__.items():
+            if not dep.startswith('.'):
+                continue
+            dep = dep[1:]
+            if not dep.startswith('.') and dep not in feats:
+                mess = '{} has no Feature {} on which {}.{} can depend'
+                raise AttributeError(mess.format(cls, dep, part_name,
+                                                 p_feats[0]))
+            sub_feats[dep].update(part_name + '.' + f for f in p_feats)
+            sub_limits[dep].update(part_name + '.' + l for l in p_limits)
+
+    dependents = {}
+    for name in set(edges) | set(sub_feats):
+        features = set()
+        limits = set()
+        visited = set([name])
+        to_visit = [name]
+        while to_visit:
+            n = to_visit.pop()
+            features.update(sub_feats[n])
+            limits.update(sub_limits[n])
+            for d in edges[n]:
+                if d not in visited:
+                    visited.add(d)
+                    to_visit.append(d)
+                    features.add(d)
+                    limits_id = getattr(feats[d], 'limits_id', None)
+                    if limits_id:
+                        limits.add(limits_id)
+        features.discard(name)
+        dependents[name] = (tuple(sorted(features)), tuple(sorted(limits)))
+
+    return dependents
+
+
 class AbstractHasFeatures(with_metaclass(ABCMeta, object)):
     """Sentinel class for the collections of Features.
 
@@ -389,17 +483,7 @@ class HasFeaturesMeta(type):
         # This will work as long as two subpart are not aliased in the same
         # way which is probabbly good enough.
         if docs is None:
-            docs = {}
-            lines, _ = getsourcelines(cls)
-            doc = ''
-            for line in lines:
-                l = line.strip()
-                if l.startswith('#:'):
-                    doc += ' ' + l[2:].strip()
-                elif ' = ' in l:
-                    attr_name = l.split(' = ', 1)[0]
-                    docs[attr_name] = doc.strip()
-                    doc = ''
+            docs = get_class_docs(cls)
 
         # Make the feature build their docs from the provided docstrings.
         for f in feats:
@@ -525,6 +609,13 @@ class HasFeaturesMeta(type):
         # by HasFeaturesMeta to query for the features.
         cls.__feats__ = feats
 
+        # Resolve the dependencies between features (including the ones of
+        # the subparts on this class features) into the list of features and
+        # limits to discard when setting a feature.
+        parts = dict(subsystems)
+        parts.update((k, v[0]) for k, v in channels.items())
+        cls.__dependents__ = build_dependents(cls, all_feats, parts)
+
         # Put a reference to the subsystems in the class.
         # This is used at initialisation to create the appropriate subsystems
         cls.__subsystems__ = subsystems
@@ -547,10 +638,45 @@ class HasFeatures(with_metaclass(HasFeaturesMeta, object)):
     #: retries value)
     retries_exceptions = ()
 
+    #: Whether or not cached values can be read without acquiring the lock.
+    #: When enabled, reading a cached value never waits for the I/O operations
+    #: performed by other threads, only actual communications with the
+    #: instrument are serialized. Subsystems and channels use the value of
+    #: their parent.
+    lock_free_cache_reads = False
+
+    #: Whether or not to recompute in a background thread the limits discarded
+    #: because a feature they depend on has been set. This avoids paying the
+    #: cost of the queries on the next set of a feature validated by them.
+    prefetch_limits = False
+
+    #: Whether or not the operations performed when setting features are
+    #: checked only when the pending checks are flushed. See
+    #: BaseDriver.defer_checks. Subsystems and channels use the value of their
+    #: parent.
+    checks_deferred = False
+
+    #: Whether or not the features set are staged in a transaction instead of
+    #: being sent right away. See BaseDriver.transaction. Subsystems and
+    #: channels use the value of their parent.
+    in_transaction = False
+
     def __init__(self, caching_allowed=True):
 
         self._cache = {}
         self._limits_cache = {}
+        self._limits_expiry = {}
+        self._limits_reads = {}
+        self._limits_readers = defaultdict(set)
+        self._limits_discarded = 0
+        self._limits_to_prefetch = set()
+        self._limits_prefetcher = None
+        # Per thread state, so that the reads of other threads are not
+        # recorded while computing limits.
+        self._local = local()
+        # Background fetchers of the prefetched Waveforms, kept out of the
+        # cache so that they are never returned as values.
+        self._prefetchers = {}
 
         subsystems = self.__subsystems__
         channels = self.__channels__
@@ -570,6 +696,34 @@ class HasFeatures(with_metaclass(HasFeaturesMeta, object)):
                                          aliases)
             setattr(self, ch, ch_holder)
 
+    @property
+    def io_lock(self):
+        """Lock serializing the communications with the instrument.
+
+        It is held only while communicating (default_*_feature,
+        default_check_operation(s) and reopen_connection calls) and no other
+        lock is ever acquired while holding it, so that it can be taken after
+        any other lock without risking a deadlock. The methods communicating
+        with the instrument should hence not access features. HasFeatures
+        simply uses the object lock, BaseDriver uses a separate lock and
+        subsystems and channels use the one of their parent.
+
+        """
+        return self.lock
+
+    @property
+    def _recorded_reads(self):
+        """Set in which the names of the features read by the current thread
+        are recorded while computing limits, None when no limits is being
+        computed.
+
+        """
+        return getattr(self._local, 'recorded_reads', None)
+
+    @_recorded_reads.setter
+    def _recorded_reads(self, value):
+        self._local.recorded_reads = value
+
     def get_feat(self, name):
         """ Acces the feature matching the given name.
 
@@ -619,8 +773,11 @@ class HasFeatures(with_metaclass(HasFeaturesMeta, object)):
                         sss[aux].append(n)
                     else:
                         chs[aux].append(n)
-                elif name in cache:
-                    del cache[name]
+                else:
+                    if name in cache:
+                        del cache[name]
+                    if name in self._prefetchers:
+                        self._prefetchers[name].discard()
 
             if par:
                 self.parent.clear_cache(features=par)
@@ -630,16 +787,18 @@ class HasFeatures(with_metaclass(HasFeaturesMeta, object)):
 
             if self.__channels__:
                 for ch in chs:
-                    for o in getattr(self, ch):
+                    for o in getattr(self, ch).created_channels:
                         o.clear_cache(features=chs[ch])
         else:
             self._cache = {}
+            for prefetcher in list(self._prefetchers.values()):
+                prefetcher.discard()
             if subsystems:
                 for ss in self.__subsystems__:
                     getattr(self, ss).clear_cache(channels=channels)
             if channels and self.__channels__:
                 for chs in self.__channels__:
-                    for ch in getattr(self, chs):
+                    for ch in getattr(self, chs).created_channels:
                         ch.clear_cache(subsystems)
 
     def check_cache(self, subsystems=True, channels=True, features=None):
@@ -719,6 +878,10 @@ class HasFeatures(with_metaclass(HasFeaturesMeta, object)):
     def get_limits(self, limits_id):
         """Access the limits object matching the definition.
 
+        Limits are cached until one of the features read to compute them is
+        set, until they are explicitly discarded or until their time to live
+        (see limits_ttl) expires.
+
         Parameters
         ----------
         limits_id : str
@@ -732,11 +895,49 @@ class HasFeatures(with_metaclass(HasFeaturesMeta, object)):
             be used to validate values.
 
         """
-        if limits_id not in self._limits_cache:
-            self._limits_cache[limits_id] = getattr(self,
-                                                    LIMITS_PREFIX+limits_id)()
-
-        return self._limits_cache[limits_id]
+        cache = self._limits_cache
+        if limits_id in cache:
+            expiry = self._limits_expiry.get(limits_id)
+            if expiry is None or time() < expiry:
+                # Limits computed from other limits depend on the same
+                # features.
+                if self._recorded_reads is not None:
+                    self._recorded_reads.update(
+                        self._limits_reads.get(limits_id, ()))
+                return cache[limits_id]
+
+        with self.lock:
+            getter = getattr(self, LIMITS_PREFIX+limits_id)
+            discarded = self._limits_discarded
+            outer_reads = self._recorded_reads
+            self._recorded_reads = reads = set()
+            try:
+                limits = getter()
+            finally:
+                self._recorded_reads = outer_reads
+
+            if outer_reads is not None:
+                outer_reads.update(reads)
+            # Forget the features read by the previous computation.
+            readers = self._limits_readers
+            for name in self._limits_reads.get(limits_id, ()):
+                if name in readers:
+                    readers[name].discard(limits_id)
+                    if not readers[name]:
+                        del readers[name]
+            self._limits_reads[limits_id] = reads
+            for name in reads:
+                readers[name].add(limits_id)
+
+            # Do not cache limits which may have been computed from stale
+            # values.
+            if discarded == self._limits_discarded:
+                cache[limits_id] = limits
+                ttl = getattr(getter, '_limits_ttl_', None)
+                if ttl is not None:
+                    self._limits_expiry[limits_id] = time() + ttl
+
+            return limits
 
     def discard_limits(self, limits_id):
         """Remove a limits from the cache.
@@ -746,12 +947,169 @@ class HasFeatures(with_metaclass(HasFeaturesMeta, object)):
         Parameters
         ----------
         limits_id : iterable
-            Iterable of the ids of the limits to discard.
+            Iterable of the ids of the limits to discard. Dotted names can be
+            used to access subsystems and channels. When accessing channels the
+            limits of all instances are discarded.
 
         """
+        sss = defaultdict(list)
+        chs = defaultdict(list)
+        self._limits_discarded += 1
         for lim_id in limits_id:
-            if lim_id in self._limits_cache:
-                del self._limits_cache[lim_id]
+            if '.' in lim_id:
+                aux, n = lim_id.split('.', 1)
+                if aux in self.__subsystems__:
+                    sss[aux].append(n)
+                else:
+                    chs[aux].append(n)
+            else:
+                self._limits_cache.pop(lim_id, None)
+                self._limits_expiry.pop(lim_id, None)
+
+        for ss in sss:
+            getattr(self, ss).discard_limits(sss[ss])
+
+        for ch in chs:
+            for o in getattr(self, ch).created_channels:
+                o.discard_limits(chs[ch])
+
+    def dependents(self, name):
+        """Access the features and limits depending on a feature.
+
+        Parameters
+        ----------
+        name : unicode
+            Name of the feature.
+
+        Returns
+        -------
+        features : tuple
+            Names of the features whose cached value is discarded when the
+            feature is set. Dotted names refer to subsystems and channels.
+        limits : tuple
+            Ids of the limits discarded when the feature is set.
+
+        """
+        return self.__dependents__.get(name, ((), ()))
+
+    def dependencies(self, name):
+        """Access the names of all the features a feature depends on.
+
+        Parameters
+        ----------
+        name : unicode
+            Name of the feature.
+
+        Returns
+        -------
+        dependencies : set
+            Names of the features (of this object or, when starting with a
+            '.', of the parent) whose value determines the one of the feature.
+            As long as none of them is set, the cached value of the feature
+            can be safely used.
+
+        """
+        deps = set()
+        to_visit = [name]
+        while to_visit:
+            n = to_visit.pop()
+            for d in self.get_feat(n).depends_on:
+                if d not in deps:
+                    deps.add(d)
+                    if not d.startswith('.'):
+                        to_visit.append(d)
+        return deps
+
+    def discard_dependents(self, name):
+        """Discard the cache of the features and limits depending on a feature.
+
+        This is called by the features after setting their value. Limits whose
+        computation read the feature are discarded too.
+
+        Parameters
+        ----------
+        name : unicode
+            Name of the feature which has been set.
+
+        """
+        limits = self._limits_readers.pop(name, ())
+        dependents = self.__dependents__.get(name)
+        if dependents:
+            features, declared_limits = dependents
+            if features:
+                self.clear_cache(features=features)
+            if declared_limits:
+                limits = set(limits)
+                limits.update(declared_limits)
+
+        if limits:
+            self.discard_limits(limits)
+            if self.prefetch_limits:
+                self._prefetch_limits([l for l in limits
+                                       if l in self.__limits__])
+
+    def ramp(self, name, target, rate=None, step=None):
+        """Ramp a Float feature to a target value in a background thread.
+
+        The setpoints are computed at once, the intermediate ones being
+        rounded to the step of the feature limits if any, and set on a fixed
+        schedule. The cache holds the current setpoint during the ramp. Ramps
+        of different drivers run concurrently.
+
+        Parameters
+        ----------
+        name : unicode
+            Name of the feature to ramp.
+        target : float or Quantity
+            Final value of the feature. It is validated before starting.
+        rate : float or Quantity, optional
+            Maximal rate of change of the feature per second. If omitted the
+            setpoints are set as fast as possible.
+        step : float or Quantity, optional
+            Maximal difference between two consecutive setpoints. Defaults to
+            the distance covered in 0.1 s at the given rate, or to the step of
+            the limits. If none is available the target is set directly.
+
+        Returns
+        -------
+        ramp : Ramp
+            Object which can be used to wait for the ramp to complete or to
+            cancel it.
+
+        """
+        from .ramping import ramp
+        return ramp(self, name, target, rate, step)
+
+    def _prefetch_limits(self, limits_id):
+        """Recompute the specified limits in a background thread.
+
+        """
+        with self.lock:
+            self._limits_to_prefetch.update(limits_id)
+            if self._limits_to_prefetch and self._limits_prefetcher is None:
+                thread = Thread(target=self._run_limits_prefetch,
+                                name='LimitsPrefetcher')
+                thread.daemon = True
+                self._limits_prefetcher = thread
+                thread.start()
+
+    def _run_limits_prefetch(self):
+        """Recompute the limits scheduled for prefetching till none is left.
+
+        Errors are ignored, they will be raised again when the limits are
+        explicitly requested.
+
+        """
+        while True:
+            with self.lock:
+                if not self._limits_to_prefetch:
+                    self._limits_prefetcher = None
+                    return
+                limits_id = self._limits_to_prefetch.pop()
+                try:
+                    self.get_limits(limits_id)
+                except Exception:
+                    pass
 
     def reopen_connection(self):
         """Reopen the connection to the instrument.
@@ -798,6 +1156,62 @@ class HasFeatures(with_metaclass(HasFeaturesMeta, object)):
         """
         raise NotImplementedError()
 
+    def default_set_values(self, feat, cmd, values, *args, **kwargs):
+        """Method used by default by the list Features to upload a table of
+        values to the instrument.
+
+        Parameters
+        ----------
+        feat : Feature
+            Reference to the property issuing this call. Its datatype and
+            is_big_endian attributes describe the encoding to use.
+        cmd :
+            Command used by the implementation to determine what should be done
+            to upload the values.
+        values : numpy.ndarray
+            Values to upload.
+        *args :
+            Additional arguments necessary to upload the values.
+        **kwargs :
+            Additional keywords arguments necessary to upload the values.
+
+        """
+        raise NotImplementedError()
+
+    def queue_check(self, feat, value, i_value, response, origin=None):
+        """Queue the check of an operation when checks are deferred.
+
+        Parameters
+        ----------
+        feat : Feature
+            Reference to the Feature issuing this call.
+        value :
+            Value assigned by the user.
+        i_value :
+            Value computed by the pre_set method of the Feature.
+        response :
+            Return value of the set method.
+        origin : HasFeatures, optional
+            Object on which the feature was set, this object if omitted.
+
+        """
+        raise NotImplementedError()
+
+    def stage_set(self, feat, value, origin=None):
+        """Validate a value and stage it in the current transaction.
+
+        Parameters
+        ----------
+        feat : Feature
+            Reference to the Feature issuing this call.
+        value :
+            Value assigned by the user.
+        origin : HasFeatures, optional
+            Object on which the feature was set, this object if omitted.
+
+        """
+        raise NotImplementedError()
+
     def default_check_operation(self, feat, value, i_value, state=None):
         """Method used by default by the Feature to check the instrument
         operation.
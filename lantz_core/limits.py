@@ -15,9 +15,7 @@ from types import MethodType
 from math import modf
 from functools import update_wrapper
 
-from .unit import UNIT_SUPPORT, get_unit_registry
-if UNIT_SUPPORT:
-    from pint.quantity import _Quantity
+from .unit import UNIT_SUPPORT, get_unit_registry, is_quantity
 
 
 class AbstractLimitsValidator(object):
@@ -161,7 +159,7 @@ class FloatLimitsValidator(AbstractLimitsValidator):
 
     """
 
-    __slots__ = ('unit')
+    __slots__ = ('_unit', '_unit_expr')
 
     def __init__(self, min=None, max=None, step=None, unit=None):
         mess = 'The {} of an FloatLimitsValidator must be a float not {}.'
@@ -178,11 +176,13 @@ class FloatLimitsValidator(AbstractLimitsValidator):
         self.maximum = float(max) if max is not None else None
         self.step = float(step) if step is not None else None
 
+        self._unit = None
         if UNIT_SUPPORT and unit:
-            ureg = get_unit_registry()
-            self.unit = ureg.parse_expression(unit)
+            # The unit is parsed only when first needed.
+            self._unit_expr = unit
             wrap = self._unit_conversion
         else:
+            self._unit_expr = None
             wrap = lambda x: x
 
         if min is not None:
@@ -202,6 +202,57 @@ class FloatLimitsValidator(AbstractLimitsValidator):
             else:
                 self.validate = wrap(self._validate_smaller)
 
+    @property
+    def unit(self):
+        """Unit used when validating.
+
+        """
+        if self._unit is None and self._unit_expr:
+            ureg = get_unit_registry()
+            self._unit = ureg.parse_expression(self._unit_expr)
+        return self._unit
+
+    def validate_array(self, values, unit=None):
+        """Validate an array of values in a single vectorised pass.
+
+        Parameters
+        ----------
+        values : array_like
+            Values to validate, expressed in unit if specified or in the unit
+            of the limits.
+        unit : Unit, optional
+            Unit in which the values are expressed.
+
+        Returns
+        -------
+        valid : numpy.ndarray
+            Boolean array indicating which values respect the limits.
+
+        """
+        import numpy as np
+        if is_quantity(values):
+            if self.unit:
+                values = values.to(self.unit).magnitude
+            else:
+                values = values.magnitude
+        elif unit and self.unit and unit != self.unit:
+            values = (np.asarray(values, dtype=float) *
+                      (1*unit).to(self.unit).magnitude)
+        values = np.asarray(values, dtype=float)
+
+        valid = np.ones(values.shape, dtype=bool)
+        if self.minimum is not None:
+            valid &= values >= self.minimum
+        if self.maximum is not None:
+            valid &= values <= self.maximum
+        if self.step:
+            origin = (self.minimum if self.minimum is not None
+                      else self.maximum)
+            # Same rounding as the scalar validation.
+            ratio = np.round(np.abs((values - origin)/self.step), 9)
+            valid &= np.modf(ratio)[0] < 1e-9
+        return valid
+
     def _unit_conversion(self, cmp_func):
         """Decorator handling unit conversion to the unit.
 
@@ -213,7 +264,7 @@ class FloatLimitsValidator(AbstractLimitsValidator):
             if unit and unit != self.unit:
                 value *= (1*unit).to(self.unit).magnitude
 
-            elif isinstance(value, _Quantity):
+            elif is_quantity(value):
                 value = value.to(self.unit).magnitude
 
             return cmp_func(self, value)
@@ -261,3 +312,23 @@ class FloatLimitsValidator(AbstractLimitsValidator):
         ratio = round(abs((value-self.minimum)/self.step), 9)
         return self.minimum <= value <= self.maximum\
             and abs(modf(ratio)[0]) < 1e-9
+
+
+def limits_ttl(ttl):
+    """Specify how long the limits returned by a _limits_* method are valid.
+
+    This is meant for limits depending on the instrument state in a way which
+    is not visible through the features (ex: front panel operations). Once the
+    time is elapsed the limits are computed again.
+
+    Parameters
+    ----------
+    ttl : float
+        Time in seconds during which the limits are valid.
+
+    """
+    def decorator(function):
+        function._limits_ttl_ = ttl
+        return function
+
+    return decorator
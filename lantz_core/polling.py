@@ -0,0 +1,391 @@
+# -*- coding: utf-8 -*-
+"""
+    lantz_core.polling
+    ~~~~~~~~~~~~~~~~~~
+
+    Service polling the features of a driver on behalf of multiple observers.
+
+    :copyright: 2015 by Lantz Authors, see AUTHORS for more details.
+    :license: BSD, see LICENSE for more details.
+
+"""
+from __future__ import (division, unicode_literals, print_function,
+                        absolute_import)
+import logging
+from threading import Thread, Condition, Lock, current_thread
+from time import time
+from weakref import WeakKeyDictionary, ref
+
+from future.moves.queue import Full
+
+from .errors import RequestCancelled
+from .scheduler import get_request_scheduler, LOW_PRIORITY
+try:
+    from asyncio import QueueFull
+    QUEUE_FULL = (Full, QueueFull)
+except ImportError:
+    QUEUE_FULL = (Full,)
+
+
+_SERVICES = WeakKeyDictionary()
+
+_SERVICES_LOCK = Lock()
+
+
+def get_polling_service(driver):
+    """Access the polling service of a driver, creating it if necessary.
+
+    Using a single service per driver ensures that the observers of the same
+    feature share the same reads.
+
+    """
+    with _SERVICES_LOCK:
+        if driver not in _SERVICES:
+            _SERVICES[driver] = PollingService(driver)
+        return _SERVICES[driver]
+
+
+class Subscription(object):
+    """Handle returned when subscribing to the changes of a feature.
+
+    """
+    def __init__(self, service, name, period, callback, queue, loop):
+        self.name = name
+        self.period = period
+        self._service = service
+        self._callback = callback
+        self._queue = queue
+        self._loop = loop
+
+    def cancel(self):
+        """Stop being notified of the changes of the feature.
+
+        """
+        self._service._unsubscribe(self)
+
+    def notify(self, value):
+        """Pass the new value of the feature to the observer.
+
+        Values are dropped if the observer queue is full.
+
+        """
+        if self._callback is not None:
+            self._callback(self.name, value)
+        if self._queue is not None:
+            if self._loop is not None:
+                self._loop.call_soon_threadsafe(self._put, value)
+            else:
+                self._put(value)
+
+    def _put(self, value):
+        try:
+            self._queue.put_nowait((self.name, value))
+        except QUEUE_FULL:
+            pass
+
+
+class PollingService(object):
+    """Poll the features of a driver at the rate requested by observers.
+
+    All the subscriptions to the same feature are coalesced : the feature is
+    read at the fastest requested rate and all observers are notified when its
+    value changes. The features due at the same time are read in a batch
+    without releasing the driver lock. The batches are submitted at low
+    priority to the request scheduler of the driver (see
+    get_request_scheduler) so that they never delay more urgent requests.
+    Reads always query the instrument, the cached value of the feature being
+    discarded before reading it.
+
+    Observers are notified from the polling thread. They can provide a
+    callback, or a queue (queue.Queue or, if the event loop is given,
+    asyncio.Queue) in which (name, value) tuples are put.
+
+    The polling thread runs only while there are subscriptions. The service
+    does not keep the driver alive and stops when the driver is garbage
+    collected.
+
+    Parameters
+    ----------
+    driver : HasFeatures
+        Driver whose features should be polled.
+
+    """
+    def __init__(self, driver):
+        self._driver = ref(driver, self._driver_collected)
+        self._polled = {}
+        self._cond = Condition()
+        self._thread = None
+        self._running = False
+
+    @property
+    def driver(self):
+        """Driver whose features are polled, None if it was collected.
+
+        """
+        return self._driver()
+
+    def subscribe(self, name, period, callback=None, queue=None, loop=None):
+        """Start polling a feature.
+
+        The observer is notified immediately of the current value (read right
+        away or from the previous reads) and then each time it changes.
+
+        Parameters
+        ----------
+        name : unicode
+            Name of the feature to poll. Dotted names can be used to access
+            the features of subsystems.
+        period : float
+            Maximal time in seconds between two reads of the feature.
+        callback : callable, optional
+            Callable to call with the name of the feature and its new value.
+        queue : optional
+            Queue in which to put (name, value) tuples.
+        loop : optional
+            Asyncio event loop to which the queue belongs.
+
+        Returns
+        -------
+        subscription : Subscription
+            Handle which can be used to cancel the subscription.
+
+        """
+        sub = Subscription(self, name, period, callback, queue, loop)
+        with self._cond:
+            if name not in self._polled:
+                self._polled[name] = _PolledFeature(name)
+            polled = self._polled[name]
+            polled.subscriptions.append(sub)
+            polled.update_period()
+            has_value, value = polled.has_value, polled.value
+            if not has_value:
+                polled.next_read = time()
+            if not self._running:
+                self._start()
+            self._cond.notify()
+
+        if has_value:
+            self._notify(sub, value)
+        return sub
+
+    def stop(self, timeout=None):
+        """Stop polling and cancel all subscriptions.
+
+        """
+        with self._cond:
+            self._polled.clear()
+            thread = self._halt()
+        self._join(thread, timeout)
+
+    @property
+    def polled_features(self):
+        """Mapping between the polled features and their reading period.
+
+        """
+        with self._cond:
+            return {k: v.period for k, v in self._polled.items()}
+
+    # =========================================================================
+    # --- Private API ---------------------------------------------------------
+    # =========================================================================
+
+    def _start(self):
+        """Start the polling thread.
+
+        """
+        self._running = True
+        self._thread = Thread(target=self._run, name='PollingService')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _halt(self):
+        """Ask the polling thread to stop and return it.
+
+        Must be called while holding the condition.
+
+        """
+        thread, self._thread = self._thread, None
+        self._running = False
+        self._cond.notify()
+        return thread
+
+    def _join(self, thread, timeout=None):
+        """Wait for a halted polling thread unless called from it.
+
+        """
+        if thread is not None and thread is not current_thread():
+            thread.join(timeout)
+
+    def _driver_collected(self, reference):
+        """Stop polling once the driver has been garbage collected.
+
+        """
+        with self._cond:
+            self._polled.clear()
+            self._halt()
+
+    def _unsubscribe(self, sub):
+        """Remove a subscription and stop polling the feature if possible.
+
+        """
+        thread = None
+        with self._cond:
+            polled = self._polled.get(sub.name)
+            if polled is None or sub not in polled.subscriptions:
+                return
+            polled.subscriptions.remove(sub)
+            if polled.subscriptions:
+                polled.update_period()
+            else:
+                del self._polled[sub.name]
+            if not self._polled:
+                thread = self._halt()
+            else:
+                self._cond.notify()
+        self._join(thread)
+
+    def _run(self):
+        """Read the features when they are due and notify the observers.
+
+        """
+        this_thread = current_thread()
+        while True:
+            with self._cond:
+                # A thread started after this one was halted takes over.
+                if not self._running or self._thread is not this_thread:
+                    return
+                now = time()
+                due = [p for p in self._polled.values() if p.next_read <= now]
+                if not due:
+                    next_read = min([p.next_read
+                                     for p in self._polled.values()] or
+                                    [now + 1])
+                    self._cond.wait(next_read - now)
+                    continue
+
+            values = self._read(due)
+            if values is None:
+                return
+
+            notifications = []
+            with self._cond:
+                now = time()
+                for polled in due:
+                    polled.next_read += polled.period
+                    if polled.next_read < now:
+                        polled.next_read = now + polled.period
+                    if polled.name not in values:
+                        continue
+                    value = values[polled.name]
+                    try:
+                        changed = polled.update_value(value)
+                    except Exception:
+                        logger = logging.getLogger(__name__)
+                        logger.exception('Failed to compare the values of %s',
+                                         polled.name)
+                        polled.value = value
+                        polled.has_value = changed = True
+                    if changed:
+                        notifications.extend((sub, polled.value)
+                                             for sub in polled.subscriptions)
+
+            for sub, value in notifications:
+                self._notify(sub, value)
+
+    def _read(self, due):
+        """Read the value of the due features in a single batch.
+
+        Returns None if the driver has been garbage collected.
+
+        """
+        driver = self.driver
+        if driver is None:
+            return None
+        scheduler = get_request_scheduler(driver)
+        del driver
+        # The request only holds a weak reference so that a pending read does
+        # not keep the driver alive.
+        request = scheduler.submit(_read_batch, (self._driver, due),
+                                   priority=LOW_PRIORITY)
+        try:
+            return request.result()
+        except RequestCancelled:
+            # The scheduler was stopped, the features are read again later.
+            return {}
+
+    def _notify(self, sub, value):
+        """Notify an observer without letting it break the polling.
+
+        """
+        try:
+            sub.notify(value)
+        except Exception:
+            logger = logging.getLogger(__name__)
+            logger.exception('Failed to notify observer of %s', sub.name)
+
+
+def _read_batch(driver_ref, due):
+    """Read the value of a batch of features, executed by the scheduler.
+
+    """
+    values = {}
+    driver = driver_ref()
+    if driver is None:
+        return values
+    for polled in due:
+        obj = driver
+        path = polled.name.split('.')
+        try:
+            for part in path[:-1]:
+                obj = getattr(obj, part)
+            obj.clear_cache(features=(path[-1],))
+            values[polled.name] = getattr(obj, path[-1])
+        except Exception:
+            logger = logging.getLogger(__name__)
+            logger.exception('Failed to poll %s', polled.name)
+    return values
+
+
+class _PolledFeature(object):
+    """Polling state of a feature.
+
+    """
+    __slots__ = ('name', 'subscriptions', 'period', 'next_read', 'value',
+                 'has_value')
+
+    def __init__(self, name):
+        self.name = name
+        self.subscriptions = []
+        self.period = None
+        self.next_read = 0
+        self.value = None
+        self.has_value = False
+
+    def update_period(self):
+        """Use the shortest period requested by the observers.
+
+        """
+        period = min(s.period for s in self.subscriptions)
+        if self.period is not None and period < self.period:
+            self.next_read = min(self.next_read, time() + period)
+        self.period = period
+
+    def update_value(self, value):
+        """Store the new value and return whether or not it changed.
+
+        """
+        if self.has_value:
+            try:
+                changed = bool(value != self.value)
+            except ValueError:
+                # Element-wise comparison of arrays, arrays of different
+                # shapes being always different.
+                try:
+                    changed = bool((value != self.value).any())
+                except (ValueError, AttributeError):
+                    changed = True
+        else:
+            changed = True
+        self.value = value
+        self.has_value = True
+        return changed
@@ -0,0 +1,298 @@
+# -*- coding: utf-8 -*-
+"""
+    lantz_core.ramping
+    ~~~~~~~~~~~~~~~~~~
+
+    Rate limited ramping of Float features in a background thread.
+
+    :copyright: 2015 by Lantz Authors, see AUTHORS for more details.
+    :license: BSD, see LICENSE for more details.
+
+"""
+from __future__ import (division, unicode_literals, print_function,
+                        absolute_import)
+import sys
+from math import ceil, floor
+from threading import Thread, Event, Lock
+from time import time
+
+from future.utils import raise_
+
+from .errors import TimeoutError, RequestCancelled
+from .unit import is_quantity, get_unit_registry
+
+try:
+    import numpy as np
+    NUMPY_SUPPORT = True
+except ImportError:
+    NUMPY_SUPPORT = False
+
+#: Time in seconds between two setpoints when only a rate is specified.
+DEFAULT_RAMP_PERIOD = 0.1
+
+
+def compute_setpoints(start, target, step, grid_step=None, grid_origin=0.):
+    """Compute the setpoints to go from start to target by steps.
+
+    Parameters
+    ----------
+    start : float
+        Value from which the ramp starts (not included in the setpoints).
+    target : float
+        Value at which the ramp ends (always the last setpoint).
+    step : float
+        Maximal difference between two consecutive setpoints.
+    grid_step : float, optional
+        Resolution of the feature. The intermediate setpoints are rounded to
+        the closest multiple of it.
+    grid_origin : float, optional
+        Value from which the multiples of grid_step are counted.
+
+    Returns
+    -------
+    setpoints : list
+        List of the values to set, in order.
+
+    """
+    distance = target - start
+    if not distance:
+        return []
+    step = abs(step) if step else abs(distance)
+    sign = 1 if distance > 0 else -1
+
+    # When a grid is used, the ramp is anchored on the last grid point before
+    # start so that all the intermediate setpoints are on the grid and no
+    # jump exceeds the step.
+    anchor = start
+    if grid_step:
+        step = max(1, int(step/grid_step + 1e-9))*grid_step
+        position = (start - grid_origin)/grid_step
+        position = (floor(position + 1e-9) if sign > 0 else
+                    ceil(position - 1e-9))
+        anchor = position*grid_step + grid_origin
+    n = int(ceil(abs(target - anchor)/step - 1e-9))
+
+    if NUMPY_SUPPORT:
+        points = anchor + sign*step*np.arange(1, n)
+        if grid_step:
+            points = (np.round((points - grid_origin)/grid_step)*grid_step +
+                      grid_origin)
+        points = points.tolist()
+    else:
+        points = [anchor + sign*step*i for i in range(1, n)]
+        if grid_step:
+            points = [round((p - grid_origin)/grid_step)*grid_step +
+                      grid_origin for p in points]
+    if points and abs(points[-1] - target) < 1e-9*step:
+        del points[-1]
+    points.append(target)
+    return points
+
+class Ramp(object):
+    """Ramp of a feature executed in a background thread.
+
+    The setpoints are set on a fixed schedule (one every period seconds from
+    the start) so that the time spent communicating with the instrument does
+    not slow down the ramp. Each setpoint is set as a normal value so the
+    cache always holds the current setpoint.
+
+    Parameters
+    ----------
+    driver : HasFeatures
+        Object owning the feature.
+    name : unicode
+        Name of the feature to ramp.
+    setpoints : list
+        Values to set in order.
+    period : float
+        Time in seconds between two setpoints.
+
+    """
+    def __init__(self, driver, name, setpoints, period):
+        self.driver = driver
+        self.name = name
+        self.setpoints = setpoints
+        self.period = period
+        #: Last value set, None if no value was set yet.
+        self.current = None
+        self._cancel = Event()
+        self._done = Event()
+        self._error = None
+        self._callbacks = []
+        self._callbacks_lock = Lock()
+        self._thread = Thread(target=self._run, name='Ramp')
+        self._thread.daemon = True
+
+    def start(self):
+        """Start ramping.
+
+        """
+        self._thread.start()
+        return self
+
+    def cancel(self):
+        """Stop the ramp at the current setpoint.
+
+        Returns
+        -------
+        cancelled : bool
+            Whether or not the ramp was stopped before completing.
+
+        """
+        self._cancel.set()
+        self._done.wait()
+        return self.cancelled
+
+    @property
+    def done(self):
+        """Whether or not the ramp completed (successfully or not).
+
+        """
+        return self._done.is_set()
+
+    @property
+    def cancelled(self):
+        """Whether or not the ramp was cancelled before completing.
+
+        """
+        return (self._error is not None and
+                self._error[0] is RequestCancelled)
+
+    def result(self, timeout=None):
+        """Wait for the ramp to complete and return the final value.
+
+        Raises
+        ------
+        TimeoutError :
+            Raised if the ramp did not complete in time.
+        RequestCancelled :
+            Raised if the ramp was cancelled.
+
+        """
+        if not self._done.wait(timeout):
+            raise TimeoutError('The ramp did not complete in time.')
+        if self._error:
+            raise_(*self._error)
+        return self.current
+
+    def add_done_callback(self, callback):
+        """Call a callable with the ramp once it completes.
+
+        """
+        with self._callbacks_lock:
+            if not self._done.is_set():
+                self._callbacks.append(callback)
+                return
+        callback(self)
+
+    def as_asyncio_future(self, loop=None):
+        """Build an asyncio future completing with the ramp.
+
+        Cancelling the future cancels the ramp.
+
+        """
+        import asyncio
+        loop = loop or asyncio.get_event_loop()
+        future = loop.create_future()
+
+        def set_result(ramp):
+            if future.done():
+                return
+            if ramp._error:
+                if ramp.cancelled:
+                    future.cancel()
+                else:
+                    future.set_exception(ramp._error[1])
+            else:
+                future.set_result(ramp.current)
+
+        def cancel_ramp(fut):
+            if fut.cancelled():
+                self._cancel.set()
+
+        future.add_done_callback(cancel_ramp)
+        self.add_done_callback(
+            lambda ramp: loop.call_soon_threadsafe(set_result, ramp))
+        return future
+
+    def _run(self):
+        """Set the setpoints on schedule.
+
+        """
+        try:
+            start = time()
+            for i, value in enumerate(self.setpoints):
+                if i:
+                    delay = start + i*self.period - time()
+                    if delay > 0:
+                        self._cancel.wait(delay)
+                if self._cancel.is_set():
+                    raise RequestCancelled('The ramp was cancelled.')
+                setattr(self.driver, self.name, value)
+                self.current = value
+        except Exception:
+            self._error = sys.exc_info()
+
+        with self._callbacks_lock:
+            self._done.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            callback(self)
+
+
+def ramp(driver, name, target, rate=None, step=None):
+    """Ramp a Float feature to a target value.
+
+    See HasFeatures.ramp for the description of the parameters.
+
+    """
+    feat = driver.get_feat(name)
+    unit = getattr(feat, 'unit', None)
+    if is_quantity(target):
+        target = target.to(unit).magnitude if unit else target.magnitude
+    if is_quantity(rate):
+        rate = rate*get_unit_registry().second
+        rate = rate.to(unit).magnitude if unit else rate.magnitude
+    if is_quantity(step):
+        step = step.to(unit).magnitude if unit else step.magnitude
+    if rate is not None and not rate > 0:
+        raise ValueError('The rate of a ramp must be positive, '
+                         'not {}.'.format(rate))
+
+    # Validate the target before starting to move.
+    feat.pre_set(driver, target)
+
+    start = getattr(driver, name)
+    if is_quantity(start):
+        start = start.to(unit).magnitude if unit else start.magnitude
+
+    limits_id = getattr(feat, 'limits_id', None)
+    if limits_id:
+        limits = driver.get_limits(limits_id)
+    else:
+        limits = getattr(feat, 'limits', None)
+    grid_step = getattr(limits, 'step', None)
+    grid_origin = getattr(limits, 'minimum', None)
+    if grid_origin is None:
+        grid_origin = getattr(limits, 'maximum', None) or 0.
+    lim_unit = getattr(limits, 'unit', None)
+    if grid_step and lim_unit and unit and lim_unit != unit:
+        factor = (1*lim_unit).to(unit).magnitude
+        grid_step *= factor
+        grid_origin *= factor
+
+    if step is None:
+        if rate:
+            step = rate*DEFAULT_RAMP_PERIOD
+        else:
+            step = grid_step
+    setpoints = compute_setpoints(start, target, step, grid_step,
+                                  grid_origin)
+
+    # The largest jump sets the pace so that the rate is never exceeded.
+    period = 0.
+    if rate and setpoints:
+        jumps = [abs(b - a) for a, b in zip([start] + setpoints[:-1],
+                                            setpoints)]
+        period = max(jumps)/rate
+    return Ramp(driver, name, setpoints, period).start()
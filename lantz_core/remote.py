@@ -0,0 +1,575 @@
+# -*- coding: utf-8 -*-
+"""
+    lantz_core.remote
+    ~~~~~~~~~~~~~~~~~
+
+    Access a driver living in another process.
+
+    A DriverServer exposes a driver over a local socket (or named pipe), and
+    DriverProxy objects, which can be pickled and hence passed to the workers
+    of a multiprocessing pool, forward the accesses to features, actions and
+    methods to it. All the processes then share the same connection to the
+    instrument.
+
+    Large NumPy arrays and bytes are transferred through shared memory blocks
+    (when available, Python 3.8+) rather than being pickled. Arrays are then
+    received as views on the shared memory, without any copy.
+
+    :copyright: 2015 by Lantz Authors, see AUTHORS for more details.
+    :license: BSD, see LICENSE for more details.
+
+"""
+from __future__ import (division, unicode_literals, print_function,
+                        absolute_import)
+import os
+import logging
+from collections import namedtuple
+from threading import Thread, Lock
+from multiprocessing.connection import Listener, Client
+
+from future.utils import raise_with_traceback
+from future.moves import pickle
+
+from .errors import LantzError
+
+try:
+    import numpy as np
+    NUMPY_SUPPORT = True
+except ImportError:
+    NUMPY_SUPPORT = False
+
+try:
+    from multiprocessing.shared_memory import SharedMemory
+    from multiprocessing import resource_tracker
+    SHARED_MEMORY_SUPPORT = True
+except ImportError:
+    SHARED_MEMORY_SUPPORT = False
+
+
+class RemoteError(LantzError):
+    """Error raised by the server which could not be transmitted as is.
+
+    """
+    pass
+
+
+def dumps(obj):
+    """Serialize a message exchanged between a server and its proxies.
+
+    """
+    return pickle.dumps(obj, pickle.HIGHEST_PROTOCOL)
+
+
+def loads(data):
+    """Deserialize a message exchanged between a server and its proxies.
+
+    """
+    return pickle.loads(data)
+
+
+#: Description of a value stored in a shared memory block.
+SharedBlock = namedtuple('SharedBlock', 'name kind shape dtype size')
+
+
+def export_shared(value, threshold, names):
+    """Move the large arrays and bytes of a value into shared memory blocks.
+
+    The items of lists, tuples and dicts are also exported, but not the
+    content of nested containers.
+
+    Parameters
+    ----------
+    value :
+        Value to export.
+    threshold : int
+        Minimal size in bytes of the values to export.
+    names : list
+        List to which the names of the created blocks are added.
+
+    Returns
+    -------
+    value :
+        Value in which the exported items are replaced by SharedBlock
+        descriptors.
+
+    """
+    if isinstance(value, dict):
+        return dict((k, _export(v, threshold, names))
+                    for k, v in value.items())
+    if isinstance(value, (list, tuple)) and not hasattr(value, '_fields'):
+        return type(value)(_export(v, threshold, names) for v in value)
+    return _export(value, threshold, names)
+
+
+def import_shared(value):
+    """Replace the SharedBlock descriptors of a value by the shared data.
+
+    Arrays are views on the shared memory, while bytes are copied out of it.
+    Blocks are unlinked once attached so that their memory is released as
+    soon as the last view on them is discarded.
+
+    """
+    if isinstance(value, SharedBlock):
+        return _import(value)
+    if isinstance(value, dict):
+        return dict((k, _import(v) if isinstance(v, SharedBlock) else v)
+                    for k, v in value.items())
+    if isinstance(value, (list, tuple)) and not hasattr(value, '_fields'):
+        return type(value)(_import(v) if isinstance(v, SharedBlock) else v
+                           for v in value)
+    return value
+
+
+def unlink_shared(names):
+    """Unlink shared memory blocks, ignoring the ones already unlinked.
+
+    """
+    for name in names:
+        try:
+            block = SharedMemory(name)
+        except (IOError, OSError):
+            continue
+        block.close()
+        try:
+            block.unlink()
+        except (IOError, OSError):
+            pass
+
+
+def _export(value, threshold, names):
+    """Export a single value in a shared memory block if relevant.
+
+    """
+    if NUMPY_SUPPORT and isinstance(value, np.ndarray):
+        if value.dtype.hasobject or value.nbytes < threshold:
+            return value
+        kind = 'array'
+        size = value.nbytes
+    elif isinstance(value, (bytes, bytearray)):
+        if len(value) < threshold:
+            return value
+        kind = 'bytes'
+        size = len(value)
+    else:
+        return value
+
+    try:
+        block = _create_block(size)
+    except (IOError, OSError):
+        # Fall back to pickling if no shared memory is available.
+        return value
+    try:
+        if kind == 'array':
+            dest = np.ndarray(value.shape, value.dtype, buffer=block.buf)
+            dest[...] = value
+            del dest
+            desc = SharedBlock(block.name, kind, value.shape, value.dtype,
+                               size)
+        else:
+            block.buf[:size] = value
+            desc = SharedBlock(block.name, kind, None, None, size)
+    finally:
+        block.close()
+
+    names.append(block.name)
+    return desc
+
+
+def _create_block(size):
+    """Create a shared memory block which is not unlinked when this process
+    exits, as it is unlinked by the consumer.
+
+    """
+    try:
+        return SharedMemory(create=True, size=size, track=False)
+    except TypeError:
+        # Before Python 3.13 blocks are always tracked on POSIX systems, under
+        # their name prefixed by a slash.
+        block = SharedMemory(create=True, size=size)
+        if os.name == 'posix':
+            resource_tracker.unregister('/' + block.name, 'shared_memory')
+        return block
+
+
+def _import(desc):
+    """Retrieve the value stored in a shared memory block.
+
+    """
+    block = _AttachedMemory(desc.name)
+    block.unlink()
+    block.close()
+    if desc.kind == 'bytes':
+        return bytes(block.buf[:desc.size])
+
+    return np.ndarray(desc.shape, desc.dtype, buffer=block.buf)
+
+
+if SHARED_MEMORY_SUPPORT:
+    class _AttachedMemory(SharedMemory):
+        """Shared memory block whose mapping outlives the object.
+
+        Closing only releases the file descriptor (if any), the mapping being
+        released when the last view on it is discarded. NumPy does not keep
+        the buffer exported, so closing the mapping would leave the arrays
+        using it dangling.
+
+        """
+        def close(self):
+            fd = getattr(self, '_fd', -1)
+            if fd >= 0:
+                os.close(fd)
+                self._fd = -1
+
+
+class DriverServer(object):
+    """Serve the requests of the proxies of a driver.
+
+    Each connected proxy is served by a dedicated thread. The driver lock
+    serializes the accesses to the instrument.
+
+    Parameters
+    ----------
+    driver : HasFeatures
+        Driver to expose.
+    address : optional
+        Address on which to listen, as accepted by
+        multiprocessing.connection.Listener. By default a free address is
+        picked.
+    authkey : bytes, optional
+        Key used to authenticate the proxies. By default the authkey of the
+        current process is used, which is inherited by the processes it
+        starts.
+    shm_threshold : int or None, optional
+        Minimal size in bytes of the arrays and bytes transferred through
+        shared memory. None disables the use of shared memory.
+
+    """
+    def __init__(self, driver, address=None, authkey=None,
+                 shm_threshold=2**20):
+        self.driver = driver
+        self._authkey = authkey
+        self.shm_threshold = (shm_threshold if SHARED_MEMORY_SUPPORT
+                              else None)
+        self._listener = Listener(address, authkey=self._get_authkey())
+        self._connections = []
+        self._lock = Lock()
+        self._running = False
+        self._thread = None
+
+    @property
+    def address(self):
+        """Address on which the server listens.
+
+        """
+        return self._listener.address
+
+    def start(self):
+        """Start accepting connections.
+
+        """
+        self._running = True
+        self._thread = Thread(target=self._accept, name='DriverServer')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """Stop the server and close all the connections.
+
+        """
+        self._running = False
+        # Connecting unblocks the accepting thread.
+        try:
+            Client(self.address, authkey=self._get_authkey()).close()
+        except Exception:
+            pass
+        self._listener.close()
+        if self._thread is not None:
+            self._thread.join()
+        with self._lock:
+            for conn in self._connections:
+                conn.close()
+            del self._connections[:]
+
+    def proxy(self):
+        """Create a proxy connecting to this server.
+
+        """
+        return DriverProxy(self.address, self._authkey)
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    # =========================================================================
+    # --- Private API ---------------------------------------------------------
+    # =========================================================================
+
+    def _get_authkey(self):
+        if self._authkey is not None:
+            return self._authkey
+        from multiprocessing import current_process
+        return current_process().authkey
+
+    def _accept(self):
+        """Accept the connections and start serving them.
+
+        """
+        while self._running:
+            try:
+                conn = self._listener.accept()
+            except Exception:
+                if self._running:
+                    logger = logging.getLogger(__name__)
+                    logger.exception('Failed to accept a connection')
+                continue
+            if not self._running:
+                conn.close()
+                return
+            with self._lock:
+                self._connections.append(conn)
+            thread = Thread(target=self._serve, args=(conn,),
+                            name='DriverServer connection')
+            thread.daemon = True
+            thread.start()
+
+    def _serve(self, conn):
+        """Answer the requests sent through a connection.
+
+        """
+        # Shared memory blocks sent in the last answer. Once the next request
+        # is received they have been attached and unlinked by the proxy.
+        shared = []
+        try:
+            while self._running:
+                try:
+                    request = loads(conn.recv_bytes())
+                except (EOFError, IOError, OSError):
+                    return
+                del shared[:]
+                try:
+                    value = self._handle(*request)
+                    if self.shm_threshold is not None:
+                        value = export_shared(value, self.shm_threshold,
+                                              shared)
+                    answer = (True, value)
+                except Exception as e:
+                    answer = (False, e)
+                try:
+                    data = dumps(answer)
+                except Exception:
+                    data = dumps((False, RemoteError(repr(answer[1]))))
+                conn.send_bytes(data)
+        except (IOError, OSError):
+            pass
+        finally:
+            unlink_shared(shared)
+            conn.close()
+            with self._lock:
+                if conn in self._connections:
+                    self._connections.remove(conn)
+
+    def _handle(self, operation, path, *args):
+        """Perform an operation on the object found at the given path.
+
+        """
+        obj = self._resolve(path)
+        if operation == 'get':
+            return getattr(obj, _public(args[0]))
+
+        elif operation == 'set':
+            setattr(obj, _public(args[0]), args[1])
+
+        elif operation == 'call':
+            name, c_args, c_kwargs = args
+            return getattr(obj, _public(name))(*c_args, **c_kwargs)
+
+        elif operation == 'get_many':
+            with self.driver.lock:
+                return dict((n, getattr(obj, _public(n))) for n in args[0])
+
+        elif operation == 'describe':
+            cls = type(obj)
+            features = frozenset(getattr(cls, '__feats__', ()))
+            subparts = frozenset(list(getattr(cls, '__subsystems__', ())) +
+                                 list(getattr(cls, '__channels__', ())))
+            methods = frozenset(n for n in dir(cls)
+                                if not n.startswith('_') and
+                                n not in features and n not in subparts and
+                                callable(getattr(cls, n, None)))
+            return features, subparts, methods
+
+        else:
+            raise ValueError('Unknown operation {}'.format(operation))
+
+    def _resolve(self, path):
+        """Find the object designated by a path.
+
+        Path are tuples whose items are either attribute names or, when
+        wrapped in a tuple, keys to retrieve an item (a channel for example).
+
+        """
+        obj = self.driver
+        for step in path:
+            if isinstance(step, tuple):
+                obj = obj[step[0]]
+            else:
+                obj = getattr(obj, _public(step))
+        return obj
+
+
+def _public(name):
+    """Forbid the access to private attributes.
+
+    """
+    if name.startswith('_'):
+        raise AttributeError('Private attribute {} cannot be accessed '
+                             'remotely'.format(name))
+    return name
+
+
+class _Client(object):
+    """Connection to a server, re-opened after a fork.
+
+    """
+    def __init__(self, address, authkey):
+        self.address = address
+        self.authkey = authkey
+        self._conn = None
+        self._pid = None
+        self._lock = Lock()
+
+    def request(self, *request):
+        """Send a request and wait for the answer.
+
+        """
+        with self._lock:
+            conn = self._connect()
+            conn.send_bytes(dumps(request))
+            success, value = loads(conn.recv_bytes())
+        if not success:
+            raise_with_traceback(value)
+        return import_shared(value)
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None and self._pid == os.getpid():
+                self._conn.close()
+            self._conn = None
+
+    def _connect(self):
+        if self._conn is None or self._pid != os.getpid():
+            authkey = self.authkey
+            if authkey is None:
+                from multiprocessing import current_process
+                authkey = current_process().authkey
+            self._conn = Client(self.address, authkey=authkey)
+            self._pid = os.getpid()
+        return self._conn
+
+
+class DriverProxy(object):
+    """Proxy forwarding the accesses to a driver exposed by a DriverServer.
+
+    Features are accessed as attributes. Subsystems and channels (using
+    indexing) give access to proxies of the corresponding subparts. Methods
+    (and actions) give access to callables calling them on the server, while
+    the values of the other attributes (such as properties) are retrieved
+    from the server. The connection is opened on first use, and proxies can
+    be pickled.
+
+    Parameters
+    ----------
+    address :
+        Address of the server.
+    authkey : bytes, optional
+        Key used to authenticate to the server. By default the authkey of the
+        current process is used.
+
+    """
+    def __init__(self, address, authkey=None, _path=(), _client=None):
+        object.__setattr__(self, '_path', _path)
+        object.__setattr__(self, '_client',
+                           _client or _Client(address, authkey))
+        object.__setattr__(self, '_description', None)
+
+    def get(self, name):
+        """Read a feature.
+
+        """
+        return self._client.request('get', self._path, name)
+
+    def set(self, name, value):
+        """Set a feature.
+
+        """
+        self._client.request('set', self._path, name, value)
+
+    def get_many(self, names):
+        """Read several features without releasing the driver lock.
+
+        Returns
+        -------
+        values : dict
+            Values of the features by name.
+
+        """
+        return self._client.request('get_many', self._path, list(names))
+
+    def call(self, name, *args, **kwargs):
+        """Call a method or an action.
+
+        """
+        return self._client.request('call', self._path, name, args, kwargs)
+
+    def close(self):
+        """Close the connection to the server.
+
+        """
+        self._client.close()
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        features, subparts, methods = self._describe()
+        if name in subparts:
+            return self._child(name)
+        if name in methods:
+            def call(*args, **kwargs):
+                return self.call(name, *args, **kwargs)
+            return call
+        return self.get(name)
+
+    def __setattr__(self, name, value):
+        if name not in self._describe()[0]:
+            raise AttributeError('{} is not a feature'.format(name))
+        self.set(name, value)
+
+    def __getitem__(self, key):
+        return self._child((key,))
+
+    def __getstate__(self):
+        return (self._client.address, self._client.authkey, self._path)
+
+    def __setstate__(self, state):
+        address, authkey, path = state
+        self.__init__(address, authkey, path)
+
+    # =========================================================================
+    # --- Private API ---------------------------------------------------------
+    # =========================================================================
+
+    def _child(self, step):
+        return type(self)(None, None, self._path + (step,), self._client)
+
+    def _describe(self):
+        """Get the names of the features, subparts and methods of the remote
+        object.
+
+        """
+        if self._description is None:
+            object.__setattr__(self, '_description',
+                               self._client.request('describe', self._path))
+        return self._description
@@ -0,0 +1,361 @@
+# -*- coding: utf-8 -*-
+"""
+    lantz_core.scheduler
+    ~~~~~~~~~~~~~~~~~~~~
+
+    Priority based scheduling of the requests sent to a driver.
+
+    :copyright: 2015 by Lantz Authors, see AUTHORS for more details.
+    :license: BSD, see LICENSE for more details.
+
+"""
+from __future__ import (division, unicode_literals, print_function,
+                        absolute_import)
+import sys
+from heapq import heappush, heappop
+from itertools import count
+from threading import Thread, Condition, Event, Lock, current_thread
+from time import time
+from weakref import WeakKeyDictionary, ref
+
+from future.utils import raise_
+
+from .errors import TimeoutError, RequestCancelled
+
+#: Priority of requests which should be executed before any other (ex: safety
+#: interlocks).
+HIGH_PRIORITY = 0
+
+#: Priority used by default.
+NORMAL_PRIORITY = 10
+
+#: Priority of background requests (ex: polling, logging).
+LOW_PRIORITY = 20
+
+# States of a request.
+_PENDING, _RUNNING, _DONE, _CANCELLED = range(4)
+
+_SCHEDULERS = WeakKeyDictionary()
+
+_SCHEDULERS_LOCK = Lock()
+
+
+def get_request_scheduler(driver):
+    """Access the request scheduler of a driver, creating it if necessary.
+
+    Background services (such as the polling service) submit their requests
+    through it so that they do not delay the requests of higher priority. A
+    new scheduler is created if the previous one was stopped.
+
+    """
+    with _SCHEDULERS_LOCK:
+        scheduler = _SCHEDULERS.get(driver)
+        if scheduler is None or not scheduler.running:
+            scheduler = _SCHEDULERS[driver] = RequestScheduler(driver)
+        return scheduler
+
+
+class Request(object):
+    """Operation waiting to be executed by a RequestScheduler.
+
+    Parameters
+    ----------
+    func : callable
+        Callable to execute.
+    args : tuple
+        Positional arguments to pass to the callable.
+    kwargs : dict
+        Keyword arguments to pass to the callable.
+    priority : int
+        Priority of the request, lower values are executed first.
+    deadline : float or None
+        Time (as returned by time.time) after which the request should not be
+        executed anymore.
+
+    """
+    __slots__ = ('func', 'args', 'kwargs', 'priority', 'deadline', '_state',
+                 '_state_lock', '_event', '_value', '_error')
+
+    def __init__(self, func, args, kwargs, priority, deadline):
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.priority = priority
+        self.deadline = deadline
+        self._state = _PENDING
+        self._state_lock = Lock()
+        self._event = Event()
+        self._value = None
+        self._error = None
+
+    @property
+    def done(self):
+        """Whether or not the request completed (successfully or not).
+
+        """
+        return self._event.is_set()
+
+    @property
+    def cancelled(self):
+        """Whether or not the request was cancelled.
+
+        """
+        return self._state == _CANCELLED
+
+    def cancel(self):
+        """Cancel the request if its execution did not start.
+
+        Returns
+        -------
+        cancelled : bool
+            Whether or not the request was cancelled.
+
+        """
+        return self._abort(RequestCancelled('The request was cancelled.'))
+
+    def result(self, timeout=None):
+        """Wait for the request to complete and return its result.
+
+        Parameters
+        ----------
+        timeout : float, optional
+            Maximal time to wait for the request to complete.
+
+        Raises
+        ------
+        TimeoutError :
+            Raised if the request did not complete in time or if it was not
+            executed before its deadline.
+        RequestCancelled :
+            Raised if the request was cancelled.
+
+        """
+        if not self._event.wait(timeout):
+            raise TimeoutError('The request did not complete in time.')
+        if self._error:
+            raise_(*self._error)
+        return self._value
+
+    def _abort(self, error):
+        """Mark the request as failed if its execution did not start.
+
+        """
+        with self._state_lock:
+            if self._state != _PENDING:
+                return False
+            self._state = _CANCELLED
+        self._error = (type(error), error, None)
+        self._event.set()
+        return True
+
+    def _execute(self):
+        """Execute the request unless it was cancelled or is expired.
+
+        """
+        if self.deadline is not None and time() > self.deadline:
+            self._abort(TimeoutError('The request expired before being '
+                                     'executed.'))
+            return
+
+        with self._state_lock:
+            if self._state != _PENDING:
+                return
+            self._state = _RUNNING
+
+        try:
+            self._value = self.func(*self.args, **self.kwargs)
+        except Exception:
+            self._error = sys.exc_info()
+        self._state = _DONE
+        self._event.set()
+
+
+class RequestScheduler(object):
+    """Execute the requests submitted for a driver by order of priority.
+
+    Requests are executed one at a time by a worker thread holding the driver
+    lock. Among the pending requests, the one with the lowest priority value
+    is executed first, requests with the same priority being executed in
+    submission order. For the priorities to be meaningful all the
+    communications with the driver should go through the scheduler, as
+    direct accesses are only serialized by the driver lock.
+
+    The scheduler does not keep the driver alive and stops when the driver is
+    garbage collected.
+
+    Parameters
+    ----------
+    driver : HasFeatures
+        Driver to which the requests are addressed.
+
+    """
+    def __init__(self, driver):
+        self._driver = ref(driver, self._driver_collected)
+        self._heap = []
+        self._counter = count()
+        self._cond = Condition()
+        self._running = True
+        self._thread = Thread(target=self._run, name='RequestScheduler')
+        self._thread.daemon = True
+        self._thread.start()
+
+    @property
+    def driver(self):
+        """Driver to which the requests are addressed, None if it was
+        collected.
+
+        """
+        return self._driver()
+
+    @property
+    def running(self):
+        """Whether or not the scheduler accepts new requests.
+
+        """
+        return self._running
+
+    def submit(self, func, args=(), kwargs=None, priority=NORMAL_PRIORITY,
+               deadline=None):
+        """Submit a request.
+
+        Parameters
+        ----------
+        func : callable
+            Callable to execute.
+        args : tuple, optional
+            Positional arguments to pass to the callable.
+        kwargs : dict, optional
+            Keyword arguments to pass to the callable.
+        priority : int, optional
+            Priority of the request, lower values are executed first.
+        deadline : float, optional
+            Time in seconds from now after which the request should not be
+            executed anymore.
+
+        Returns
+        -------
+        request : Request
+            Object which can be used to retrieve the result or cancel the
+            request.
+
+        """
+        if deadline is not None:
+            deadline += time()
+        request = Request(func, args, kwargs or {}, priority, deadline)
+        with self._cond:
+            if not self._running:
+                raise RuntimeError('The scheduler is stopped.')
+            heappush(self._heap, (priority, next(self._counter), request))
+            self._cond.notify()
+        return request
+
+    def get(self, name, priority=NORMAL_PRIORITY, deadline=None):
+        """Submit a request reading a feature.
+
+        Parameters
+        ----------
+        name : unicode
+            Name of the feature. Dotted names can be used to access the
+            features of subsystems.
+
+        See submit for the other parameters.
+
+        """
+        return self.submit(_get, (self.driver, name), None, priority,
+                           deadline)
+
+    def set(self, name, value, priority=NORMAL_PRIORITY, deadline=None):
+        """Submit a request setting a feature.
+
+        Parameters
+        ----------
+        name : unicode
+            Name of the feature. Dotted names can be used to access the
+            features of subsystems.
+        value :
+            Value to set.
+
+        See submit for the other parameters.
+
+        """
+        return self.submit(_set, (self.driver, name, value), None, priority,
+                           deadline)
+
+    def stop(self, timeout=None):
+        """Stop the scheduler and cancel the pending requests.
+
+        The request being executed, if any, completes normally.
+
+        """
+        self._halt()
+        if self._thread is not current_thread():
+            self._thread.join(timeout)
+
+    @property
+    def pending(self):
+        """Number of requests waiting to be executed.
+
+        """
+        with self._cond:
+            return len(self._heap)
+
+    def _halt(self):
+        """Stop accepting requests and cancel the pending ones.
+
+        """
+        with self._cond:
+            self._running = False
+            pending = [r for _, _, r in self._heap]
+            del self._heap[:]
+            self._cond.notify()
+        for request in pending:
+            request.cancel()
+
+    def _driver_collected(self, reference):
+        """Stop the scheduler once the driver has been garbage collected.
+
+        """
+        self._halt()
+
+    def _run(self):
+        """Execute the requests by order of priority.
+
+        """
+        while True:
+            with self._cond:
+                while self._running and not self._heap:
+                    self._cond.wait()
+                if not self._running:
+                    return
+                request = heappop(self._heap)[2]
+
+            driver = self.driver
+            if driver is None:
+                request.cancel()
+            elif request._state == _PENDING:
+                with driver.lock:
+                    request._execute()
+            # The request arguments should not keep the driver alive while
+            # waiting for the next request.
+            del driver, request
+
+
+def _resolve(driver, name):
+    """Find the object owning a feature from its dotted name.
+
+    """
+    path = name.split('.')
+    obj = driver
+    for part in path[:-1]:
+        obj = getattr(obj, part)
+    return obj, path[-1]
+
+
+def _get(driver, name):
+    obj, name = _resolve(driver, name)
+    return getattr(obj, name)
+
+
+def _set(driver, name, value):
+    obj, name = _resolve(driver, name)
+    setattr(obj, name, value)
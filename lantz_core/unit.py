@@ -4,7 +4,12 @@
     ~~~~~~~~~~~~~~~
 
     Unit handling is done using the Pint library. If absent the unit support is
-    simply disabled.
+    simply disabled. Pint is imported only when a unit is actually used, so
+    that drivers which do not need it do not pay its import time.
+
+    As a consequence UNIT_SUPPORT only reflects whether Pint is installed. An
+    installed Pint failing to import is reported by an ImportError when a
+    unit is first used.
 
     This module allows the user to specify the UnitRegistry to be used by Lantz
     and exposes some useful Pint features.
@@ -16,18 +21,27 @@
 from __future__ import (division, unicode_literals, print_function,
                         absolute_import)
 
+import sys
 import logging
 
-UNIT_SUPPORT = True
+from future.utils import raise_from
 
 try:
-    from pint import UnitRegistry
+    from importlib.util import find_spec
+    UNIT_SUPPORT = find_spec('pint') is not None
 except ImportError:
-    UNIT_SUPPORT = False
+    import imp
+    try:
+        imp.find_module('pint')
+        UNIT_SUPPORT = True
+    except ImportError:
+        UNIT_SUPPORT = False
 
 
 UNIT_REGISTRY = None
 
+_QUANTITY = None
+
 
 def set_unit_registry(unit_registry):
     """Set the UnitRegistry used by Lantz.
@@ -62,16 +76,45 @@ def get_unit_registry():
     If no UnitRegistry has been previously declared using `set_unit_registry`,
     a new UnitRegistry  is created.
 
+    Raises
+    ------
+    ImportError:
+        If Pint is installed but cannot be imported.
+
     """
     global UNIT_REGISTRY
     if not UNIT_REGISTRY:
         logger = logging.getLogger(__name__)
         logger.debug('Creating default UnitRegistry for Lantz')
+        try:
+            from pint import UnitRegistry
+        except ImportError as e:
+            mess = 'Pint is installed but failed to import : {}'.format(e)
+            raise_from(ImportError(mess), e)
         UNIT_REGISTRY = UnitRegistry()
 
     return UNIT_REGISTRY
 
 
+def is_quantity(value):
+    """Check whether a value is a Pint Quantity.
+
+    This never imports Pint : no Quantity can exist before it is imported.
+
+    """
+    global _QUANTITY
+    if _QUANTITY is None:
+        if 'pint' not in sys.modules:
+            return False
+        try:
+            from pint.quantity import _Quantity
+        except ImportError:
+            from pint import Quantity as _Quantity
+        _QUANTITY = _Quantity
+
+    return isinstance(value, _QUANTITY)
+
+
 def to_float(value):
     """Convert a value which could be a Quantity to a float.
 
@@ -11,15 +11,132 @@
 """
 from __future__ import (division, unicode_literals, print_function,
                         absolute_import)
+import ast
+from collections import OrderedDict
+
 from future.utils import exec_
-from future.builtins import str
+from past.builtins import basestring
 
-from collections import OrderedDict
+
+# Namespace in which the expressions are evaluated.
+_EXPR_GLOBALS = {}
+
+_EXPRESSIONS = {}
+
+_CHECKERS = {}
+
+_CMP_OPS = {ast.Eq: '==', ast.NotEq: '!=', ast.Lt: '<', ast.LtE: '<=',
+            ast.Gt: '>', ast.GtE: '>=', ast.Is: 'is', ast.IsNot: 'is not',
+            ast.In: 'in', ast.NotIn: 'not in'}
+
+# Statements asserting a comparison, the operands being kept to be reported.
+_CMP_TEMPLATE = """
+_lantz_l, _lantz_r = _LEFT, _RIGHT
+if not _lantz_l == _lantz_r:
+    raise AssertionError(_lantz_fail(%d, _lantz_l, _lantz_r))
+"""
+
+# Statements asserting any other expression.
+_EXPR_TEMPLATE = """
+if not _EXPR:
+    raise AssertionError(_lantz_fail(%d))
+"""
+
+
+def compile_expression(expr):
+    """Compile a python expression.
+
+    The expression is parsed as such, so that no statement can be smuggled
+    in, and identical expressions are compiled only once.
+
+    Parameters
+    ----------
+    expr : unicode
+        Expression to compile.
+
+    Returns
+    -------
+    code : code
+        Code object which can be evaluated using eval_expression.
+
+    """
+    expr = expr.strip()
+    if expr not in _EXPRESSIONS:
+        _EXPRESSIONS[expr] = compile(ast.parse(expr, mode='eval'), expr,
+                                     'eval')
+    return _EXPRESSIONS[expr]
+
+
+def eval_expression(code, namespace):
+    """Evaluate an expression compiled by compile_expression.
+
+    Parameters
+    ----------
+    code : code
+        Compiled expression.
+
+    namespace : dict
+        Names accessible to the expression.
+
+    """
+    return eval(code, _EXPR_GLOBALS, namespace)
+
+
+class _Substitute(ast.NodeTransformer):
+    """Replace the placeholders of a template by the nodes of an assertion.
+
+    """
+    def __init__(self, nodes, op=None):
+        self.nodes = nodes
+        self.op = op
+
+    def visit_Name(self, node):
+        return self.nodes.get(node.id, node)
+
+    def visit_Compare(self, node):
+        self.generic_visit(node)
+        if self.op is not None:
+            node.ops = [self.op]
+        return node
+
+
+def _signature_source(signature, namespace):
+    """Write the parameters list of a signature.
+
+    Default values are stored in the namespace of the function rather than
+    written as literals.
+
+    """
+    params = []
+    kw_only = False
+    for i, p in enumerate(signature.parameters.values()):
+        if p.kind == p.VAR_POSITIONAL:
+            kw_only = True
+            params.append('*' + p.name)
+            continue
+        if p.kind == p.VAR_KEYWORD:
+            params.append('**' + p.name)
+            continue
+        if p.kind == p.KEYWORD_ONLY and not kw_only:
+            kw_only = True
+            params.append('*')
+        if p.default is p.empty:
+            params.append(p.name)
+        else:
+            default = '_lantz_default_%d' % i
+            namespace[default] = p.default
+            params.append('%s=%s' % (p.name, default))
+    return '(' + ', '.join(params) + ')'
 
 
 def build_checker(checks, signature, ret=''):
     """Assemble a checker function from the provided assertions.
 
+    The assertions are compiled into a single function whose parameters are
+    the ones of the signature, so that checking does not require to build a
+    namespace. When a comparison fails the value of its operands is
+    reported. Checkers using a string signature are compiled only once.
+
     Parameters
     ----------
     checks : unicode
@@ -29,8 +146,7 @@ def build_checker(checks, signature, ret=''):
         Signature of the check function to build.
 
     ret : unicode
-        Name of the parameters to return. This string will be preceded by a
-        return statement.
+        Name of the parameters to return.
 
     Returns
     -------
@@ -38,20 +154,55 @@ def build_checker(checks, signature, ret=''):
         Function to use
 
     """
-    func_def = 'def check' + str(signature) + ':\n'
-    assertions = checks.split(';')
-    for assertion in assertions:
-        # XXXX use AST manipulation to provide more infos about assertion
-        # failure. Take inspiration from pytest.assertions.rewrite.
-        a_mess = '"""Assertion %s failed"""' % assertion
-        func_def += '    assert ' + assertion + ', ' + a_mess + '\n'
+    cacheable = isinstance(signature, basestring)
+    key = (checks.strip(), signature, ret)
+    if cacheable and key in _CHECKERS:
+        return _CHECKERS[key]
+
+    reports = []
+
+    def fail(index, *operands):
+        expr, symbol = reports[index]
+        if operands:
+            mess = 'Assertion {} failed ({!r} {} {!r})'
+            return mess.format(expr, operands[0], symbol, operands[1])
+        return 'Assertion {} failed'.format(expr)
+
+    namespace = {'_lantz_fail': fail}
+    if not cacheable:
+        signature = _signature_source(signature, namespace)
+
+    module = ast.parse('def check' + signature + ':\n    pass\n')
+    body = []
+    for expr in (a.strip() for a in checks.split(';')):
+        if not expr:
+            continue
+        node = ast.parse(expr, mode='eval').body
+        symbol = None
+        if isinstance(node, ast.Compare) and len(node.ops) == 1:
+            symbol = _CMP_OPS.get(type(node.ops[0]))
+        if symbol is not None:
+            stmts = ast.parse(_CMP_TEMPLATE % len(reports)).body
+            transformer = _Substitute({'_LEFT': node.left,
+                                       '_RIGHT': node.comparators[0]},
+                                      node.ops[0])
+        else:
+            stmts = ast.parse(_EXPR_TEMPLATE % len(reports)).body
+            transformer = _Substitute({'_EXPR': node})
+        body.extend(transformer.visit(stmt) for stmt in stmts)
+        reports.append((expr, symbol))
 
     if ret:
-        func_def += '    return %s' % ret
+        body.extend(ast.parse('return ' + ret).body)
+    module.body[0].body = body or module.body[0].body
+    code = compile(ast.fix_missing_locations(module),
+                   '<checks {}>'.format(checks), 'exec')
+    exec_(code, namespace)
+    checker = namespace['check']
 
-    loc = {}
-    exec_(func_def, globals(), loc)
-    return loc['check']
+    if cacheable:
+        _CHECKERS[key] = checker
+    return checker
 
 
 # The next three function take all driver as first argument for homogeneity.
@@ -134,3 +285,64 @@ def dict_to_byte(values, mapping):
     """
     byte = sum((2**mapping.index(k) for k in values if values[k]))
     return byte
+
+
+def parse_ascii_values(data, separator=',', dtype=float, out=None):
+    """Parse separated numeric values straight into a numpy array.
+
+    The parsing is performed by numpy in compiled code, which is much faster
+    than converting each value in Python for large responses.
+
+    Parameters
+    ----------
+    data : unicode or bytes
+        Answer of the instrument. Surrounding whitespaces and a trailing
+        separator are ignored.
+    separator : unicode or None, optional
+        Separator between the values. None means any whitespace.
+    dtype : numpy dtype, optional
+        Type of the values.
+    out : numpy.ndarray, optional
+        Preallocated array in which to store the values. The returned array is
+        then a view on its first elements.
+
+    Returns
+    -------
+    values : numpy.ndarray
+        One dimensional array of the values.
+
+    Raises
+    ------
+    ValueError :
+        Raised if a value cannot be parsed or if out is too small.
+
+    """
+    import numpy as np
+    if isinstance(data, bytes):
+        data = data.decode('ascii')
+    data = data.strip()
+    if separator and separator.strip():
+        data = data.rstrip(separator).rstrip()
+    if not data:
+        values = np.empty(0, dtype=dtype)
+    else:
+        sep = separator if separator and separator.strip() else ' '
+        try:
+            values = np.fromstring(data, dtype=dtype, sep=sep)
+        except (ValueError, DeprecationWarning):
+            values = None
+        # numpy silently stops at the first value it cannot parse.
+        expected = (data.count(sep) + 1 if sep != ' ' else
+                    len(data.split()))
+        if values is None or values.size != expected:
+            parts = data.split(separator)
+            values = np.array([p.strip() for p in parts], dtype=dtype)
+
+    if out is None:
+        return values
+    n = values.size
+    if n > out.size:
+        mess = 'Cannot store {} values in an array of size {}.'
+        raise ValueError(mess.format(n, out.size))
+    out[:n] = values
+    return out[:n]
@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+"""
+    tests.backends.test_recording
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Test recording and replaying the communications with an instrument.
+
+    :copyright: 2015 by Lantz Authors, see AUTHORS for more details.
+    :license: BSD, see LICENSE for more details.
+
+"""
+from __future__ import (division, unicode_literals, print_function,
+                        absolute_import)
+
+import os
+from threading import Lock
+
+import pytest
+
+pytest.importorskip('lantz_core.backends.visa')
+pytest.importorskip('pyvisa_sim')
+
+from lantz_core.features import Float
+from lantz_core.errors import LantzError
+from lantz_core.backends.visa import VisaMessageDriver
+from lantz_core.backends.recording import (recording_transport,
+                                           replay_transport, read_log,
+                                           ReplayResource, RecordingResource,
+                                           RecordedTraceback)
+
+base_backend = os.path.join(os.path.dirname(__file__), 'base.yaml@sim')
+
+
+class Recorded(VisaMessageDriver):
+
+    freq = Float('?FREQ', '!FREQ {:.2f}')
+
+    DEFAULTS = {'COMMON': {'write_termination': '\n',
+                           'read_termination': '\n'}}
+
+    def default_check_operation(self, feat, value, i_value, state=None):
+        return True, ''
+
+
+def use_driver(driver):
+    driver.initialize()
+    values = [driver.freq]
+    driver.freq = 10.
+    driver.read()
+    values.append(driver.freq)
+    values.append(driver.query('?UNKNOWN'))
+    driver.finalize()
+    return values
+
+
+def test_record_and_replay(tmpdir):
+    """Test replaying the communications of a driver.
+
+    """
+    path = str(tmpdir.join('log'))
+    d = Recorded.via_tcpip('192.168.0.100', backend=base_backend,
+                           caching_allowed=False)
+    d.transport_factory = recording_transport(path)
+    values = use_driver(d)
+    assert values == [100.0, 10.0, 'ERROR']
+
+    records = list(read_log(path))
+    assert [r.method for r in records] == ['query', 'write', 'read', 'query',
+                                           'query', 'close']
+    assert all(r.duration >= 0 for r in records)
+
+    d.transport_factory = replay_transport(path, speed=100)
+    assert use_driver(d) == values
+
+    # Running out of records or calling a different method fails.
+    d.initialize()
+    with pytest.raises(LantzError):
+        d.freq
+    d.transport_factory = None
+
+
+def test_replay_mismatch(tmpdir):
+    """Test that calls differing from the recorded ones are detected.
+
+    """
+    path = str(tmpdir.join('log'))
+    d = Recorded.via_tcpip('192.168.0.100', backend=base_backend,
+                           caching_allowed=False)
+    d.transport_factory = recording_transport(path)
+    use_driver(d)
+    d.transport_factory = None
+
+    res = ReplayResource(path, attributes={'timeout': 10})
+    assert res.timeout == 10
+    with pytest.raises(LantzError):
+        res.query('?AMP')
+    res.rewind()
+    with pytest.raises(LantzError):
+        res.write('?FREQ')
+
+    res = ReplayResource(path, strict=False)
+    assert res.query('?AMP') == next(read_log(path)).result
+    assert res.remaining == 5
+
+
+def test_replay_errors(tmpdir):
+    """Test that errors are recorded and raised again when replaying.
+
+    """
+    class Failing(object):
+
+        def read(self):
+            raise LantzError('Failed')
+
+    path = str(tmpdir.join('log'))
+    res = RecordingResource(Failing(), path)
+    with pytest.raises(LantzError):
+        res.read()
+    res._log.close()
+
+    res = ReplayResource(path)
+    with pytest.raises(LantzError) as e:
+        res.read()
+    assert 'Failed' in e.exconly()
+    # The traceback of the original error is attached to the replayed one.
+    cause = e.value.__cause__
+    assert isinstance(cause, RecordedTraceback)
+    assert 'raise LantzError' in str(cause)
+
+    # Methods absent from the log cannot be called.
+    with pytest.raises(AttributeError):
+        res.write
+
+
+def test_replay_unpicklable_errors(tmpdir):
+    """Test replaying an error which could not be pickled.
+
+    """
+    class Failing(object):
+
+        def read(self):
+            error = LantzError('Failed')
+            error.lock = Lock()
+            raise error
+
+    path = str(tmpdir.join('log'))
+    res = RecordingResource(Failing(), path)
+    with pytest.raises(LantzError):
+        res.read()
+    res._log.close()
+
+    res = ReplayResource(path)
+    with pytest.raises(RuntimeError) as e:
+        res.read()
+    assert 'Failed' in e.exconly()
@@ -0,0 +1,298 @@
+# -*- coding: utf-8 -*-
+"""
+    tests.backends.test_visa_message.py
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Test the VISA message driver against fake resources.
+
+    Those tests do not need a VISA library or a simulated backend.
+
+    :copyright: 2015 by Lantz Authors, see AUTHORS for more details.
+    :license: BSD, see LICENSE for more details.
+
+"""
+from __future__ import (division, unicode_literals, print_function,
+                        absolute_import)
+
+from threading import Thread
+from time import sleep
+
+import pytest
+
+pytest.importorskip('lantz_core.backends.visa')
+
+import lantz_core.backends.visa as lv
+from lantz_core.has_features import channel
+from lantz_core.features import Float, FloatList
+from lantz_core.errors import TimeoutError, LantzError
+from lantz_core.backends.visa import VisaMessageDriver, errors
+
+
+class FakeResourceManager(object):
+    """Resource manager knowing no resource.
+
+    """
+    def resource_info(self, resource_name):
+        return None
+
+
+@pytest.fixture
+def no_backend(monkeypatch):
+    """Create the drivers without using a VISA library.
+
+    """
+    rm = FakeResourceManager()
+    monkeypatch.setattr(lv, 'get_visa_resource_manager',
+                        lambda backend='default': rm)
+
+
+class StreamMessage(VisaMessageDriver):
+    pass
+
+
+class GroupedMessage(VisaMessageDriver):
+
+    COMMAND_SEPARATOR = ';'
+
+    volt = Float(setter='VOLT {}')
+
+    curr = Float(setter='CURR {}')
+
+    table = FloatList(setter='LIST ', datatype='d', is_big_endian=True)
+
+    ascii_table = FloatList(setter='ALIST ', datatype=None)
+
+    #: Name of the feature whose operations are reported as failed.
+    failing = None
+
+    def default_check_operation(self, feat, value, i_value, response):
+        return feat.name != self.failing, 'failing'
+
+
+def test_stream(no_backend):
+    """Test continuously acquiring blocks of data.
+
+    """
+    class FakeResource(object):
+
+        def __init__(self):
+            self.calls = []
+            self.stb = 0
+
+        def write(self, cmd):
+            self.calls.append(cmd)
+            self.stb = 16
+
+        def assert_trigger(self):
+            self.calls.append('trigger')
+            self.stb = 16
+
+        def read_stb(self):
+            return self.stb
+
+        def query_binary_values(self, cmd, datatype, is_big_endian,
+                                container, delay, header_fmt):
+            self.calls.append(cmd)
+            self.stb = 0
+            return container([len(self.calls)])
+
+        def close(self):
+            pass
+
+    d = StreamMessage.via_tcpip('192.168.0.101')
+    d._resource = res = FakeResource()
+    blocks = list(d.stream('FETC?', trigger='INIT', wait=16, n=2,
+                           container=list))
+    assert blocks == [[2], [4]]
+    assert res.calls == ['INIT', 'FETC?']*2
+
+    res.calls = []
+    with d.stream('FETC?', trigger=True, container=tuple) as stream:
+        assert next(stream) == (2,)
+
+    with pytest.raises(errors.VisaIOError):
+        def fail(driver):
+            raise errors.VisaIOError(-1073807339)
+        next(d.stream(fail))
+
+    with pytest.raises(TimeoutError):
+        next(d.stream('FETC?', wait=32, wait_timeout=0.01))
+
+
+def test_set_values(no_backend):
+    """Test uploading a table as binary or ASCII values.
+
+    """
+    np = pytest.importorskip('numpy')
+
+    class FakeResource(object):
+
+        def __init__(self):
+            self.calls = []
+
+        def write(self, cmd):
+            self.calls.append(cmd)
+
+        def write_binary_values(self, message, values, datatype,
+                                is_big_endian):
+            self.calls.append((message, values.tolist(), datatype,
+                               is_big_endian))
+
+        def write_ascii_values(self, message, values, converter,
+                               separator):
+            self.calls.append((message, values.tolist(), converter,
+                               separator))
+
+        def close(self):
+            pass
+
+    d = GroupedMessage.via_tcpip('192.168.0.102')
+    d._resource = res = FakeResource()
+    d.table = np.arange(3.)
+    d.ascii_table = [1., 2.]
+    assert res.calls == [('LIST ', [0., 1., 2.], 'd', True),
+                         ('ALIST ', [1., 2.], '.12g', ',')]
+
+    # Inside a transaction the uploads are sent in order with the other
+    # commands.
+    res.calls = []
+    with d.transaction():
+        d.volt = 7.0
+        d.table = [3., 4.]
+        d.curr = 8.0
+        assert not res.calls
+    assert res.calls == ['VOLT 7.0', ('LIST ', [3., 4.], 'd', True),
+                         'CURR 8.0']
+
+    # and rolled back if the transaction fails.
+    res.calls = []
+    del d.curr
+    d.failing = 'curr'
+    try:
+        with pytest.raises(LantzError):
+            with d.transaction():
+                d.table = [5.]
+                d.curr = 6.0
+    finally:
+        d.failing = None
+    assert res.calls == [('LIST ', [5.], 'd', True), 'CURR 6.0',
+                         ('LIST ', [3., 4.], 'd', True)]
+    assert d._cache['table'].tolist() == [3., 4.]
+
+
+def test_query_ascii_array(no_backend):
+    """Test parsing ASCII answers straight into arrays.
+
+    """
+    np = pytest.importorskip('numpy')
+
+    class FakeResource(object):
+
+        def query(self, message, delay=None):
+            return '1.0,2.0,3.0\n'
+
+        def query_ascii_values(self, *args):
+            return 'pyvisa'
+
+        def close(self):
+            pass
+
+    d = GroupedMessage.via_tcpip('192.168.0.103')
+    d._resource = FakeResource()
+    out = np.empty(5)
+    values = d.query_ascii_array('DATA?', out=out)
+    assert values.tolist() == [1., 2., 3.]
+    assert values.base is out
+    values = d.query_ascii_values('DATA?', container=np.array)
+    assert values.tolist() == [1., 2., 3.]
+    assert d.query_ascii_values('DATA?') == 'pyvisa'
+
+
+def test_command_group(no_backend):
+    """Test sending the values set in a transaction in a single message.
+
+    """
+    class FakeResource(object):
+
+        def __init__(self):
+            self.calls = []
+
+        def write(self, cmd):
+            self.calls.append(cmd)
+
+        def close(self):
+            pass
+
+    d = GroupedMessage.via_tcpip('192.168.0.104')
+    d._resource = res = FakeResource()
+    with d.transaction():
+        d.volt = 1.0
+        d.curr = 2.0
+        assert not res.calls
+    assert res.calls == ['VOLT 1.0;CURR 2.0']
+
+    d.volt = 3.0
+    assert res.calls[-1] == 'VOLT 3.0'
+
+    res.calls = []
+    GroupedMessage.COMMAND_SEPARATOR = None
+    try:
+        with d.transaction():
+            d.volt = 4.0
+            d.curr = 5.0
+    finally:
+        GroupedMessage.COMMAND_SEPARATOR = ';'
+    assert res.calls == ['VOLT 4.0', 'CURR 5.0']
+
+
+class IndependentMessage(VisaMessageDriver):
+
+    ch = channel((1, 2), independent_lock=True)
+
+    with ch:
+        ch.val = Float('VAL{id}?')
+
+
+def test_independent_channel_io(no_backend):
+    """Test that the I/O of channels using an independent lock are
+    serialized with the ones of the driver.
+
+    """
+    class FakeResource(object):
+
+        def __init__(self):
+            self.busy = False
+            self.overlaps = 0
+
+        def query(self, message, delay=None):
+            if self.busy:
+                self.overlaps += 1
+            self.busy = True
+            sleep(0.001)
+            self.busy = False
+            return '1.0'
+
+        def close(self):
+            pass
+
+    d = IndependentMessage.via_tcpip('192.168.0.105', caching_allowed=False)
+    d._resource = res = FakeResource()
+    ch = d.ch[1]
+
+    results = []
+
+    def query():
+        for _ in range(20):
+            results.append(d.query('DATA?'))
+
+    def read():
+        for _ in range(20):
+            results.append(ch.val)
+
+    threads = [Thread(target=query), Thread(target=read)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(results) == 40
+    assert res.overlaps == 0
@@ -11,12 +11,15 @@
 """
 from __future__ import (division, unicode_literals, print_function,
                         absolute_import)
+from threading import Thread, Event
+
 from pytest import raises
 from stringparser import Parser
 
 from lantz_core.features.feature import Feature, get_chain, set_chain
 from lantz_core.features.util import PostGetComposer, constant, conditional
 from lantz_core.errors import LantzError
+from lantz_core.util import build_checker
 from ..testing_tools import DummyParent
 
 
@@ -34,7 +37,8 @@ class TestFeatureInit(object):
     parameters = dict(extract='{}',
                       retries=1,
                       checks='1>0',
-                      discard={'limits': 'test'}
+                      discard={'limits': 'test'},
+                      depends_on=('test',)
                       )
 
     exclude = list()
@@ -110,6 +114,37 @@ def test_del():
     assert driver.d_set_called == 2
 
 
+def test_lock_free_cache_reads():
+    """Test reading a cached value while another thread holds the lock.
+
+    """
+    class LockTester(DummyParent):
+
+        feat = Feature(getter='get')
+
+    driver = LockTester(True)
+    driver.lock_free_cache_reads = True
+    assert driver.feat == 'get'
+
+    locked = Event()
+    release = Event()
+
+    def hold_lock():
+        with driver.lock:
+            locked.set()
+            release.wait()
+
+    t = Thread(target=hold_lock)
+    t.start()
+    locked.wait()
+    try:
+        assert driver.feat == 'get'
+        assert driver.d_get_called == 1
+    finally:
+        release.set()
+        t.join()
+
+
 def test_getter_factory():
     """Test using a getter factory.
 
@@ -302,6 +337,34 @@ def test_feature_checkers():
         driver.feat_sch = 1
 
 
+def test_checks_compiled_once():
+    """Test that identical checks are shared and report failing operands.
+
+    """
+
+    class AuxParent(DummyParent):
+
+        aux = 1
+        feat1 = Feature(True, checks='driver.aux == 1')
+        feat2 = Feature(True, checks=' driver.aux == 1 ')
+        feat3 = Feature(True, checks='driver.aux and True')
+
+    assert (build_checker('driver.aux == 1', '(self, driver)') is
+            build_checker('driver.aux == 1', '(self, driver)'))
+    assert (AuxParent.feat1.get_check.__func__ is
+            build_checker('driver.aux == 1', '(self, driver)'))
+
+    driver = AuxParent()
+    driver.aux = 2
+    with raises(AssertionError) as e:
+        driver.feat1
+    assert '(2 == 1)' in e.exconly()
+    driver.aux = 0
+    with raises(AssertionError) as e:
+        driver.feat3
+    assert 'driver.aux and True' in e.exconly()
+
+
 def test_clone():
     """Test cloning a feature.
 
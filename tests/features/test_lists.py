@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+"""
+    tests.features.test_lists
+    ~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Module dedicated to testing the list features.
+
+    :copyright: 2015 by Lantz Authors, see AUTHORS for more details.
+    :license: BSD, see LICENSE for more details.
+
+"""
+from __future__ import (division, unicode_literals, print_function,
+                        absolute_import)
+from pytest import raises, importorskip
+
+from lantz_core.features.lists import FloatList
+from lantz_core.limits import FloatLimitsValidator
+
+from .test_feature import TestFeatureInit
+from ..testing_tools import DummyParent
+
+np = importorskip('numpy')
+
+
+class TestFloatListInit(TestFeatureInit):
+
+    cls = FloatList
+
+    parameters = dict(datatype='d', is_big_endian=True, chunk_size=10,
+                      converter='.3f')
+
+
+class ListDriver(DummyParent):
+
+    table = FloatList('TABLE?', 'TABLE {offset},', limits=(0., 10., 0.5))
+
+    chunked = FloatList(setter='CHUNK {offset},', chunk_size=3)
+
+    dynamic = FloatList(setter='DYN', limits='table')
+
+    def __init__(self):
+        super(ListDriver, self).__init__(caching_allowed=True)
+        self.uploads = []
+
+    def default_get_feature(self, feat, cmd, *args, **kwargs):
+        return '1.0,2.5, 3\n'
+
+    def default_set_values(self, feat, cmd, values, *args, **kwargs):
+        self.uploads.append((cmd.format(*args, **kwargs), values.tolist()))
+
+    def _limits_table(self):
+        return FloatLimitsValidator(0., 1.)
+
+
+def test_float_list_get():
+    """Test parsing the answer of the instrument.
+
+    """
+    d = ListDriver()
+    table = d.table
+    assert isinstance(table, np.ndarray)
+    assert table.tolist() == [1.0, 2.5, 3.]
+
+
+def test_float_list_set():
+    """Test validating, uploading and caching a table.
+
+    """
+    d = ListDriver()
+    values = [0., 0.5, 10.]
+    d.table = values
+    assert d.uploads == [('TABLE 0,', [0., 0.5, 10.])]
+    values[0] = 1.
+    assert d.table.tolist() == [0., 0.5, 10.]
+    assert not d.table.flags.writeable
+
+    # Identical tables are not uploaded again.
+    d.table = np.array([0., 0.5, 10.])
+    assert len(d.uploads) == 1
+
+    with raises(ValueError) as e:
+        d.table = [1., 0.7, 11.]
+    assert 'index 1' in str(e.value)
+    with raises(ValueError):
+        d.table = [[1.], [2.]]
+    with raises(ValueError):
+        d.dynamic = [0.5, 2.]
+    d.dynamic = [0.5, 1.]
+    assert d.uploads[-1] == ('DYN', [0.5, 1.])
+    assert len(d.uploads) == 2
+
+
+def test_float_list_chunks():
+    """Test uploading a table by chunks.
+
+    """
+    d = ListDriver()
+    d.chunked = np.arange(7.)
+    assert d.uploads == [('CHUNK 0,', [0., 1., 2.]),
+                         ('CHUNK 3,', [3., 4., 5.]),
+                         ('CHUNK 6,', [6.])]
@@ -12,7 +12,11 @@
 from __future__ import (division, unicode_literals, print_function,
                         absolute_import)
 
-from lantz_core.features.mapping import Mapping
+import gc
+
+from pytest import raises
+
+from lantz_core.features.mapping import Mapping, _TABLES
 from lantz_core.features.bool import Bool
 
 from .test_feature import TestFeatureInit
@@ -58,3 +62,72 @@ def test_bool():
              aliases={True: ['On', 'on', 'ON'], False: ['Off', 'off', 'OFF']})
     assert b.pre_set(None, 'ON') == 1
     assert b.pre_set(None, 'off') == 2
+
+
+def test_mapping_tables_interning():
+    m1 = Mapping(mapping={'On': 1, 'Off': 2})
+    m2 = Mapping(mapping={'On': 1, 'Off': 2})
+    assert m1._map is m2._map
+    assert m1._imap is m2._imap
+
+    # Equal but differently typed values are not confused.
+    m3 = Mapping(mapping={'On': True, 'Off': False})
+    assert m3._imap is not m1._imap
+    assert m3.post_get(None, True) == 'On'
+
+
+def test_mapping_tables_shared_by_clones():
+    m = Mapping(mapping={'On': 'ON', 'Off': 'OFF'})
+    assert m.post_get(None, ' on') == 'On'
+    clone = m.clone()
+    assert clone._map is m._map
+    assert clone._imap is m._imap
+    assert clone._nimap is m._nimap
+    assert clone._learned == m._learned
+    assert clone._learned is not m._learned
+
+
+def test_mapping_tables_released():
+    m = Mapping(mapping={'Released': 1})
+    key = frozenset([(type('Released'), 'Released', int, 1)])
+    assert _TABLES[key] is m._map
+    del m
+    gc.collect()
+    assert key not in _TABLES
+
+
+def test_mapping_normalized_answers():
+    m = Mapping(mapping={'On': 'ON', 'Off': 'OFF'})
+    assert m.post_get(None, ' on\n') == 'On'
+    assert ' on\n' in m._learned
+    assert m.post_get(None, 'Off') == 'Off'
+    with raises(KeyError):
+        m.post_get(None, 'Unknown')
+    with raises(KeyError):
+        m.post_get(None, 3)
+
+    # Ambiguous normalized keys are not matched.
+    m = Mapping(mapping={'a': 'ON', 'b': 'on'})
+    assert m.post_get(None, 'on') == 'b'
+    with raises(KeyError):
+        m.post_get(None, 'On')
+
+
+def test_mapping_normalized_answers_not_shared():
+    # The reverse table of m1 is the interned forward table of m2.
+    m1 = Mapping(mapping={'on': 'ON'})
+    m2 = Mapping(mapping={'ON': 'on'})
+    assert m1._imap is m2._map
+    assert m1.post_get(None, 'On') == 'on'
+    assert 'On' not in m2._map
+    with raises(KeyError):
+        m2.pre_set(None, 'On')
+
+
+def test_bool_merged_table():
+    b = Bool(mapping={True: 'ON', False: 'OFF'},
+             aliases={True: ['On'], False: ['Off']})
+    assert b._map == {True: 'ON', False: 'OFF', 'On': 'ON', 'Off': 'OFF'}
+    assert b.post_get(None, 'on ') is True
+    with raises(KeyError):
+        b.pre_set(None, 'Unknown')
@@ -284,6 +284,114 @@ class TestFloat(object):
         parent.fl = aux
         assert parent.val != old_val
 
+    def test_cache_tolerance(self):
+        """Test that values close to the cached one are not sent.
+
+        """
+        class ToleranceTester(CacheFloatTester):
+
+            fl = set_feat(atol=1e-6)
+
+            rel = Float(True, True, rtol=1e-3)
+
+            def _get_rel(self, feat):
+                return self.val
+
+            def _set_rel(self, feat, val):
+                self.val = val
+
+        parent = ToleranceTester()
+        parent.fl = 1.0
+        parent.val = 0
+        parent.fl = 1.0000000001
+        parent.fl = 1.0000009
+        assert parent.val == 0
+        assert parent.fl == 1.0
+        parent.fl = 1.00001
+        assert parent.val == 1.00001
+
+        parent.rel = 100.
+        parent.val = 0
+        parent.rel = 100.05
+        assert parent.val == 0
+        parent.rel = 100.2
+        assert parent.val == 100.2
+
+    def test_cache_step(self):
+        """Test that values resolving to the same step are not sent.
+
+        """
+        class StepTester(CacheFloatTester):
+
+            fl = set_feat(limits=(0., 10., 0.1), atol=1.)
+
+        parent = StepTester()
+        parent.fl = 1.0
+        parent.val = 0
+        parent.fl = 1.0 + 1e-12
+        assert parent.val == 0
+        # The tolerance never merges distinct steps.
+        parent.fl = 1.1
+        assert parent.val == 1.1
+
+    def test_cache_step_limits_id(self):
+        """Test that the step used is the one of the limits of the driver.
+
+        """
+        class StepIdTester(CacheFloatTester):
+
+            fl = set_feat(limits='fl', atol=1.)
+
+            def __init__(self, step):
+                super(StepIdTester, self).__init__()
+                self.step = step
+
+            def _limits_fl(self):
+                return FloatLimitsValidator(0., 100., self.step)
+
+        # The step is known before the first set.
+        parent = StepIdTester(0.1)
+        assert parent.fl == 1.
+        parent.val = 0
+        parent.fl = 1.04
+        assert parent.val == 0
+
+        fine = StepIdTester(0.1)
+        coarse = StepIdTester(10.)
+        fine.fl = 1.0
+        coarse.fl = 10.
+        fine.fl = 1.1
+        assert fine.val == 1.1
+        coarse.val = 0
+        coarse.fl = 10.9
+        assert coarse.val == 0
+
+    def test_cache_tolerance_limits_id_not_resolved(self):
+        """Test that the limits are not resolved when the tolerance alone
+        rejects a value.
+
+        """
+        class LazyStepTester(CacheFloatTester):
+
+            fl = set_feat(limits='fl', atol=1e-6)
+
+            resolved = 0
+
+            def get_limits(self, limits_id):
+                self.resolved += 1
+                return super(LazyStepTester, self).get_limits(limits_id)
+
+            def _limits_fl(self):
+                return FloatLimitsValidator(0., 100., 0.1)
+
+        parent = LazyStepTester()
+        parent.fl = 1.0
+        resolved = parent.resolved
+        # Only the validation of the written value needs the limits.
+        parent.fl = 5.0
+        assert parent.val == 5.0
+        assert parent.resolved == resolved + 1
+
     @mark.skipif(UNIT_SUPPORT is True, reason="Requires Pint absence")
     def test_cache_unit_without_support(self):
         """Test getting a cached value with a unit in the absence of unit
@@ -329,3 +437,23 @@ class TestFloat(object):
         parent.val = 1
         parent.fl = 0.2
         assert parent.val == 1
+
+    @mark.skipif(UNIT_SUPPORT is False, reason="Requires Pint")
+    def test_cache_tolerance_unit(self):
+        """Test comparing values expressed in different units to the cache.
+
+        """
+        class UnitToleranceTester(CacheFloatTester):
+
+            fl = set_feat(unit='V', atol=1e-6)
+
+        parent = UnitToleranceTester()
+        ureg = get_unit_registry()
+        parent.fl = ureg.parse_expression('1000 mV')
+        assert parent.val == 1
+        parent.val = 0
+        parent.fl = 1.0000001
+        parent.fl = ureg.parse_expression('1000.0001 mV')
+        assert parent.val == 0
+        parent.fl = 1000.
+        assert parent.val == 1000.
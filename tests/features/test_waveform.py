@@ -0,0 +1,196 @@
+# -*- coding: utf-8 -*-
+"""
+    tests.features.test_waveform
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Module dedicated to testing the waveform feature.
+
+    :copyright: 2015 by Lantz Authors, see AUTHORS for more details.
+    :license: BSD, see LICENSE for more details.
+
+"""
+from __future__ import (division, unicode_literals, print_function,
+                        absolute_import)
+import gc
+from time import sleep
+
+from pytest import raises, importorskip
+
+from lantz_core.features.feature import Feature
+from lantz_core.features.waveform import Waveform, AsciiArray
+from lantz_core.util import parse_ascii_values
+
+from .test_feature import TestFeatureInit
+from ..testing_tools import DummyParent
+
+
+class TestWaveformInit(TestFeatureInit):
+
+    cls = Waveform
+
+    parameters = dict(prefetch=True)
+
+
+class TestAsciiArrayInit(TestWaveformInit):
+
+    cls = AsciiArray
+
+    parameters = dict(separator=';', dtype=int)
+
+
+class WaveformDriver(DummyParent):
+
+    wave = Waveform(True)
+
+    prefetched = Waveform(True, prefetch=True, depends_on='mode')
+
+    old = Waveform(True, prefetch=0.01)
+
+    mode = Feature(True, True)
+
+    def __init__(self):
+        super(WaveformDriver, self).__init__(True)
+        self.count = 0
+
+    def _get_wave(self, feat):
+        self.count += 1
+        return self.count
+
+    _get_prefetched = _get_wave
+    _get_old = _get_wave
+
+
+def test_waveform_never_cached():
+    """Test that a waveform is fetched at each read.
+
+    """
+    driver = WaveformDriver()
+    assert driver.wave == 1
+    assert driver.wave == 2
+    assert driver.check_cache() == {}
+
+
+def test_waveform_prefetch():
+    """Test that the next value is fetched right after a read.
+
+    """
+    driver = WaveformDriver()
+    assert driver.prefetched == 1
+    prefetcher = driver._prefetchers['prefetched']
+    assert prefetcher.wait(1)
+    assert driver.count == 2
+    assert driver.check_cache() == {}
+    assert driver.prefetched == 2
+    assert driver.prefetched == 3
+
+    # The same worker is used for all the prefetches.
+    thread = prefetcher._thread
+    assert prefetcher.wait(1)
+    assert driver.prefetched == 4
+    assert prefetcher._thread is thread
+
+    # Setting a dependency discards the prefetched value.
+    assert prefetcher.wait(1)
+    driver.mode = 2
+    assert driver.prefetched == 6
+
+    # Deleting discards the prefetched value.
+    assert prefetcher.wait(1)
+    del driver.prefetched
+    assert driver.prefetched == 8
+
+    # Clearing the cache discards the prefetched value.
+    assert prefetcher.wait(1)
+    driver.clear_cache()
+    assert driver.prefetched == 10
+    driver.get_feat('prefetched').stop_prefetch(driver)
+
+
+def test_waveform_prefetch_holding_lock():
+    """Test reading a prefetched waveform while holding the driver lock.
+
+    """
+    driver = WaveformDriver()
+    with driver.lock:
+        assert driver.prefetched == 1
+        assert driver.prefetched == 2
+    driver.get_feat('prefetched').stop_prefetch(driver)
+
+
+def test_waveform_prefetch_max_age():
+    """Test that too old prefetched values are discarded.
+
+    """
+    driver = WaveformDriver()
+    assert driver.old == 1
+    assert driver._prefetchers['old'].wait(1)
+    sleep(0.02)
+    assert driver.old == 3
+
+
+def test_waveform_prefetch_driver_collected():
+    """Test that the worker stops once the driver is collected.
+
+    """
+    driver = WaveformDriver()
+    assert driver.prefetched == 1
+    prefetcher = driver._prefetchers['prefetched']
+    assert prefetcher.wait(1)
+    thread = prefetcher._thread
+    del driver
+    for _ in range(100):
+        gc.collect()
+        thread.join(0.01)
+        if not thread.is_alive():
+            break
+    assert not thread.is_alive()
+
+
+def test_parse_ascii_values():
+    """Test parsing ASCII answers into arrays.
+
+    """
+    np = importorskip('numpy')
+    assert parse_ascii_values('1, 2.5,3e1\n').tolist() == [1., 2.5, 30.]
+    assert parse_ascii_values(b'1 2\t3\n4', None).tolist() == [1, 2, 3, 4]
+    assert parse_ascii_values('1;2;', ';').tolist() == [1., 2.]
+    assert parse_ascii_values(' ').size == 0
+    assert parse_ascii_values('1,2', dtype=int).dtype == np.dtype(int)
+    with raises(ValueError):
+        parse_ascii_values('1,a,3')
+    with raises(ValueError):
+        parse_ascii_values('1 a 3', None)
+
+    out = np.zeros(4)
+    values = parse_ascii_values('1,2', out=out)
+    assert values.base is out
+    assert out.tolist() == [1., 2., 0., 0.]
+    with raises(ValueError):
+        parse_ascii_values('1,2,3,4,5', out=out)
+
+
+def test_ascii_array():
+    """Test reading an ASCII array waveform.
+
+    """
+    importorskip('numpy')
+
+    class AsciiDriver(DummyParent):
+
+        trace = AsciiArray('TRACE?', separator=None)
+
+        def default_get_feature(self, feat, cmd, *args, **kwargs):
+            return '1.5 2.5\n'
+
+    assert AsciiDriver().trace.tolist() == [1.5, 2.5]
+
+    class ParsedDriver(DummyParent):
+
+        trace = AsciiArray('TRACE?', dtype=int)
+
+        def default_get_feature(self, feat, cmd, *args, **kwargs):
+            return [1.0, 2.0]
+
+    values = ParsedDriver().trace
+    assert values.dtype == int
+    assert values.tolist() == [1, 2]
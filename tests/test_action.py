@@ -164,3 +164,22 @@ def test_action_with_checks():
 
     with raises(AssertionError):
         dummy.test(3, -1)
+
+
+def test_action_with_checks_and_defaults():
+    """Test checks involving default and keyword arguments.
+
+    """
+    class Dummy(DummyParent):
+
+        @Action(checks='r > i; "k" in kwargs')
+        def test(self, r, i=1, **kwargs):
+            return r*i
+
+    dummy = Dummy()
+    assert dummy.test(3, k=1) == 3
+    with raises(AssertionError) as e:
+        dummy.test(1, k=1)
+    assert '(1 > 1)' in e.exconly()
+    with raises(AssertionError):
+        dummy.test(3)
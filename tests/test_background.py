@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+"""
+    tests.test_background
+    ~~~~~~~~~~~~~~~~~~~~~
+
+    Test the tools used to perform communications in the background.
+
+    :copyright: 2015 by Lantz Authors, see AUTHORS for more details.
+    :license: BSD, see LICENSE for more details.
+
+"""
+from __future__ import (division, unicode_literals, print_function,
+                        absolute_import)
+from threading import Event
+
+from pytest import raises
+
+from lantz_core.background import BackgroundProducer
+
+
+def make_producer(n, error=None):
+    """Build a function producing n integers before stopping or failing.
+
+    """
+    produced = []
+
+    def produce():
+        if len(produced) == n:
+            if error:
+                raise error
+            raise StopIteration()
+        produced.append(len(produced))
+        return produced[-1]
+
+    return produce, produced
+
+
+def test_producing_items():
+    """Test iterating over the items produced in the background.
+
+    """
+    produce, _ = make_producer(5)
+    producer = BackgroundProducer(produce)
+    assert list(producer) == list(range(5))
+    assert list(producer) == []
+
+
+def test_producing_ahead():
+    """Test that items are produced ahead of the consumer in a bounded way.
+
+    """
+    produce, produced = make_producer(10)
+    blocked = Event()
+
+    def slow_produce():
+        if len(produced) == 2:
+            blocked.set()
+        return produce()
+
+    with BackgroundProducer(slow_produce, maxsize=2) as producer:
+        assert blocked.wait(1)
+        assert next(producer) == 0
+        assert len(produced) <= 4
+
+    assert not producer.running
+    with raises(StopIteration):
+        next(producer)
+
+
+def test_producer_error():
+    """Test that errors are raised in the consumer thread.
+
+    """
+    produce, _ = make_producer(2, RuntimeError('Failed'))
+    producer = BackgroundProducer(produce)
+    assert next(producer) == 0
+    assert next(producer) == 1
+    with raises(RuntimeError):
+        next(producer)
+    with raises(StopIteration):
+        next(producer)
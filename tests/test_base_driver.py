@@ -11,9 +11,16 @@
 """
 from __future__ import (division, unicode_literals, print_function,
                         absolute_import)
+from threading import Thread, Event
+
 from pytest import raises
 
-from lantz_core.base_driver import BaseDriver
+from lantz_core.base_driver import (BaseDriver, list_drivers, initialize_all,
+                                    finalize_all, reopen_all)
+from lantz_core.has_features import subsystem, channel
+from lantz_core.features.feature import Feature
+from lantz_core.features.scalars import Int
+from lantz_core.errors import LantzError
 
 
 def test_bdriver_multiple_creation():
@@ -67,3 +74,454 @@ def test_bdriver_context():
 
     with Driver() as d:
         assert d.connected
+
+
+def test_bdriver_concurrent_creation():
+    """Test that concurrent creations of the same driver yield a single one.
+
+    """
+    class Slow(BaseDriver):
+
+        created = 0
+
+        def __init__(self, *args, **kwargs):
+            super(Slow, self).__init__(*args, **kwargs)
+            type(self).created += 1
+
+    drivers = []
+
+    def create():
+        drivers.append(Slow(a=1))
+
+    threads = [Thread(target=create) for _ in range(10)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert Slow.created == 1
+    assert all(d is drivers[0] for d in drivers)
+    assert Slow.live_instances() == [drivers[0]]
+
+
+def test_bdriver_reentrant_creation():
+    """Test that creating the same driver during its creation is reported
+    rather than deadlocking.
+
+    """
+    class Reentrant(BaseDriver):
+
+        def __init__(self, *args, **kwargs):
+            super(Reentrant, self).__init__(*args, **kwargs)
+            Reentrant(*args, **kwargs)
+
+    errors = []
+
+    def create():
+        try:
+            Reentrant(a=1)
+        except RuntimeError as e:
+            errors.append(e)
+
+    thread = Thread(target=create)
+    thread.daemon = True
+    thread.start()
+    thread.join(1)
+    assert not thread.is_alive()
+    assert len(errors) == 1
+    assert not Reentrant.live_instances()
+
+    assert not [k for k in Reentrant._creation_locks if k[0] is Reentrant]
+
+
+def test_bdriver_concurrent_creation_different_ids():
+    """Test that creating a driver does not block the creation of others.
+
+    """
+    started = Event()
+    release = Event()
+
+    class Blocking(BaseDriver):
+
+        def __init__(self, *args, **kwargs):
+            super(Blocking, self).__init__(*args, **kwargs)
+            if kwargs.get('block'):
+                started.set()
+                assert release.wait(1)
+
+    blocked = []
+    thread = Thread(target=lambda: blocked.append(Blocking(a=1, block=True)))
+    thread.start()
+    try:
+        assert started.wait(1)
+        other = Blocking(a=2)
+        assert other is Blocking(a=2)
+        assert not blocked
+    finally:
+        release.set()
+        thread.join()
+    assert blocked[0] is Blocking(a=1, block=True)
+
+
+def test_list_drivers():
+    """Test listing the live drivers.
+
+    """
+    class Listed(BaseDriver):
+        pass
+
+    d1 = Listed(a=1)
+    d2 = Listed(a=2)
+    assert set(list_drivers(Listed)) == set([d1, d2])
+    assert d1 in list_drivers()
+
+
+def test_bulk_lifecycle():
+    """Test initializing, finalizing and reopening drivers in parallel.
+
+    """
+    class Bulk(BaseDriver):
+
+        def __init__(self, *args, **kwargs):
+            super(Bulk, self).__init__(*args, **kwargs)
+            self.calls = []
+
+        def initialize(self):
+            if self.a == 2:
+                raise RuntimeError()
+            self.calls.append('init')
+
+        def finalize(self):
+            self.calls.append('final')
+
+        def reopen_connection(self):
+            self.calls.append('reopen')
+
+    drivers = [Bulk(a=i) for i in range(4)]
+    for i, d in enumerate(drivers):
+        d.a = i
+
+    failures = initialize_all(drivers, max_workers=2)
+    assert list(failures) == [drivers[2]]
+    assert isinstance(failures[drivers[2]], RuntimeError)
+    assert not finalize_all(list_drivers(Bulk))
+    assert not reopen_all(drivers)
+    assert drivers[0].calls == ['init', 'final', 'reopen']
+    assert drivers[2].calls == ['final', 'reopen']
+
+
+class CheckedDriver(BaseDriver):
+
+    feat = Feature(setter=True)
+
+    ss = subsystem()
+    with ss:
+        ss.feat = Feature(setter=True)
+
+    def __init__(self, *args, **kwargs):
+        super(CheckedDriver, self).__init__(*args, **kwargs)
+        self.checked = []
+        self.batches = 0
+
+    def default_set_feature(self, feat, cmd, *args, **kwargs):
+        pass
+
+    def default_check_operation(self, feat, value, i_value, response):
+        self.checked.append(value)
+        return value > 0, 'negative'
+
+    def default_check_operations(self, operations):
+        self.batches += 1
+        return super(CheckedDriver, self).default_check_operations(operations)
+
+
+def test_deferred_checks():
+    """Test deferring the checks till an explicit flush.
+
+    """
+    d = CheckedDriver(a=1, caching_allowed=False)
+    with d.defer_checks() as driver:
+        assert driver is d
+        assert d.ss.checks_deferred
+        d.feat = 1
+        d.ss.feat = 2
+        assert not d.checked
+        d.flush_checks()
+        assert d.checked == [1, 2]
+        assert d.batches == 1
+        d.feat = 3
+
+    assert not d.checks_deferred
+    assert d.checked == [1, 2, 3]
+    d.feat = 4
+    assert d.checked == [1, 2, 3, 4]
+    assert d.batches == 2
+
+
+def test_deferred_checks_automatic_flush():
+    """Test flushing the checks after a number of sets or a delay.
+
+    """
+    d = CheckedDriver(a=2, caching_allowed=False)
+    d.defer_checks(max_pending=2)
+    d.feat = 1
+    assert not d.checked
+    d.feat = 2
+    assert d.checked == [1, 2]
+
+    d.defer_checks(max_delay=0)
+    d.feat = 3
+    assert d.checked == [1, 2, 3]
+    d.resume_checks()
+
+
+def test_deferred_checks_failures():
+    """Test that failed deferred checks are attributed to their feature.
+
+    """
+    d = CheckedDriver(a=3, caching_allowed=False)
+    with raises(LantzError) as e:
+        with d.defer_checks():
+            d.feat = -1
+            d.ss.feat = 1
+            d.ss.feat = -2
+
+    mess = str(e.value)
+    assert 'feat to -1 (-1): negative' in mess
+    assert 'feat to 1 ' not in mess
+    assert 'feat to -2 (-2): negative' in mess
+    assert not d.checks_deferred
+
+    # Errors of checks do not hide other errors.
+    with raises(RuntimeError):
+        with d.defer_checks():
+            d.feat = -1
+            raise RuntimeError()
+
+
+def test_deferred_checks_failures_cache():
+    """Test that a value whose check failed is not cached.
+
+    """
+    d = CheckedDriver(a=4)
+    d.feat = 1
+    with raises(LantzError):
+        with d.defer_checks():
+            d.feat = -1
+            d.ss.feat = 2
+    assert 'feat' not in d._cache
+    assert d.ss._cache == {'feat': 2}
+
+    # Setting the same value again reaches the instrument.
+    d.checked = []
+    with raises(LantzError):
+        d.feat = -1
+    assert d.checked == [-1]
+
+
+class TransactionDriver(BaseDriver):
+
+    feat = Int(getter=True, setter='feat', limits=(0, 10))
+
+    other = Int(getter=True, setter='other', checks='value != 7')
+
+    ss = subsystem()
+    with ss:
+        ss.feat = Int(getter=True, setter='ss.feat')
+
+    def __init__(self, *args, **kwargs):
+        super(TransactionDriver, self).__init__(*args, **kwargs)
+        self.sent = []
+        self.groups = []
+        self.failing = ()
+        self.raising = ()
+
+    def default_get_feature(self, feat, cmd, *args, **kwargs):
+        return 0
+
+    def default_set_feature(self, feat, cmd, *args, **kwargs):
+        if args[0] in self.raising:
+            raise RuntimeError()
+        self.sent.append((cmd, args[0]))
+
+    def default_check_operation(self, feat, value, i_value, response):
+        return value not in self.failing, 'failing'
+
+    def begin_command_group(self):
+        self.groups.append('begin')
+
+    def end_command_group(self, send=True):
+        self.groups.append('send' if send else 'discard')
+
+
+def test_transaction():
+    """Test that the values are validated, sent in order and cached on exit.
+
+    """
+    d = TransactionDriver(a=10)
+    d.feat = 1
+    d.sent = []
+    with d.transaction() as driver:
+        assert driver is d
+        assert d.ss.in_transaction
+        d.other = 2
+        d.ss.feat = 3
+        d.feat = 1
+        d.other = 4
+        assert not d.sent
+        assert d.feat == 1
+        assert 'other' not in d._cache
+
+    assert not d.in_transaction
+    assert d.sent == [('ss.feat', 3), ('other', 4)]
+    assert d.groups == ['begin', 'send']
+    assert d.other == 4
+    assert d.ss.feat == 3
+
+    # Nested transactions are merged in the outer one.
+    d.sent = []
+    with d.transaction():
+        d.feat = 5
+        with d.transaction():
+            d.other = 6
+        assert not d.sent
+    assert d.sent == [('feat', 5), ('other', 6)]
+
+
+def test_transaction_validation():
+    """Test that an invalid value prevents sending anything.
+
+    """
+    d = TransactionDriver(a=11)
+    with raises(ValueError):
+        with d.transaction():
+            d.other = 1
+            d.feat = 11
+    with raises(AssertionError):
+        with d.transaction():
+            d.feat = 1
+            d.other = 7
+
+    assert not d.sent
+    assert not d._cache
+    assert not d.in_transaction
+    d.feat = 2
+    assert d.sent == [('feat', 2)]
+
+
+def test_transaction_rollback():
+    """Test that the cached values are restored when a check fails.
+
+    """
+    d = TransactionDriver(a=12)
+    d.feat = 1
+    d.sent = []
+    d.failing = (3,)
+    with raises(LantzError):
+        with d.transaction():
+            d.feat = 2
+            d.other = 3
+
+    # Features with a cached value are set back, the others are discarded.
+    assert d.sent == [('feat', 2), ('other', 3), ('feat', 1)]
+    assert d._cache == {'feat': 1}
+    assert not d.checks_deferred
+    assert not d._pending_checks
+
+    # Errors raised while sending discard the command group.
+    d.failing = ()
+    d.raising = (5,)
+    d.sent = []
+    with raises(RuntimeError):
+        with d.transaction():
+            d.feat = 4
+            d.other = 5
+    assert d.groups[-1] == 'discard'
+    assert d.sent == [('feat', 4), ('feat', 1)]
+    assert d._cache == {'feat': 1}
+
+
+class GroupTransactionDriver(TransactionDriver):
+
+    ch = channel((1, 2))
+
+    with ch:
+        ch.channel_list_separator = ','
+
+        ch.val = Int(getter=True, setter='VAL {} (@{id})')
+
+    def default_set_feature(self, feat, cmd, *args, **kwargs):
+        super(GroupTransactionDriver, self).default_set_feature(feat, cmd,
+                                                                *args,
+                                                                **kwargs)
+        self.sent[-1] = cmd.format(*args, **kwargs)
+
+
+def test_transaction_channel_group():
+    """Test that the sets on a group of channels are staged and rolled back.
+
+    """
+    d = GroupTransactionDriver(a=14)
+    d.ch.set_all('val', 1)
+    assert d.sent == ['VAL 1 (@1,2)']
+
+    d.sent = []
+    with d.transaction():
+        d.ch.set_all('val', 2)
+        assert not d.sent
+    assert d.sent == ['VAL 2 (@1)', 'VAL 2 (@2)']
+
+    d.sent = []
+    d.failing = (3,)
+    with raises(LantzError):
+        with d.transaction():
+            d.ch.set_all('val', 3)
+    assert d.sent == ['VAL 3 (@1)', 'VAL 3 (@2)', 'VAL 2 (@2)', 'VAL 2 (@1)']
+    assert d.ch[1].val == 2 and d.ch[2].val == 2
+
+
+class IndependentDriver(TransactionDriver):
+
+    ch = channel(('a',), independent_lock=True)
+
+    with ch:
+        ch.x = Int(getter=True, setter='ch.x')
+
+        @ch
+        def _pre_get_x(self, feat):
+            # Let the other thread open a transaction while the channel lock
+            # is held.
+            self.parent.reading.set()
+            self.parent.in_transaction_event.wait(1)
+
+
+def test_transaction_independent_channel():
+    """Test that a transaction and a read on a channel using an independent
+    lock do not deadlock.
+
+    """
+    d = IndependentDriver(a=13)
+    d.reading = Event()
+    d.in_transaction_event = Event()
+    c = d.ch['a']
+
+    def read():
+        c.clear_cache()
+        c.x
+
+    def write():
+        d.reading.wait(1)
+        with d.transaction():
+            d.in_transaction_event.set()
+            c.x = 5
+
+    threads = [Thread(target=read), Thread(target=write)]
+    for t in threads:
+        t.daemon = True
+        t.start()
+    for t in threads:
+        t.join(2)
+        assert not t.is_alive()
+
+    assert d.sent == [('ch.x', 5)]
+    assert c.x == 5
@@ -11,8 +11,10 @@
 """
 from __future__ import (division, unicode_literals, print_function,
                         absolute_import)
+from pytest import raises
 
 from lantz_core.has_features import channel
+from lantz_core.features import Int
 from .testing_tools import DummyParent
 
 
@@ -70,6 +72,38 @@ def test_ch_lock():
     assert ch.lock is a.lock
 
 
+class ChParent4(DummyParent):
+
+    ch = channel(('a', 'b'), independent_lock=True)
+
+
+def test_ch_independent_lock():
+    a = ChParent4()
+    ch_a = a.ch['a']
+    ch_b = a.ch['b']
+    assert ch_a.lock is not a.lock
+    assert ch_a.lock is not ch_b.lock
+
+    ch_a.default_get_feature(None, 'Test')
+    assert a.d_get_kwargs == {'id': 'a'}
+
+
+def test_ch_independent_lock_inheritance():
+
+    class ChParent5(ChParent4):
+
+        ch = channel()
+
+    class ChParent6(ChParent4):
+
+        ch = channel(independent_lock=False)
+
+    assert ChParent5().ch['a'].lock is not None
+    assert ChParent5().ch['a'].independent_lock
+    a = ChParent6()
+    assert a.ch['a'].lock is a.lock
+
+
 def test_ch_reop():
     a = ChParent1()
     ch = a.ch[1]
@@ -82,3 +116,191 @@ def test_listing_aliases():
     aliases = a.ch.aliases
     assert a.ch.aliases is not aliases
     assert a.ch.aliases == aliases
+
+
+class ChParentListing(DummyParent):
+
+    ch = channel('_list_ch')
+
+    listed = 0
+
+    def _list_ch(self):
+        self.listed += 1
+        return [1, 2]
+
+
+def test_available_caching():
+    a = ChParentListing()
+    assert a.ch.available == [1, 2]
+    assert a.ch.available == [1, 2]
+    assert a.listed == 1
+    assert [ch.id for ch in a.ch] == [1, 2]
+    assert a.listed == 1
+
+    a.ch.discard_available()
+    assert a.ch.available == [1, 2]
+    assert a.listed == 2
+
+
+def test_available_ttl():
+
+    class NoCache(ChParentListing):
+
+        ch = channel(available_ttl=0)
+
+    a = NoCache()
+    a.ch.available
+    a.ch.available
+    assert a.listed == 2
+
+
+def test_available_ttl_reset():
+
+    class NoCache(ChParentListing):
+
+        ch = channel(available_ttl=0)
+
+    class Cached(NoCache):
+
+        ch = channel(available_ttl=None)
+
+    a = Cached()
+    a.ch.available
+    a.ch.available
+    assert a.listed == 1
+
+
+def test_clear_cache_does_not_list():
+    a = ChParentListing()
+    ch = a.ch[1]
+    ch._cache = {'aux': 1}
+    a.clear_cache()
+    a.clear_cache(features=['ch.aux'])
+    assert ch._cache == {}
+    assert a.listed == 0
+    assert a.ch.created_channels == [ch]
+
+
+class BulkParent(DummyParent):
+
+    ch = channel((1, 2, 3))
+
+    with ch:
+        ch.channel_list_separator = ','
+
+        ch.val = Int('VAL? (@{id})', 'VAL {} (@{id})', limits=(0, 10))
+
+    def default_get_feature(self, feat, cmd, *args, **kwargs):
+        super(BulkParent, self).default_get_feature(feat, cmd, *args,
+                                                    **kwargs)
+        ids = '{}'.format(kwargs['id']).split(',')
+        return ','.join('{}'.format(int(i)*2) for i in ids)
+
+
+class NoBulkParent(BulkParent):
+
+    ch = channel()
+
+    with ch:
+        ch.channel_list_separator = None
+
+
+def test_bulk_get():
+    a = BulkParent(True)
+    assert a.ch.get_all('val') == {1: 2, 2: 4, 3: 6}
+    assert a.d_get_called == 1
+    assert a.d_get_kwargs == {'id': '1,2,3'}
+    assert a.ch[2].val == 4
+    assert a.ch.get_all('val') == {1: 2, 2: 4, 3: 6}
+    assert a.d_get_called == 1
+
+    a.ch[2].clear_cache()
+    assert a.ch.get_all('val') == {1: 2, 2: 4, 3: 6}
+    assert a.d_get_called == 2
+    assert a.d_get_kwargs == {'id': 2}
+
+
+def test_bulk_set():
+    a = BulkParent(True)
+    a.ch.set_all('val', 5)
+    assert a.d_set_called == 1
+    assert a.d_set_args == (5,)
+    assert a.d_set_kwargs == {'id': '1,2,3'}
+    assert a.d_check_instr == 1
+    assert a.ch[3].val == 5
+    assert a.d_get_called == 0
+
+    with raises(ValueError):
+        a.ch.set_all('val', 11)
+
+
+def test_bulk_on_group():
+    a = BulkParent(True)
+    group = a.ch[2:]
+    assert group.ids == [2, 3]
+    group.set('val', 1)
+    assert a.d_set_kwargs == {'id': '2,3'}
+    assert a.ch.group([1, 3]).get('val') == {1: 2, 3: 1}
+    assert a.d_get_kwargs == {'id': 1}
+    assert len(a.ch[1:3:2]) == 1
+
+
+def test_group_slice_non_numeric_ids():
+    """Test selecting a group of channels whose ids are not numbers.
+
+    """
+    class StrParent(DummyParent):
+
+        ch = channel(('CH3', 'A', 'CH1', 'CH2'), aliases={'first': 'A'})
+
+    a = StrParent()
+    assert a.ch['CH1':].ids == ['CH1', 'CH2', 'CH3']
+    assert a.ch[:'CH2'].ids == ['A', 'CH1']
+    assert a.ch['first':'CH3':2].ids == ['A', 'CH2']
+    assert a.ch['B':'CH2'].ids == ['CH1']
+    with raises(KeyError):
+        a.ch[1:]
+
+
+def test_group_slice_unsortable_ids():
+    """Test selecting a group of channels whose ids cannot be sorted.
+
+    """
+    class MixedParent(DummyParent):
+
+        ch = channel((5, 1, 3, 'A'))
+
+    a = MixedParent()
+    assert a.ch[1:].ids == [1, 3, 'A']
+    assert a.ch[:3].ids == [5, 1]
+    # Bounds which are not ids cannot be located.
+    with raises(KeyError):
+        a.ch[2:]
+
+
+def test_bulk_set_discard():
+    """Test that a broadcast set discards the cache of every channel.
+
+    """
+    class DiscardParent(BulkParent):
+
+        ch = channel()
+
+        with ch:
+            ch.mode = Int('MODE? (@{id})', 'MODE {} (@{id})',
+                          discard=('val',))
+
+    a = DiscardParent(True)
+    assert a.ch.get_all('val') == {1: 2, 2: 4, 3: 6}
+    a.ch.set_all('mode', 1)
+    assert a.d_set_called == 1
+    assert all(not ch.check_cache() or 'val' not in ch.check_cache()
+               for ch in a.ch)
+
+
+def test_bulk_without_channel_list():
+    a = NoBulkParent(True)
+    assert a.ch.get_all('val') == {1: 2, 2: 4, 3: 6}
+    assert a.d_get_called == 3
+    a.ch.set_all('val', 1)
+    assert a.d_set_called == 3
@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+"""
+    tests.test_docs_cache
+    ~~~~~~~~~~~~~~~~~~~~~
+
+    Test the on-disk cache of the docs parsed from the classes source.
+
+    :copyright: 2015 by Lantz Authors, see AUTHORS for more details.
+    :license: BSD, see LICENSE for more details.
+
+"""
+from __future__ import (division, unicode_literals, print_function,
+                        absolute_import)
+from pytest import yield_fixture
+
+from lantz_core import docs_cache
+from lantz_core.docs_cache import set_docs_cache_dir, save_docs_cache
+from lantz_core.features.feature import Feature
+from .testing_tools import DummyParent
+
+
+def make_class():
+
+    class Cached(DummyParent):
+
+        #: Documented feature.
+        feat = Feature(True)
+
+    return Cached
+
+
+@yield_fixture
+def cache_dir(tmpdir):
+    set_docs_cache_dir(str(tmpdir))
+    yield tmpdir
+    set_docs_cache_dir(None)
+
+
+def test_docs_cache(cache_dir, monkeypatch):
+    """Test that the docs are retrieved from the cache once saved.
+
+    """
+    assert 'Documented feature.' in make_class().feat.__doc__
+    save_docs_cache()
+    assert len(cache_dir.listdir()) == 1
+
+    # Forget the loaded docs and forbid parsing the source.
+    set_docs_cache_dir(str(cache_dir))
+
+    def fail(cls):
+        raise AssertionError()
+    monkeypatch.setattr(docs_cache, 'parse_docs', fail)
+    assert 'Documented feature.' in make_class().feat.__doc__
+
+
+def test_docs_cache_invalid_file(cache_dir):
+    """Test that a corrupted cache file is ignored.
+
+    """
+    make_class()
+    save_docs_cache()
+    cache_dir.listdir()[0].write('{')
+    set_docs_cache_dir(str(cache_dir))
+    assert 'Documented feature.' in make_class().feat.__doc__
+
+
+def test_docs_cache_disabled(tmpdir):
+    """Test that nothing is written when the cache is disabled.
+
+    """
+    make_class()
+    save_docs_cache()
+    assert not tmpdir.listdir()
@@ -11,6 +11,8 @@
 """
 from __future__ import (division, unicode_literals, print_function,
                         absolute_import)
+from threading import Event, Thread
+
 from pytest import raises
 
 from lantz_core.has_features import (subsystem, set_feat, channel, set_action)
@@ -18,6 +20,8 @@ from lantz_core.base_subsystem import SubSystem
 from lantz_core.base_channel import Channel
 from lantz_core.action import Action
 from lantz_core.features.feature import Feature
+from lantz_core.features.limits_validated import LimitsValidated
+from lantz_core.limits import IntLimitsValidator, limits_ttl
 from lantz_core.features.util import (append, prepend, add_after, add_before,
                                       replace)
 
@@ -755,6 +759,252 @@ def test_limits():
     assert decl.get_limits('test') is not r
 
 
+class TrackedLimits(DummyParent):
+
+    range = Feature(True, True)
+
+    mode = Feature(True, True)
+
+    def _limits_value(self):
+        self.range
+        return object()
+
+    def _limits_nested(self):
+        self.mode
+        self.get_limits('value')
+        return object()
+
+    @limits_ttl(0)
+    def _limits_expired(self):
+        return object()
+
+    @limits_ttl(100)
+    def _limits_valid(self):
+        return object()
+
+
+def test_limits_discarded_when_read_feature_set():
+    """Test that limits are discarded when a feature they read is set.
+
+    """
+    decl = TrackedLimits(True)
+    r = decl.get_limits('value')
+    n = decl.get_limits('nested')
+    assert decl.get_limits('value') is r
+    decl.mode = 2
+    assert decl.get_limits('value') is r
+    assert decl.get_limits('nested') is not n
+    n = decl.get_limits('nested')
+    decl.range = 2
+    assert decl.get_limits('value') is not r
+    assert decl.get_limits('nested') is not n
+
+
+def test_limits_reads_of_other_threads_not_recorded():
+    """Test that only the reads of the computing thread are recorded.
+
+    """
+    started = Event()
+    release = Event()
+
+    class Concurrent(TrackedLimits):
+
+        lock_free_cache_reads = True
+
+        def _limits_slow(self):
+            self.range
+            started.set()
+            release.wait(1)
+            return object()
+
+    decl = Concurrent(True)
+    decl.mode
+    thread = Thread(target=decl.get_limits, args=('slow',))
+    thread.start()
+    try:
+        assert started.wait(1)
+        decl.mode
+    finally:
+        release.set()
+        thread.join()
+    assert decl._limits_reads['slow'] == set(['range'])
+    assert 'slow' not in decl._limits_readers.get('mode', ())
+
+
+def test_limits_readers_pruned():
+    """Test that recomputing limits forgets the features read previously.
+
+    """
+    class Switching(TrackedLimits):
+
+        use_range = True
+
+        def _limits_switch(self):
+            if self.use_range:
+                self.range
+            else:
+                self.mode
+            return object()
+
+    decl = Switching(True)
+    decl.get_limits('switch')
+    assert decl._limits_readers['range'] == set(['switch'])
+    decl.use_range = False
+    decl.discard_limits(('switch',))
+    decl.get_limits('switch')
+    assert 'range' not in decl._limits_readers
+    assert decl._limits_readers['mode'] == set(['switch'])
+
+
+def test_limits_ttl():
+    """Test that limits are recomputed once their time to live is elapsed.
+
+    """
+    decl = TrackedLimits()
+    r = decl.get_limits('expired')
+    assert decl.get_limits('expired') is not r
+    r = decl.get_limits('valid')
+    assert decl.get_limits('valid') is r
+    decl.discard_limits(('valid',))
+    assert decl.get_limits('valid') is not r
+
+
+def test_stale_limits_are_not_cached():
+    """Test that limits discarded during their computation are not cached.
+
+    """
+    class StaleLimits(DummyParent):
+
+        def _limits_test(self):
+            self.discard_limits(('test',))
+            return object()
+
+    decl = StaleLimits()
+    assert decl.get_limits('test') is not decl.get_limits('test')
+
+
+def test_prefetching_limits():
+    """Test recomputing the discarded limits in a background thread.
+
+    """
+    computed = Event()
+
+    class Prefetching(TrackedLimits):
+
+        prefetch_limits = True
+
+        def _limits_value(self):
+            self.range
+            computed.set()
+            return object()
+
+    decl = Prefetching(True)
+    decl.get_limits('value')
+    computed.clear()
+    decl.range = 2
+    assert computed.wait(1)
+    prefetcher = decl._limits_prefetcher
+    if prefetcher:
+        prefetcher.join(1)
+    assert 'value' in decl._limits_cache
+
+
+# --- Test features dependencies ----------------------------------------------
+
+class DependentTester(DummyParent):
+
+    range = Feature(True, True)
+
+    mode = Feature(True, True)
+
+    value = LimitsValidated(True, True, limits='value',
+                            depends_on=('range', 'mode'))
+
+    derived = Feature(True, depends_on='value')
+
+    ss = subsystem()
+    with ss:
+        ss.test = Feature(True, depends_on='.mode')
+        ss.dep = Feature(True, depends_on='test')
+
+    ch = channel((1, 2))
+    with ch:
+        ch.aux = LimitsValidated(True, limits='aux', depends_on='.range')
+
+    def _limits_value(self):
+        return IntLimitsValidator(0, 10)
+
+
+def test_dependents():
+    """Test the resolution of the dependencies into dependents.
+
+    """
+    d = DependentTester()
+    assert d.dependents('range') == (('ch.aux', 'derived', 'value'),
+                                     ('ch.aux', 'value'))
+    assert d.dependents('mode') == (('derived', 'ss.dep', 'ss.test', 'value'),
+                                    ('value',))
+    assert d.dependents('value') == (('derived',), ())
+    assert d.dependents('derived') == ((), ())
+    assert d.ss.dependents('.mode') == (('dep', 'test'), ())
+    assert d.dependencies('derived') == set(['value', 'range', 'mode'])
+    assert d.ss.dependencies('dep') == set(['test', '.mode'])
+
+
+def test_setting_discard_dependents():
+    """Test that setting a feature discards the cache of its dependents.
+
+    """
+    d = DependentTester(True)
+    d.value = 1
+    d.derived
+    r = d.get_limits('value')
+    d.ss.dep
+    d.ch[1].aux
+    d.ch[1]._limits_cache['aux'] = object()
+
+    d.range = 1
+    assert d.check_cache(channels=False, subsystems=False) == {'range': 1}
+    assert d.get_limits('value') is not r
+    assert d.ss.check_cache() == {'dep': True}
+    assert d.ch[1].check_cache() == {}
+    assert d.ch[1]._limits_cache == {}
+
+    d.ch[1].aux
+    d.mode = 1
+    assert d.ss.check_cache() == {}
+    assert d.ch[1].check_cache() == {'aux': True}
+
+
+def test_set_feat_preserve_dependencies():
+    """Test that dependencies are preserved and can be altered by set_feat.
+
+    """
+    class Modified(DependentTester):
+
+        derived = set_feat(depends_on=('mode',))
+
+    assert DependentTester.derived.depends_on == ('value',)
+    assert Modified().dependents('value') == ((), ())
+    assert Modified().dependents('mode') == (('derived', 'ss.dep', 'ss.test',
+                                              'value'), ('value',))
+
+
+def test_unknown_dependencies():
+    """Test that depending on a non existent feature is reported.
+
+    """
+    with raises(AttributeError):
+        class Tester(DummyParent):
+            test = Feature(True, depends_on='unknown')
+
+    with raises(AttributeError):
+        class SubTester(DummyParent):
+            ss = subsystem()
+            with ss:
+                ss.test = Feature(True, depends_on='.unknown')
+
+
 # --- Miscellaneous -----------------------------------------------------------
 
 def test_get_feat():
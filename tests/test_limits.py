@@ -11,7 +11,7 @@
 """
 from __future__ import (division, unicode_literals, print_function,
                         absolute_import)
-from pytest import raises, mark
+from pytest import raises, mark, importorskip
 
 from lantz_core.limits import IntLimitsValidator, FloatLimitsValidator
 from lantz_core import unit
@@ -160,6 +160,14 @@ class TestFloatLimitsValidator(object):
         with raises(TypeError):
             FloatLimitsValidator(1.0, step='1')
 
+    def test_validate_array(self):
+        importorskip('numpy')
+        fv = FloatLimitsValidator(-1.0, 1.0, 0.1)
+        valid = fv.validate_array([-1.1, -1.0, 0.3, 0.35, 1.0, 1.2])
+        assert valid.tolist() == [False, True, True, False, True, False]
+        valid = FloatLimitsValidator(max=1.0).validate_array([0.5, 2.])
+        assert valid.tolist() == [True, False]
+
     @mark.skipif(unit.UNIT_SUPPORT is False, reason="Requires Pint")
     def test_unit_conversion(self):
         fv = FloatLimitsValidator(-1.0, 1.0, unit='V')
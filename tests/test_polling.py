@@ -0,0 +1,225 @@
+# -*- coding: utf-8 -*-
+"""
+    tests.test_polling
+    ~~~~~~~~~~~~~~~~~~
+
+    Test the service polling features on behalf of observers.
+
+    :copyright: 2015 by Lantz Authors, see AUTHORS for more details.
+    :license: BSD, see LICENSE for more details.
+
+"""
+from __future__ import (division, unicode_literals, print_function,
+                        absolute_import)
+import gc
+from threading import Event
+from time import sleep
+from weakref import ref
+
+from future.moves.queue import Queue
+from pytest import importorskip
+
+from lantz_core.has_features import subsystem
+from lantz_core.features.feature import Feature
+from lantz_core.features.util import constant
+from lantz_core.polling import PollingService, get_polling_service
+from lantz_core.scheduler import get_request_scheduler
+from .testing_tools import DummyParent
+
+
+class Polled(DummyParent):
+
+    value = Feature(True)
+
+    ss = subsystem()
+    with ss:
+        ss.value = Feature(constant('ss'))
+
+    def __init__(self):
+        super(Polled, self).__init__(True)
+        self.reads = 0
+        self.current = 0
+
+    def _get_value(self, feat):
+        self.reads += 1
+        return self.current
+
+
+def test_get_polling_service():
+    """Test that drivers have a single polling service.
+
+    """
+    driver = Polled()
+    assert get_polling_service(driver) is get_polling_service(driver)
+    assert get_polling_service(driver) is not get_polling_service(Polled())
+
+
+def test_polling_notifications():
+    """Test that observers are notified only of changes.
+
+    """
+    driver = Polled()
+    service = PollingService(driver)
+    notified = []
+    queue = Queue()
+    try:
+        sub = service.subscribe('value', 0.01,
+                                lambda n, v: notified.append((n, v)))
+        service.subscribe('value', 0.05, queue=queue)
+        service.subscribe('ss.value', 0.01, queue=queue)
+        assert service.polled_features == {'value': 0.01, 'ss.value': 0.01}
+        sleep(0.1)
+        assert driver.reads > 2
+        assert notified == [('value', 0)]
+        driver.current = 1
+        sleep(0.05)
+        assert notified == [('value', 0), ('value', 1)]
+        values = set()
+        while not queue.empty():
+            values.add(queue.get())
+        assert values == set([('value', 0), ('value', 1), ('ss.value', 'ss')])
+
+        sub.cancel()
+        assert service.polled_features == {'value': 0.05, 'ss.value': 0.01}
+    finally:
+        service.stop()
+
+    reads = driver.reads
+    sleep(0.05)
+    assert driver.reads == reads
+
+
+def test_polling_uncomparable_values():
+    """Test that values which cannot be compared do not stop the polling.
+
+    """
+    np = importorskip('numpy')
+
+    class Uncomparable(object):
+
+        def __ne__(self, other):
+            raise TypeError()
+
+    driver = Polled()
+    driver.current = np.zeros(2)
+    service = PollingService(driver)
+    notified = []
+    try:
+        service.subscribe('value', 0.01, lambda n, v: notified.append(v))
+        sleep(0.05)
+        driver.current = np.zeros(3)
+        sleep(0.05)
+        assert [len(v) for v in notified] == [2, 3]
+        driver.current = Uncomparable()
+        sleep(0.05)
+        driver.current = 1
+        sleep(0.05)
+        assert service._thread.is_alive()
+        assert notified[-1] == 1
+    finally:
+        service.stop()
+
+
+def test_polling_coalesce():
+    """Test that a new observer gets the known value without new read.
+
+    """
+    driver = Polled()
+    service = PollingService(driver)
+    notified = []
+    try:
+        service.subscribe('value', 10)
+        sleep(0.05)
+        assert driver.reads == 1
+        service.subscribe('value', 10, lambda n, v: notified.append(v))
+        assert notified == [0]
+        assert driver.reads == 1
+    finally:
+        service.stop()
+
+
+def test_polling_stops_without_subscriptions():
+    """Test that the polling thread stops once all subscriptions are cancelled.
+
+    """
+    driver = Polled()
+    service = PollingService(driver)
+    sub = service.subscribe('value', 0.01)
+    thread = service._thread
+    assert thread.is_alive()
+    sub.cancel()
+    assert not thread.is_alive()
+
+    reads = driver.reads
+    sleep(0.05)
+    assert driver.reads == reads
+
+    # Subscribing again restarts the polling.
+    sub = service.subscribe('value', 0.01)
+    try:
+        sleep(0.05)
+        assert driver.reads > reads
+    finally:
+        sub.cancel()
+    assert service._thread is None
+
+
+def test_polling_driver_collected():
+    """Test that the service does not keep the driver alive.
+
+    """
+    driver = Polled()
+    service = get_polling_service(driver)
+    service.subscribe('value', 0.01)
+    thread = service._thread
+    sleep(0.02)
+    driver_ref = ref(driver)
+    del driver
+    # The polling thread may be in the middle of a read.
+    for _ in range(100):
+        gc.collect()
+        if driver_ref() is None:
+            break
+        sleep(0.01)
+    assert driver_ref() is None
+    thread.join(1)
+    assert not thread.is_alive()
+    assert service.driver is None
+    assert not service.polled_features
+
+
+def test_polling_low_priority():
+    """Test that the reads are submitted at low priority to the scheduler.
+
+    """
+    driver = Polled()
+    scheduler = get_request_scheduler(driver)
+    started = Event()
+    release = Event()
+
+    def block():
+        started.set()
+        release.wait(1)
+
+    scheduler.submit(block)
+    assert started.wait(1)
+    service = PollingService(driver)
+    try:
+        service.subscribe('value', 10)
+        for _ in range(100):
+            if scheduler.pending:
+                break
+            sleep(0.01)
+        reads = []
+        request = scheduler.submit(lambda: reads.append(driver.reads))
+        release.set()
+        request.result(1)
+        assert reads == [0]
+        for _ in range(100):
+            if driver.reads:
+                break
+            sleep(0.01)
+        assert driver.reads == 1
+    finally:
+        service.stop()
+        scheduler.stop()
@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+"""
+    tests.test_ramping
+    ~~~~~~~~~~~~~~~~~~
+
+    Test the rate limited ramping of Float features.
+
+    :copyright: 2015 by Lantz Authors, see AUTHORS for more details.
+    :license: BSD, see LICENSE for more details.
+
+"""
+from __future__ import (division, unicode_literals, print_function,
+                        absolute_import)
+from time import time, sleep
+
+from pytest import raises, approx, importorskip
+
+from lantz_core.features.scalars import Float
+from lantz_core.errors import RequestCancelled
+from lantz_core.ramping import compute_setpoints
+from .testing_tools import DummyParent
+
+
+class Ramped(DummyParent):
+
+    voltage = Float(True, True, limits=(-10., 10., 0.1))
+
+    def __init__(self):
+        super(Ramped, self).__init__()
+        self.value = 0.
+        self.sets = []
+        self.delay = 0.
+
+    def _get_voltage(self, feat):
+        return self.value
+
+    def _set_voltage(self, feat, value):
+        sleep(self.delay)
+        self.value = value
+        self.sets.append((time(), value))
+
+
+def test_compute_setpoints():
+    """Test computing the setpoints with and without a resolution.
+
+    """
+    assert compute_setpoints(0., 1., 0.3) == approx([0.3, 0.6, 0.9, 1.])
+    assert compute_setpoints(1., 0., 0.5) == approx([0.5, 0.])
+    assert compute_setpoints(1., 1., 0.5) == []
+    assert compute_setpoints(0., 1., None) == [1.]
+    # The step is a multiple of the resolution and the intermediate points
+    # are on the grid.
+    assert compute_setpoints(0.04, 0.5, 0.25, 0.1) == approx([0.2, 0.4, 0.5])
+    # An off-grid start never leads to a jump larger than the step and the
+    # target is set only once.
+    assert compute_setpoints(0.05, 1., 0.3, 0.1) == approx([0.3, 0.6, 0.9,
+                                                           1.])
+    assert compute_setpoints(0.95, 0., 0.3, 0.1) == approx([0.7, 0.4, 0.1,
+                                                           0.])
+    assert compute_setpoints(0., 0.9, 0.3, 0.1) == approx([0.3, 0.6, 0.9])
+
+
+def test_ramp():
+    """Test ramping at a given rate.
+
+    """
+    d = Ramped()
+    ramp = d.ramp('voltage', 1., rate=2., step=0.2)
+    assert ramp.result(5) == 1.
+    assert ramp.done and not ramp.cancelled
+    values = [v for _, v in d.sets]
+    assert values == approx([0.2, 0.4, 0.6, 0.8, 1.])
+    assert d.voltage == 1.
+    # One setpoint every step/rate seconds.
+    duration = d.sets[-1][0] - d.sets[0][0]
+    assert 0.35 < duration < 0.6
+
+    # The schedule compensates for the time spent setting the values.
+    d.sets = []
+    d.delay = 0.05
+    ramp = d.ramp('voltage', 0., rate=2., step=0.2)
+    ramp.result(5)
+    duration = d.sets[-1][0] - d.sets[0][0]
+    assert duration < 0.55
+
+
+def test_ramp_validation():
+    """Test that the target is validated before starting.
+
+    """
+    d = Ramped()
+    with raises(ValueError):
+        d.ramp('voltage', 20., step=1.)
+    with raises(ValueError):
+        d.ramp('voltage', 1., rate=-1.)
+    with raises(ValueError):
+        d.ramp('voltage', 1., rate=0.)
+    assert not d.sets
+
+
+def test_ramp_cancel():
+    """Test cancelling a ramp.
+
+    """
+    d = Ramped()
+    ramp = d.ramp('voltage', 5., rate=1., step=0.1)
+    sleep(0.05)
+    assert ramp.cancel()
+    assert ramp.cancelled
+    with raises(RequestCancelled):
+        ramp.result()
+    assert d.voltage == ramp.current
+    assert d.voltage < 5.
+
+    called = []
+    ramp = d.ramp('voltage', 0., step=1.)
+    ramp.result(5)
+    ramp.add_done_callback(called.append)
+    assert called == [ramp]
+    assert not ramp.cancel()
+
+
+def test_ramp_asyncio():
+    """Test awaiting a ramp from an asyncio event loop.
+
+    """
+    asyncio = importorskip('asyncio')
+    d = Ramped()
+    loop = asyncio.new_event_loop()
+    try:
+        ramp = d.ramp('voltage', 0.5, step=0.1)
+        future = ramp.as_asyncio_future(loop)
+        assert loop.run_until_complete(future) == 0.5
+
+        ramp = d.ramp('voltage', 5., rate=1., step=0.1)
+        future = ramp.as_asyncio_future(loop)
+        loop.call_later(0.05, future.cancel)
+        with raises(asyncio.CancelledError):
+            loop.run_until_complete(future)
+        with raises(RequestCancelled):
+            ramp.result(1)
+    finally:
+        loop.close()
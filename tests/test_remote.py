@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+"""
+    tests.test_remote
+    ~~~~~~~~~~~~~~~~~
+
+    Test accessing a driver living in another process through a proxy.
+
+    :copyright: 2015 by Lantz Authors, see AUTHORS for more details.
+    :license: BSD, see LICENSE for more details.
+
+"""
+from __future__ import (division, unicode_literals, print_function,
+                        absolute_import)
+import pickle
+from mmap import mmap
+from multiprocessing import Pool
+
+try:
+    import numpy as np
+except ImportError:
+    pass
+
+from pytest import raises, yield_fixture, mark
+
+from lantz_core.has_features import subsystem, channel
+from lantz_core.features.feature import Feature
+from lantz_core.action import Action
+from lantz_core.remote import (DriverServer, DriverProxy, NUMPY_SUPPORT,
+                               SHARED_MEMORY_SUPPORT)
+from .testing_tools import DummyParent
+
+
+class Remote(DummyParent):
+
+    value = Feature('VAL', 'VAL {}')
+
+    ss = subsystem()
+
+    with ss as s:
+
+        s.state = Feature(True)
+
+        @s
+        def _get_state(self, feat):
+            return 'on'
+
+    ch = channel((1, 2))
+
+    with ch as c:
+
+        c.level = Feature(True)
+
+        @c
+        def _get_level(self, feat):
+            return self.id*10
+
+    @Action()
+    def double(self, x):
+        return 2*x
+
+    @property
+    def mode(self):
+        return 'remote'
+
+
+def remote_work(proxy):
+    return proxy.double(proxy.ss.state == 'on')
+
+
+@yield_fixture
+def server():
+    server = DriverServer(Remote())
+    server.start()
+    yield server
+    server.stop()
+
+
+def test_proxy_access(server):
+    """Test accessing features, subparts and actions through a proxy.
+
+    """
+    proxy = server.proxy()
+    assert proxy.value == 'VAL'
+    proxy.value = 2
+    assert server.driver.d_set_cmd == 'VAL {}'
+    assert proxy.ss.state == 'on'
+    assert proxy.ch[2].level == 20
+    assert proxy.double(3) == 6
+    assert proxy.get_many(['value']) == {'value': 'VAL'}
+    assert proxy.call('double', x=2) == 4
+    # Properties and plain attributes are read on the server.
+    assert proxy.mode == 'remote'
+    assert proxy.use_cache is False
+
+    with raises(AttributeError):
+        proxy.unknown = 1
+    with raises(AttributeError):
+        proxy.get('_cache')
+    with raises(AttributeError):
+        proxy.get('unknown')
+    with raises(AttributeError):
+        proxy.unknown
+    proxy.close()
+
+
+def test_proxy_in_pool(server):
+    """Test using pickled proxies in the workers of a process pool.
+
+    """
+    proxy = server.proxy()
+    assert isinstance(pickle.loads(pickle.dumps(proxy)), DriverProxy)
+    pool = Pool(2)
+    try:
+        assert pool.map(remote_work, [proxy]*4) == [2]*4
+    finally:
+        pool.close()
+        pool.join()
+
+
+class Acquisition(DummyParent):
+
+    @Action()
+    def trace(self, n):
+        return np.arange(n, dtype='f8')
+
+    @Action()
+    def raw(self, n):
+        return b'a'*n
+
+    @Action()
+    def many(self, n):
+        return {'trace': np.arange(n, dtype='i2').reshape((2, -1)),
+                'small': np.arange(2)}
+
+
+@mark.skipif(not (SHARED_MEMORY_SUPPORT and NUMPY_SUPPORT),
+             reason='Requires shared memory and numpy')
+def test_shared_memory_transfer():
+    """Test transferring large arrays and bytes through shared memory.
+
+    """
+    with DriverServer(Acquisition(), shm_threshold=1024) as server:
+        proxy = server.proxy()
+        trace = proxy.trace(1000)
+        assert isinstance(trace.base, mmap)
+        np.testing.assert_array_equal(trace, np.arange(1000))
+        assert proxy.raw(2000) == b'a'*2000
+
+        values = proxy.many(1000)
+        assert values['trace'].shape == (2, 500)
+        assert isinstance(values['trace'].base, mmap)
+        assert not isinstance(values['small'].base, mmap)
+
+        # Small values are pickled.
+        assert not isinstance(proxy.trace(10).base, mmap)
+        del trace, values
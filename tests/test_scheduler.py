@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+"""
+    tests.test_scheduler
+    ~~~~~~~~~~~~~~~~~~~~
+
+    Test the priority based scheduling of driver requests.
+
+    :copyright: 2015 by Lantz Authors, see AUTHORS for more details.
+    :license: BSD, see LICENSE for more details.
+
+"""
+from __future__ import (division, unicode_literals, print_function,
+                        absolute_import)
+import gc
+from threading import Event
+from time import sleep
+from weakref import ref
+
+from pytest import raises
+
+from lantz_core.features.feature import Feature
+from lantz_core.errors import TimeoutError, RequestCancelled
+from lantz_core.scheduler import (RequestScheduler, HIGH_PRIORITY,
+                                  LOW_PRIORITY, get_request_scheduler)
+from .testing_tools import DummyParent
+
+
+class Scheduled(DummyParent):
+
+    value = Feature(True, True)
+
+    def __init__(self):
+        super(Scheduled, self).__init__()
+        self.log = []
+
+    def _get_value(self, feat):
+        self.log.append('get')
+        return len(self.log)
+
+    def _set_value(self, feat, value):
+        self.log.append(value)
+
+
+def block(scheduler):
+    """Block the scheduler till the returned event is set.
+
+    """
+    started = Event()
+    release = Event()
+
+    def wait():
+        started.set()
+        release.wait(1)
+
+    scheduler.submit(wait)
+    assert started.wait(1)
+    return release
+
+
+def test_requests_priority():
+    """Test that high priority requests are executed first.
+
+    """
+    driver = Scheduled()
+    scheduler = RequestScheduler(driver)
+    try:
+        release = block(scheduler)
+        low = scheduler.get('value', priority=LOW_PRIORITY)
+        normal = scheduler.set('value', 'normal')
+        high = scheduler.set('value', 'off', priority=HIGH_PRIORITY)
+        assert scheduler.pending == 3
+        release.set()
+        assert low.result(1) == 3
+        assert high.done and normal.done
+        assert driver.log == ['off', 'normal', 'get']
+    finally:
+        scheduler.stop()
+
+
+def test_requests_cancellation_and_deadline():
+    """Test cancelling requests and dropping expired ones.
+
+    """
+    driver = Scheduled()
+    scheduler = RequestScheduler(driver)
+    try:
+        release = block(scheduler)
+        cancelled = scheduler.set('value', 1)
+        expired = scheduler.set('value', 2, deadline=0)
+        done = scheduler.set('value', 3, deadline=10)
+        assert cancelled.cancel()
+        assert cancelled.cancelled
+        release.set()
+        done.result(1)
+        assert not done.cancel()
+        with raises(RequestCancelled):
+            cancelled.result()
+        with raises(TimeoutError):
+            expired.result()
+        assert driver.log == [3]
+    finally:
+        scheduler.stop()
+
+
+def test_requests_errors_and_stop():
+    """Test that errors are reported and pending requests cancelled on stop.
+
+    """
+    driver = Scheduled()
+    scheduler = RequestScheduler(driver)
+
+    def fail():
+        raise ValueError()
+
+    with raises(ValueError):
+        scheduler.submit(fail).result(1)
+
+    release = block(scheduler)
+    pending = scheduler.get('value')
+    with raises(TimeoutError):
+        pending.result(0.01)
+    release.set()
+    scheduler.stop()
+    assert pending.done
+    with raises(RuntimeError):
+        scheduler.submit(fail)
+
+
+def test_get_request_scheduler():
+    """Test that drivers have a single running scheduler.
+
+    """
+    driver = Scheduled()
+    scheduler = get_request_scheduler(driver)
+    assert get_request_scheduler(driver) is scheduler
+    assert get_request_scheduler(Scheduled()) is not scheduler
+
+    scheduler.stop()
+    assert not scheduler.running
+    new = get_request_scheduler(driver)
+    assert new is not scheduler and new.running
+
+    # The scheduler does not keep the driver alive.
+    new.get('value').result(1)
+    thread = new._thread
+    driver_ref = ref(driver)
+    del driver
+    for _ in range(100):
+        gc.collect()
+        if driver_ref() is None:
+            break
+        sleep(0.01)
+    assert driver_ref() is None
+    thread.join(1)
+    assert not thread.is_alive()
@@ -57,6 +57,13 @@ def test_ss_lock():
     assert a.ss.lock is a.lock
 
 
+def test_ss_lock_free_cache_reads():
+    a = SSParent()
+    assert a.ss.lock_free_cache_reads is False
+    a.lock_free_cache_reads = True
+    assert a.ss.lock_free_cache_reads is True
+
+
 def test_ss_reop():
     a = SSParent()
     a.ss.reopen_connection()
@@ -11,6 +11,10 @@
 """
 from __future__ import (division, unicode_literals, print_function,
                         absolute_import)
+import os
+import sys
+import subprocess
+
 from pytest import raises, yield_fixture, mark
 
 from lantz_core import unit
@@ -46,6 +50,16 @@ def test_reset_unit_registry(teardown):
         set_unit_registry(ureg)
 
 
+def test_broken_pint_import(teardown, monkeypatch):
+    """Test that a Pint failing to import is reported when first used.
+
+    """
+    monkeypatch.setitem(sys.modules, 'pint', None)
+    with raises(ImportError) as excinfo:
+        get_unit_registry()
+    assert 'Pint is installed' in str(excinfo.value)
+
+
 def test_converters(teardown):
     """Test to_quantity and to_float utility functions.
 
@@ -53,3 +67,21 @@ def test_converters(teardown):
     val = 1.0
     assert to_float(val) == val
     assert to_float(to_quantity(val, 'A')) == val
+
+
+def test_lazy_pint_import(tmpdir):
+    """Test that declaring features with units does not import Pint.
+
+    """
+    script = tmpdir.join('script.py')
+    script.write('import sys\n'
+                 'from lantz_core.has_features import HasFeatures\n'
+                 'from lantz_core.features.scalars import Float\n'
+                 'from lantz_core.limits import FloatLimitsValidator\n'
+                 'class D(HasFeatures):\n'
+                 '    f = Float(limits=(0, 1), unit="V")\n'
+                 'FloatLimitsValidator(0, 1, unit="V")\n'
+                 'assert "pint" not in sys.modules\n')
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    subprocess.check_call([sys.executable, str(script)], cwd=root,
+                          env=dict(os.environ, PYTHONPATH=root))